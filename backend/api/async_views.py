@@ -0,0 +1,73 @@
+"""
+Асинхронные представления для чтения под ASGI (backend/asgi.py).
+
+Синхронные представления Django 3.2 под ASGI выполняет в одном общем
+потоке, поэтому долгий запрос задерживает все остальные. Безопасные
+запросы к маршрутам ASYNC_READ_ROUTES выполняются теми же
+представлениями DRF, но в пуле из ASYNC_READ_THREADS потоков, поэтому
+формат ответов и права доступа не отличаются от синхронных. Асинхронного
+ORM в Django 3.2 нет, запросы к базе идут в потоках пула; запись, как и
+раньше, выполняется в общем потоке.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import URLPattern, URLResolver
+from rest_framework.permissions import SAFE_METHODS
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_READ_THREADS,
+    thread_name_prefix='foodgram-read',
+)
+
+
+def run_view(view, request, *args, **kwargs):
+    # соединения потоков пула живут по тем же правилам, что и в запросе
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_read_view(view):
+    """Асинхронное представление: безопасные методы выполняются в пуле."""
+    read = sync_to_async(
+        run_view, thread_sensitive=False, executor=executor)
+    write = sync_to_async(run_view)
+
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        handler = read if request.method in SAFE_METHODS else write
+        return await handler(view, request, *args, **kwargs)
+
+    return async_view
+
+
+def make_async(urlpatterns, names):
+    """Копия urlpatterns, в которой маршруты names асинхронные."""
+    result = []
+    for pattern in urlpatterns:
+        if isinstance(pattern, URLResolver):
+            pattern = URLResolver(
+                pattern.pattern,
+                make_async(pattern.url_patterns, names),
+                pattern.default_kwargs,
+                pattern.app_name,
+                pattern.namespace,
+            )
+        elif pattern.name in names:
+            pattern = URLPattern(
+                pattern.pattern,
+                async_read_view(pattern.callback),
+                pattern.default_args,
+                pattern.name,
+            )
+        result.append(pattern)
+    return result
@@ -0,0 +1,128 @@
+"""
+Аутентификация по токену с кэшем.
+
+TokenAuthentication на каждый запрос читает токен вместе с пользователем
+из базы. Здесь пользователь по токену хранится в памяти процесса
+(LRU на AUTH_TOKEN_CACHE_MAX_ENTRIES записей) не дольше
+AUTH_TOKEN_CACHE_TIMEOUT секунд, а при AUTH_TOKEN_SHARED_CACHE ещё и в
+общем кэше Django, чтобы воркеры не ходили в базу каждый за своим.
+
+Выход (token/logout), смена пароля, деактивация и удаление пользователя
+сбрасывают записи в этом процессе и в общем кэше сразу после коммита
+(см. api/signals.py). В памяти других процессов запись живёт до истечения
+AUTH_TOKEN_CACHE_TIMEOUT: это наибольшее время, в течение которого
+отозванный токен ещё принимается.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+def get_digest(key):
+    # сам токен не попадает ни в ключи общего кэша, ни в память
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def cache_key(digest):
+    return f'auth-token:{digest}'
+
+
+class TokenCache:
+    """LRU с временем жизни записей: {хэш токена: пользователь}."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, digest):
+        with self.lock:
+            entry = self.entries.get(digest)
+            if entry is None:
+                return None
+            expires, user = entry
+            if expires <= time.monotonic():
+                del self.entries[digest]
+                return None
+            self.entries.move_to_end(digest)
+            return user
+
+    def set(self, digest, user, timeout):
+        with self.lock:
+            self.entries[digest] = (time.monotonic() + timeout, user)
+            self.entries.move_to_end(digest)
+            while len(self.entries) > settings.AUTH_TOKEN_CACHE_MAX_ENTRIES:
+                self.entries.popitem(last=False)
+
+    def delete(self, digests):
+        with self.lock:
+            for digest in digests:
+                self.entries.pop(digest, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+tokens = TokenCache()
+
+
+def invalidate(keys):
+    """Забыть пользователей токенов keys в процессе и в общем кэше."""
+    digests = [get_digest(key) for key in keys]
+    if not digests:
+        return
+    tokens.delete(digests)
+    if settings.AUTH_TOKEN_SHARED_CACHE:
+        cache.delete_many([cache_key(digest) for digest in digests])
+
+
+def invalidate_user(user_id):
+    invalidate(Token.objects.filter(user_id=user_id).values_list(
+        'key', flat=True))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication, которая берёт пользователя из кэша. В кэш
+    попадают только активные пользователи, неизвестные токены не
+    кэшируются.
+    """
+
+    def get_user(self, key):
+        digest = get_digest(key)
+        user = tokens.get(digest)
+        if user is None and settings.AUTH_TOKEN_SHARED_CACHE:
+            user = cache.get(cache_key(digest))
+            if user is not None:
+                tokens.set(digest, user, settings.AUTH_TOKEN_CACHE_TIMEOUT)
+        if user is None:
+            try:
+                # не с реплики: только что выданного токена там может не быть
+                token = self.get_model().objects.using(
+                    DEFAULT_DB_ALIAS).select_related('user').get(key=key)
+            except self.get_model().DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            user = token.user
+            if not user.is_active:
+                raise exceptions.AuthenticationFailed(
+                    _('User inactive or deleted.'))
+            tokens.set(digest, user, settings.AUTH_TOKEN_CACHE_TIMEOUT)
+            if settings.AUTH_TOKEN_SHARED_CACHE:
+                cache.set(cache_key(digest), user,
+                          settings.AUTH_TOKEN_CACHE_TIMEOUT)
+        # у каждого запроса своя копия: представления меняют request.user
+        return copy.copy(user)
+
+    def authenticate_credentials(self, key):
+        user = self.get_user(key)
+        return user, self.get_model()(key=key, user=user)
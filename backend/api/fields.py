@@ -0,0 +1,114 @@
+import os
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers
+
+
+def get_objects_in_bulk(queryset, pks, duplicates_message,
+                        does_not_exist_message):
+    """
+    Найти объекты по списку id одним запросом IN.
+    Повторы ищутся за O(n), отсутствующие id попадают в одну ошибку.
+    """
+    duplicates = [pk for pk, count in Counter(pks).items() if count > 1]
+    if duplicates:
+        raise serializers.ValidationError(duplicates_message)
+    objects = queryset.in_bulk(pks)
+    missing = [pk for pk in pks if pk not in objects]
+    if missing:
+        raise serializers.ValidationError(does_not_exist_message.format(
+            pk_list=', '.join(str(pk) for pk in missing)))
+    return objects
+
+
+class BulkPrimaryKeyRelatedField(serializers.ListField):
+    """
+    Список id связанных объектов. В отличие от
+    PrimaryKeyRelatedField(many=True) делает один запрос на весь список.
+    """
+    default_error_messages = {
+        'duplicates': 'Значения не должны повторяться',
+        'does_not_exist': 'Объекты с id {pk_list} не существуют',
+    }
+
+    def __init__(self, queryset, **kwargs):
+        self.queryset = queryset
+        kwargs.setdefault('child', serializers.IntegerField(min_value=1))
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        pks = super().to_internal_value(data)
+        objects = get_objects_in_bulk(
+            self.queryset.all(), pks,
+            self.error_messages['duplicates'],
+            self.error_messages['does_not_exist'],
+        )
+        return [objects[pk] for pk in pks]
+
+    def to_representation(self, data):
+        return [obj.pk for obj in data.all()]
+
+
+class BulkRelatedListSerializer(serializers.ListSerializer):
+    """
+    ListSerializer для вложенных объектов с полем-id (например,
+    {'id': 1, 'amount': 10}): все id заменяются объектами queryset
+    одним запросом. queryset задаётся в подклассе.
+    """
+    queryset = None
+    related_field = 'id'
+    default_error_messages = {
+        'duplicates': 'Значения не должны повторяться',
+        'does_not_exist': 'Объекты с id {pk_list} не существуют',
+    }
+
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+        objects = get_objects_in_bulk(
+            self.queryset.all(),
+            [item[self.related_field] for item in items],
+            self.error_messages['duplicates'],
+            self.error_messages['does_not_exist'],
+        )
+        for item in items:
+            item[self.related_field] = objects[item[self.related_field]]
+        return items
+
+
+class RecipeImageField(Base64ImageField):
+    """
+    Изображение строкой base64 или файлом из multipart/form-data,
+    с ограничением на число пикселей.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            extension = os.path.splitext(data.name)[1].lower()
+            data.name = f'{uuid.uuid4()}{extension}'
+            image_file = serializers.ImageField.to_internal_value(self, data)
+        else:
+            image_file = super().to_internal_value(data)
+        image = getattr(image_file, 'image', None)
+        if image is not None:
+            width, height = image.size
+            if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+                raise serializers.ValidationError(
+                    f'Изображение слишком большое: {width}x{height}')
+        return image_file
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Ссылки на уменьшенные копии изображения рецепта."""
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        urls = {}
+        for name, path in (value or {}).items():
+            url = default_storage.url(path)
+            urls[name] = request.build_absolute_uri(url) if request else url
+        return urls
@@ -1,6 +1,17 @@
 from django_filters.rest_framework import FilterSet, filters
+
+from api.recipes_api.catalogue import get_tags
 from recipes.models import Recipe
-from rest_framework.filters import SearchFilter
+from recipes.search import search_recipes
+
+TAGS_MATCH_CHOICES = (
+    ('any', 'хотя бы один из тэгов'),
+    ('all', 'все тэги'),
+)
+
+
+def get_tag_choices():
+    return [(slug, slug) for slug in get_tags()]
 
 
 class RecipeFilterSet(FilterSet):
@@ -8,22 +19,44 @@ class RecipeFilterSet(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = filters.MultipleChoiceFilter(
+        choices=get_tag_choices, method='filter_tags')
+    tags_match = filters.ChoiceFilter(
+        choices=TAGS_MATCH_CHOICES, method='filter_tags_match')
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('tags', 'tags_match', 'author', 'is_favorited',
+                  'is_in_shopping_cart', 'search')
 
     def filter_is_favorited(self, queryset, name, value):
         if value:
-            return queryset.filter(favorite__user=self.request.user)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if value:
-            return queryset.filter(shopcart__user=self.request.user)
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
 
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def filter_tags(self, queryset, name, value):
+        # слаги уже проверены по справочнику в get_tag_choices
+        tags = get_tags()
+        all_bits = 0
+        for none_, bit in tags.values():
+            if bit is not None:
+                all_bits |= 1 << bit
+        return Recipe.filter_by_tags(
+            queryset,
+            [tags[slug] for slug in value],
+            all_bits,
+            match_all=self.form.cleaned_data.get('tags_match') == 'all',
+        )
 
-class IngredientSearchFilter(SearchFilter):
-    search_param = 'name'
+    def filter_tags_match(self, queryset, name, value):
+        # учитывается в filter_tags
+        return queryset
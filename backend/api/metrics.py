@@ -0,0 +1,256 @@
+"""
+Метрики запросов в текстовом формате Prometheus.
+
+Каждый процесс копит метрики в памяти (Registry). Если задан
+METRICS_DIR, процесс не чаще раза в METRICS_FLUSH_INTERVAL секунд
+сохраняет их в файл <pid>.json, а /api/metrics складывает файлы всех
+процессов, поэтому ответ не зависит от того, какой воркер gunicorn
+принял запрос сборщика. Мастер gunicorn (gunicorn.conf.py) при запуске
+очищает каталог, а после выхода воркера, который перед выходом
+сохраняет метрики, переносит их в общий файл archive.json и удаляет
+<pid>.json: файлы не копятся, а счётчики не уменьшаются.
+
+Без METRICS_TOKEN метрики доступны только сотрудникам, вошедшим в
+админку.
+"""
+import glob
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+ARCHIVE = 'archive.json'
+
+COUNTERS = {
+    'http_requests_total': 'Число запросов',
+    'db_query_duration_seconds_total': 'Время SQL-запросов',
+    'db_routing_total': 'Выбор базы (основная или реплика) для запроса',
+}
+HISTOGRAMS = {
+    'http_request_duration_seconds': (
+        'Время ответа', settings.METRICS_LATENCY_BUCKETS),
+    'db_queries_per_request': (
+        'Число SQL-запросов на запрос',
+        (0, 1, 2, 5, 10, 20, 50, 100, 200)),
+    'http_response_size_bytes': (
+        'Размер тела ответа',
+        (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)),
+}
+
+
+class Registry:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.flushed = 0
+        self.counters = defaultdict(float)
+        # [счётчики корзин..., +Inf, сумма, число наблюдений]
+        self.histograms = {}
+
+    def check_fork(self):
+        # после fork (gunicorn --preload) у воркера копия метрик мастера
+        if self.pid != os.getpid():
+            self.reset()
+
+    def inc(self, name, labels, value=1):
+        self.counters[(name, labels)] += value
+
+    def observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][1]
+        values = self.histograms.setdefault(
+            (name, labels), [0] * (len(buckets) + 3))
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                values[index] += 1
+                break
+        else:
+            values[len(buckets)] += 1
+        values[-2] += value
+        values[-1] += 1
+
+    def record(self, labels, status, duration, queries, query_time, size):
+        with self.lock:
+            self.check_fork()
+            self.inc('http_requests_total', (*labels, ('status', str(status))))
+            self.inc('db_query_duration_seconds_total', labels, query_time)
+            self.observe('http_request_duration_seconds', labels, duration)
+            self.observe('db_queries_per_request', labels, queries)
+            if size is not None:
+                self.observe('http_response_size_bytes', labels, size)
+            self.flush_if_due()
+
+    def count(self, name, labels, value=1):
+        with self.lock:
+            self.check_fork()
+            self.inc(name, labels, value)
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        if time.monotonic() - self.flushed >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def snapshot(self):
+        return to_snapshot(self.counters, self.histograms)
+
+    def flush(self):
+        """Сохранить метрики процесса в METRICS_DIR (под self.lock)."""
+        self.flushed = time.monotonic()
+        if not settings.METRICS_DIR:
+            return
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        write_snapshot(
+            os.path.join(settings.METRICS_DIR, f'{self.pid}.json'),
+            self.snapshot())
+
+    def collect(self):
+        """Метрики всех процессов: {(имя, метки): значение или список}."""
+        with self.lock:
+            self.check_fork()
+            self.flush()
+            snapshots = [self.snapshot()]
+        if settings.METRICS_DIR:
+            snapshots = [
+                read_snapshot(path) for path in glob.glob(
+                    os.path.join(settings.METRICS_DIR, '*.json'))
+            ]
+        return merge(snapshot for snapshot in snapshots if snapshot)
+
+
+def to_labels(labels):
+    return tuple(tuple(pair) for pair in labels)
+
+
+def to_snapshot(counters, histograms):
+    return {
+        'counters': [[name, labels, value] for (name, labels), value
+                     in counters.items()],
+        'histograms': [[name, labels, values] for (name, labels), values
+                       in histograms.items()],
+    }
+
+
+def read_snapshot(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def write_snapshot(path, snapshot):
+    # запись целиком во временный файл и атомарная подмена
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(snapshot, file)
+    os.replace(temporary, path)
+
+
+def merge(snapshots):
+    """Сумма снимков: {(имя, метки): значение или список}."""
+    counters = defaultdict(float)
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            counters[(name, to_labels(labels))] += value
+        for name, labels, values in snapshot['histograms']:
+            key = (name, to_labels(labels))
+            if key in histograms:
+                values = [a + b for a, b in zip(histograms[key], values)]
+            histograms[key] = values
+    return counters, histograms
+
+
+def clear_files():
+    """Удалить файлы метрик прошлого запуска (мастер gunicorn)."""
+    if not settings.METRICS_DIR:
+        return
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json*')):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+
+
+def archive_process(pid):
+    """
+    Перенести метрики завершившегося воркера pid в archive.json и удалить
+    его файл. Вызывается только мастером gunicorn, поэтому archive.json
+    пишет один процесс.
+    """
+    if not settings.METRICS_DIR:
+        return
+    path = os.path.join(settings.METRICS_DIR, f'{pid}.json')
+    snapshot = read_snapshot(path)
+    if snapshot is None:
+        return
+    archive = os.path.join(settings.METRICS_DIR, ARCHIVE)
+    archived = read_snapshot(archive)
+    write_snapshot(archive, to_snapshot(
+        *merge([archived, snapshot] if archived else [snapshot])))
+    os.remove(path)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', r'\\').replace('"', r'\"').replace(
+            '\n', r'\n'))
+        for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def render(counters, histograms):
+    prefix = settings.METRICS_PREFIX
+    lines = []
+    for name, description in COUNTERS.items():
+        lines.append(f'# HELP {prefix}{name} {description}')
+        lines.append(f'# TYPE {prefix}{name} counter')
+        for (key, labels), value in sorted(counters.items()):
+            if key == name:
+                lines.append(f'{prefix}{name}{format_labels(labels)} {value}')
+    for name, (description, buckets) in HISTOGRAMS.items():
+        lines.append(f'# HELP {prefix}{name} {description}')
+        lines.append(f'# TYPE {prefix}{name} histogram')
+        for (key, labels), values in sorted(histograms.items()):
+            if key != name:
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, '+Inf'), values[:-2]):
+                cumulative += count
+                bucket_labels = format_labels((*labels, ('le', bound)))
+                lines.append(
+                    f'{prefix}{name}_bucket{bucket_labels} {cumulative}')
+            lines.append(
+                f'{prefix}{name}_sum{format_labels(labels)} {values[-2]}')
+            lines.append(
+                f'{prefix}{name}_count{format_labels(labels)} {values[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def has_access(request):
+    token = settings.METRICS_TOKEN
+    if token:
+        return constant_time_compare(
+            request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}')
+    return request.user.is_authenticated and request.user.is_staff
+
+
+def metrics_view(request):
+    if not has_access(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render(*registry.collect()), content_type=CONTENT_TYPE)
@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework.permissions import SAFE_METHODS
+
+from .authentication import get_digest
+from .metrics import registry
+from .routers import REPLICA, routing
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    """Обёртка execute_wrapper: число и время SQL-запросов."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+# счётчик запросов к базе текущего HTTP-запроса; контекст копируется в
+# потоки sync_to_async, поэтому считаются запросы из любого потока
+current_counter = ContextVar('current_counter', default=None)
+
+
+def count_queries(execute, sql, params, many, context):
+    counter = current_counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    return counter(execute, sql, params, many, context)
+
+
+def install_query_counter(connection):
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+@receiver(connection_created)
+def on_connection_created(sender, connection, **kwargs):
+    install_query_counter(connection)
+
+
+class AsyncCapableMiddleware:
+    """
+    Основа для middleware, которые работают и под WSGI, и под ASGI без
+    перехода в общий синхронный поток: иначе Django 3.2 выполняет всю
+    цепочку под ней в этом потоке и запросы идут по одному.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # так Django узнаёт асинхронный экземпляр (как MiddlewareMixin)
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        state = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.stop(request, state)
+        return self.finish(request, response, state)
+
+    async def __acall__(self, request):
+        state = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.stop(request, state)
+        if self.finish_is_blocking(request):
+            return await sync_to_async(self.finish)(request, response, state)
+        return self.finish(request, response, state)
+
+    def start(self, request):
+        return None
+
+    def stop(self, request, state):
+        pass
+
+    def finish(self, request, response, state):
+        return response
+
+    def finish_is_blocking(self, request):
+        return False
+
+
+class MetricsMiddleware(AsyncCapableMiddleware):
+    """
+    Время ответа, число и время SQL-запросов, размер ответа и статус
+    для каждого представления. Метки берутся из имени маршрута
+    (recipes-list, recipes-download-shopping-cart, subscriptions, ...)
+    и действия viewset, а не из пути, чтобы их число было ограничено.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        for connection in connections.all():
+            install_query_counter(connection)
+
+    @staticmethod
+    def get_labels(request):
+        match = request.resolver_match
+        if match is None:
+            return (('view', 'unmatched'), ('action', ''),
+                    ('method', request.method))
+        actions = getattr(match.func, 'actions', None) or {}
+        action = actions.get(request.method.lower(), request.method.lower())
+        return (('view', match.url_name or match.view_name),
+                ('action', action), ('method', request.method))
+
+    def start(self, request):
+        counter = QueryCounter()
+        return counter, current_counter.set(counter), time.perf_counter()
+
+    def stop(self, request, state):
+        current_counter.reset(state[1])
+
+    def finish(self, request, response, state):
+        counter, none_, started = state
+        duration = time.perf_counter() - started
+        if response.streaming:
+            size = response.get('Content-Length')
+            size = int(size) if size else None
+        else:
+            size = len(response.content)
+        registry.record(self.get_labels(request), response.status_code,
+                        duration, counter.count, counter.duration, size)
+        return response
+
+
+class ReplicaMiddleware(AsyncCapableMiddleware):
+    """
+    Направляет безопасные запросы к маршрутам REPLICA_READ_ROUTES на
+    реплику. После запроса на запись клиент REPLICA_STICKY_SECONDS читает
+    из основной базы, чтобы увидеть свои изменения: признак хранится в
+    cookie и, для запросов с токеном, в кэше по хэшу токена. Решения
+    пишутся в журнал (уровень DEBUG) и в метрику db_routing_total.
+    """
+
+    @staticmethod
+    def get_token_digest(request):
+        keyword, none_, key = request.META.get(
+            'HTTP_AUTHORIZATION', '').partition(' ')
+        return get_digest(key) if keyword == 'Token' and key else None
+
+    @staticmethod
+    def sticky_key(digest):
+        return f'replica-sticky:{digest}'
+
+    def is_sticky(self, request):
+        if settings.REPLICA_STICKY_COOKIE in request.COOKIES:
+            return True
+        digest = self.get_token_digest(request)
+        return digest is not None and bool(cache.get(self.sticky_key(digest)))
+
+    def choose(self, request):
+        """(база, причина) для чтения в запросе."""
+        if request.method not in SAFE_METHODS:
+            return DEFAULT_DB_ALIAS, 'write'
+        if request.resolver_match.url_name not in (
+                settings.REPLICA_READ_ROUTES):
+            return DEFAULT_DB_ALIAS, 'route'
+        if self.is_sticky(request):
+            return DEFAULT_DB_ALIAS, 'sticky'
+        return REPLICA, 'read'
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if REPLICA not in settings.DATABASES:
+            return None
+        alias, reason = self.choose(request)
+        view = request.resolver_match.url_name or 'unnamed'
+        logger.debug('%s %s: %s (%s)', request.method, request.path,
+                     alias, reason)
+        registry.count('db_routing_total', (
+            ('view', view), ('database', alias), ('reason', reason)))
+        state = routing.get()
+        if alias == REPLICA and state is not None:
+            state['alias'] = alias
+        return None
+
+    def mark_sticky(self, request, response):
+        timeout = settings.REPLICA_STICKY_SECONDS
+        response.set_cookie(
+            settings.REPLICA_STICKY_COOKIE, '1', max_age=timeout,
+            httponly=True, samesite='Lax',
+        )
+        digest = self.get_token_digest(request)
+        if digest is not None:
+            cache.set(self.sticky_key(digest), True, timeout)
+
+    def start(self, request):
+        return routing.set({})
+
+    def stop(self, request, state):
+        routing.reset(state)
+
+    def is_write(self, request):
+        return (request.method not in SAFE_METHODS
+                and REPLICA in settings.DATABASES)
+
+    def finish(self, request, response, state):
+        if self.is_write(request):
+            self.mark_sticky(request, response)
+        return response
+
+    def finish_is_blocking(self, request):
+        # запись признака в кэш - сетевой запрос
+        return self.is_write(request)
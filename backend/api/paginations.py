@@ -1,5 +1,116 @@
-from rest_framework.pagination import PageNumberPagination
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (BasePagination, CursorPagination,
+                                       PageNumberPagination)
 
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Курсор по всем полям ordering: DRF сравнивает только первое поле и
+    пропускает повторы через OFFSET. Здесь позиция хранит значение
+    каждого поля, и страница начинается строго после этого кортежа.
+    """
+    position_separator = '|'
+
+    def decode_cursor(self, request):
+        # позицию разбирает paginate_queryset, базовому классу достаются
+        # только направление и смещение
+        cursor = super().decode_cursor(request)
+        return cursor and cursor._replace(position=None)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        cursor = super().decode_cursor(request)
+        if cursor is not None and cursor.position is not None:
+            self.ordering = self.get_ordering(request, queryset, view)
+            try:
+                queryset = queryset.filter(self.get_keyset_condition(cursor))
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+        page = super().paginate_queryset(queryset, request, view)
+        if page is None or cursor is None or cursor.position is None:
+            return page
+        self.cursor = cursor
+        if cursor.reverse:
+            self.has_next = True
+            self.next_position = cursor.position
+        else:
+            self.has_previous = True
+            self.previous_position = cursor.position
+        if self.template is not None:
+            self.display_page_controls = True
+        return page
+
+    def get_keyset_condition(self, cursor):
+        """(a, b) после (x, y): a после x или a = x и b после y."""
+        values = cursor.position.split(
+            self.position_separator, len(self.ordering) - 1)
+        if len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        condition = Q()
+        equal = Q()
+        for order, value in zip(self.ordering, values):
+            field = order.lstrip('-')
+            lookup = 'lt' if order.startswith('-') != cursor.reverse else 'gt'
+            condition |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        return condition
+
+    def _get_position_from_instance(self, instance, ordering):
+        return self.position_separator.join(
+            super(KeysetCursorPagination, self)._get_position_from_instance(
+                instance, (order,))
+            for order in ordering
+        )
+
+
+class RecipeCursorPagination(KeysetCursorPagination):
+    page_size_query_param = 'limit'
+    ordering = ('-pub_date', '-id')
+
+
+class FollowCursorPagination(CursorPagination):
+    page_size_query_param = 'limit'
+    ordering = ('id',)
+
+
+class CursorOrPageNumberPagination(BasePagination):
+    """
+    По умолчанию постраничная пагинация (?page=N) с подсчётом count.
+    Параметр ?cursor= включает keyset-пагинацию без COUNT(*) и OFFSET:
+    стоимость любой страницы одинакова.
+    """
+    cursor_query_param = 'cursor'
+    page_number_pagination_class = CustomPageNumberPagination
+    cursor_pagination_class = None
+
+    def get_paginator(self, request):
+        if (self.cursor_pagination_class is not None
+                and self.cursor_query_param in request.query_params):
+            return self.cursor_pagination_class()
+        return self.page_number_pagination_class()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = self.get_paginator(request)
+        page = self.paginator.paginate_queryset(queryset, request, view)
+        self.display_page_controls = getattr(
+            self.paginator, 'display_page_controls', False)
+        return page
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+
+class RecipePagination(CursorOrPageNumberPagination):
+    cursor_pagination_class = RecipeCursorPagination
+
+
+class FollowPagination(CursorOrPageNumberPagination):
+    cursor_pagination_class = FollowCursorPagination
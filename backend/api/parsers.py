@@ -0,0 +1,95 @@
+import json
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from rest_framework import exceptions, parsers, status
+
+
+class FileTooLarge(exceptions.APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Файл слишком большой'
+    default_code = 'file_too_large'
+
+
+class SizeLimitUploadHandler(FileUploadHandler):
+    """
+    Первый обработчик в цепочке: считает байты каждого файла и прерывает
+    разбор запроса, как только файл превысит max_size. Данные передаются
+    дальше стандартным обработчикам (в память или во временный файл).
+    """
+
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = max_size
+        self.received = 0
+        self.exceeded = False
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.exceeded = True
+            # остаток тела не дочитывается, соединение закрывается
+            raise StopUpload(connection_reset=True)
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+class JSONFieldsMultiPartParser(parsers.MultiPartParser):
+    """
+    multipart/form-data, в котором вложенные поля (списки, объекты)
+    передаются строками JSON. Файлы разбираются потоково с ограничением
+    размера settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE, а запрос с заявленным
+    размером больше settings.RECIPE_MAX_REQUEST_SIZE отклоняется сразу.
+    """
+    json_fields = ('ingredients', 'tags')
+
+    @staticmethod
+    def get_content_length(django_request):
+        try:
+            return int(django_request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return 0
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        django_request = parser_context['request']._request
+        if (self.get_content_length(django_request)
+                > settings.RECIPE_MAX_REQUEST_SIZE):
+            raise FileTooLarge(
+                f'Размер запроса больше '
+                f'{settings.RECIPE_MAX_REQUEST_SIZE} байт')
+        limit_handler = SizeLimitUploadHandler(
+            django_request, settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE)
+        django_request.upload_handlers = [
+            limit_handler, *django_request.upload_handlers]
+        result = super().parse(stream, media_type, parser_context)
+        if limit_handler.exceeded:
+            for file in result.files.values():
+                file.close()
+            raise FileTooLarge(
+                f'Размер файла больше '
+                f'{settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE} байт')
+        data = {}
+        for key, values in result.data.lists():
+            if key in self.json_fields:
+                data[key] = self.load_json(key, values)
+            else:
+                data[key] = values[-1]
+        # Request.data дополняется файлами через dict.update, поэтому
+        # файлы тоже отдаются обычным словарём
+        return parsers.DataAndFiles(data, result.files.dict())
+
+    def load_json(self, key, values):
+        try:
+            values = [json.loads(value) for value in values]
+        except ValueError as error:
+            raise exceptions.ParseError(
+                f'Поле {key}: некорректный JSON ({error})')
+        if len(values) == 1 and isinstance(values[0], (list, dict)):
+            return values[0]
+        return values
@@ -1,4 +1,5 @@
 from rest_framework import permissions
+
 from users.models import User
 
 
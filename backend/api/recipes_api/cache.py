@@ -0,0 +1,135 @@
+"""
+Кэш представлений рецептов.
+
+В кэше хранится часть ответа RecipeListGetSerializer, одинаковая для всех
+пользователей. Флаги is_favorited, is_in_shopping_cart и
+author.is_subscribed в кэш не попадают и подставляются при ответе.
+Каждому рецепту соответствует ключ версии: инвалидация удаляет его,
+и следующий запрос записывает представление под новой версией.
+
+Реплика может отставать, поэтому REPLICA_STICKY_SECONDS после записи
+рецепта (это же время клиент после записи читает из основной базы)
+представления, прочитанные с реплики, в кэш не сохраняются: иначе
+старые данные попали бы под новую версию.
+"""
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from api.routers import REPLICA, reads_replica
+
+VIEWER_FIELDS = ('is_favorited', 'is_in_shopping_cart')
+AUTHOR_VIEWER_FIELDS = ('is_subscribed',)
+
+stats = Counter()
+
+
+def version_key(recipe_id):
+    return f'recipe-version:{recipe_id}'
+
+
+def written_key(recipe_id):
+    return f'recipe-written:{recipe_id}'
+
+
+def representation_key(recipe_id, version, origin):
+    return f'recipe-repr:{recipe_id}:{version}:{origin}'
+
+
+def get_origin(request):
+    # image отдаётся абсолютной ссылкой, поэтому она зависит от хоста
+    if request is None:
+        return ''
+    return f'{request.scheme}://{request.get_host()}'
+
+
+def get_versions(recipe_ids):
+    keys = {recipe_id: version_key(recipe_id) for recipe_id in recipe_ids}
+    versions = cache.get_many(keys.values())
+    result = {}
+    new_versions = {}
+    for recipe_id, key in keys.items():
+        if key in versions:
+            result[recipe_id] = versions[key]
+        else:
+            result[recipe_id] = new_versions[key] = uuid.uuid4().hex
+    if new_versions:
+        cache.set_many(new_versions, timeout=settings.RECIPE_CACHE_TIMEOUT)
+    return result
+
+
+def get_recently_written(recipe_ids):
+    written = cache.get_many([written_key(pk) for pk in recipe_ids])
+    return {pk for pk in recipe_ids if written_key(pk) in written}
+
+
+def get_many(recipe_ids, request, action):
+    """
+    Вернуть {recipe_id: (ключ, представление или None)}. Ключ None:
+    представление нельзя сохранять в кэш.
+    """
+    origin = get_origin(request)
+    keys = {
+        recipe_id: representation_key(recipe_id, version, origin)
+        for recipe_id, version in get_versions(recipe_ids).items()
+    }
+    cached = cache.get_many(keys.values())
+    if reads_replica():
+        for recipe_id in get_recently_written(
+                [pk for pk, key in keys.items() if key not in cached]):
+            keys[recipe_id] = None
+    stats[(action, 'hit')] += len(cached)
+    stats[(action, 'miss')] += len(keys) - len(cached)
+    return {
+        recipe_id: (key, cached.get(key))
+        for recipe_id, key in keys.items()
+    }
+
+
+def set_many(representations):
+    """Сохранить {ключ: полное представление} без пользовательских полей."""
+    data = {}
+    for key, representation in representations.items():
+        if key is None:
+            continue
+        base = dict(representation)
+        for field in VIEWER_FIELDS:
+            base[field] = None
+        base['author'] = dict(base['author'])
+        for field in AUTHOR_VIEWER_FIELDS:
+            base['author'][field] = None
+        data[key] = base
+    cache.set_many(data, timeout=settings.RECIPE_CACHE_TIMEOUT)
+
+
+def invalidate(recipe_ids):
+    # после коммита, иначе параллельный запрос успеет закэшировать
+    # старые данные под новой версией
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        transaction.on_commit(lambda: expire(recipe_ids))
+
+
+def expire(recipe_ids):
+    # отметка о записи ставится раньше, чем удаляется версия
+    if REPLICA in settings.DATABASES:
+        cache.set_many(dict.fromkeys(map(written_key, recipe_ids), True),
+                       timeout=settings.REPLICA_STICKY_SECONDS)
+    cache.delete_many([version_key(pk) for pk in recipe_ids])
+
+
+def get_hit_rates():
+    """Доля попаданий в кэш по действиям (list, retrieve, ...)."""
+    rates = {}
+    for action in {action for action, _ in stats}:
+        hits = stats[(action, 'hit')]
+        total = hits + stats[(action, 'miss')]
+        rates[action] = {
+            'hits': hits,
+            'total': total,
+            'rate': hits / total if total else 0.0,
+        }
+    return rates
@@ -0,0 +1,129 @@
+"""
+Версии справочников (тэги, ингредиенты) и условные ответы для них.
+
+Версия справочника хранится в базе (CatalogueVersion) и меняется при
+любой записи в Tag или Ingredient (см. api/signals.py), а также после
+загрузки командами, которые пишут в обход сигналов. Кэш по умолчанию
+может быть у каждого процесса своим, поэтому в нём версия живёт не
+дольше CATALOGUE_VERSION_TIMEOUT секунд: столько другие процессы могут
+отдавать прежнюю версию. По версии строится сильный ETag, поэтому на
+If-None-Match можно ответить 304, не выполняя запросов к базе.
+Отрендеренные тела ответов хранятся в памяти процесса для каждой
+версии. Всё, что кэшируется под версией, читается из основной базы:
+отстающая реплика сохранила бы старые данные под новой версией.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import parse_etags
+
+from api.routers import primary
+from recipes.models import CatalogueVersion, Tag
+
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
+
+
+def version_key(catalogue):
+    return f'catalogue-version:{catalogue}'
+
+
+def get_version(catalogue):
+    key = version_key(catalogue)
+    version = cache.get(key)
+    if version is None:
+        version = CatalogueVersion.get(catalogue)
+        cache.set(key, version, timeout=settings.CATALOGUE_VERSION_TIMEOUT)
+    return version
+
+
+def bump_version(catalogue):
+    # запись в базе видна другим процессам только после коммита; кэш
+    # этого процесса сбрасывается тогда же, иначе параллельный запрос
+    # успеет закэшировать старые данные под новой версией
+    CatalogueVersion.bump(catalogue)
+    transaction.on_commit(lambda: cache.delete(version_key(catalogue)))
+
+
+_tags = (None, {})
+_tags_lock = threading.Lock()
+
+
+def get_tags():
+    """
+    {slug: (id, bit)} тэгов текущей версии справочника. Хранится в памяти
+    процесса, база читается только после изменения тэгов.
+    """
+    global _tags
+    version = get_version(TAGS)
+    cached_version, tags = _tags
+    if cached_version != version:
+        with _tags_lock:
+            tags = {
+                slug: (pk, bit) for pk, slug, bit
+                in Tag.objects.using(DEFAULT_DB_ALIAS).values_list(
+                    'id', 'slug', 'bit')
+            }
+            _tags = (version, tags)
+    return tags
+
+
+class CatalogueETagMixin:
+    """
+    Добавляет ETag и Cache-Control к list/retrieve справочника и отвечает
+    304 Not Modified, если у клиента актуальная версия.
+    """
+    catalogue = None
+    # LRU {ETag: тело ответа}
+    _rendered = OrderedDict()
+    _rendered_lock = threading.Lock()
+
+    def get_cache_params(self, request, **kwargs):
+        """Всё, от чего зависит ответ: из этого строится ETag."""
+        return tuple(sorted(kwargs.items()))
+
+    def get_etag(self, params, version):
+        digest = hashlib.sha1(repr(params).encode()).hexdigest()
+        return f'"{self.catalogue}-{version}-{digest[:16]}"'
+
+    def catalogue_response(self, handler, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if renderer.format != 'json':
+            return handler(request, *args, **kwargs)
+        etag = self.get_etag(self.get_cache_params(request, **kwargs),
+                             get_version(self.catalogue))
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = HttpResponseNotModified()
+        else:
+            with self._rendered_lock:
+                body = self._rendered.get(etag)
+                if body is not None:
+                    self._rendered.move_to_end(etag)
+            if body is None:
+                with primary():
+                    data = handler(request, *args, **kwargs).data
+                body = renderer.render(
+                    data, renderer.media_type, self.get_renderer_context())
+                with self._rendered_lock:
+                    self._rendered[etag] = body
+                    while len(self._rendered) > (
+                            settings.CATALOGUE_RENDERED_MAX):
+                        self._rendered.popitem(last=False)
+            response = HttpResponse(body, content_type=renderer.media_type)
+        response['ETag'] = etag
+        response['Cache-Control'] = settings.CATALOGUE_CACHE_CONTROL
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.catalogue_response(
+            super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.catalogue_response(
+            super().retrieve, request, *args, **kwargs)
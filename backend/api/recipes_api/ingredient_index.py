@@ -0,0 +1,104 @@
+"""
+Индекс ингредиентов в памяти процесса для автодополнения.
+
+Нормализованные названия хранятся в отсортированном списке, поиск по
+префиксу — bisect и проход по соседним ключам. Если совпадений по
+префиксу меньше лимита, результат дополняется ингредиентами, которые
+содержат запрос в середине названия: их ищет тот же bisect по
+отсортированным суффиксам названий, без перебора всего справочника.
+Пустой запрос, как и раньше, возвращает весь справочник в порядке id.
+Индекс строится при первом обращении и перестраивается, когда меняется
+версия справочника ингредиентов (см. catalogue.py).
+"""
+import heapq
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+
+from django.db import DEFAULT_DB_ALIAS
+
+from recipes.models import Ingredient
+
+from . import catalogue
+
+
+def normalize(name):
+    return ' '.join(name.casefold().replace('ё', 'е').split())
+
+
+# keys и rows отсортированы по названию, by_id - весь справочник по id,
+# suffixes - суффиксы названий без первого символа, отсортированные, и
+# для каждого номер названия в keys
+IndexData = namedtuple(
+    'IndexData', ('keys', 'rows', 'by_id', 'suffixes', 'suffix_positions'))
+
+
+class IngredientIndex:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._data = IndexData((), (), (), (), ())
+
+    def _build(self):
+        # индекс строится под версией справочника, поэтому не с реплики
+        ingredients = sorted(
+            (normalize(name), pk, name, measurement_unit)
+            for pk, name, measurement_unit in Ingredient.objects.using(
+                DEFAULT_DB_ALIAS).values_list('id', 'name', 'measurement_unit')
+        )
+        keys = tuple(item[0] for item in ingredients)
+        rows = tuple(
+            {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+            for none_, pk, name, measurement_unit in ingredients
+        )
+        suffixes = sorted(
+            (key[start:], position)
+            for position, key in enumerate(keys)
+            for start in range(1, len(key))
+        )
+        return IndexData(
+            keys, rows, tuple(sorted(rows, key=lambda row: row['id'])),
+            tuple(suffix for suffix, none_ in suffixes),
+            tuple(position for none_, position in suffixes),
+        )
+
+    def _get_data(self):
+        version = catalogue.get_version(catalogue.INGREDIENTS)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._data = self._build()
+                    self._version = version
+        return self._data
+
+    def search(self, query, limit):
+        data = self._get_data()
+        query = normalize(query)
+        if not query:
+            return list(data.by_id)
+        keys = data.keys
+        start = bisect_left(keys, query)
+        result = []
+        for position in range(start, len(keys)):
+            if len(result) >= limit or not keys[position].startswith(query):
+                break
+            result.append(data.rows[position])
+        if len(result) >= limit:
+            return result
+        positions = set()
+        suffixes = data.suffixes
+        for index in range(bisect_left(suffixes, query), len(suffixes)):
+            if not suffixes[index].startswith(query):
+                break
+            position = data.suffix_positions[index]
+            if not keys[position].startswith(query):
+                positions.add(position)
+        # в порядке названий, как и совпадения по префиксу
+        result.extend(
+            data.rows[position]
+            for position in heapq.nsmallest(limit - len(result), positions))
+        return result
+
+
+ingredient_index = IngredientIndex()
@@ -1,15 +1,26 @@
-from api.users_api.serializers import CustomUserSerializer
-from drf_extra_fields.fields import Base64ImageField
-from recipes.models import (AmountOfIngredient, Favorite, Ingredient, Recipe,
-                            ShoppingCart, Tag)
+from django.db import models, transaction
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 from rest_framework.validators import UniqueValidator
 
+from api.fields import (BulkPrimaryKeyRelatedField, BulkRelatedListSerializer,
+                        ImageVariantsField, RecipeImageField)
+from api.users_api.serializers import CustomUserSerializer
+from recipes.images import generate_image_variants
+from recipes.models import (AmountOfIngredient, Favorite, Ingredient, Recipe,
+                            ShoppingCart, ShoppingListExport,
+                            ShoppingListTotal, Tag)
+from recipes.search import render_highlight
+from recipes.tasks import run_in_background
+
+from . import cache as recipe_cache
+
 
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tag
-        fields = '__all__'
+        fields = ('id', 'color', 'name', 'slug')
         read_only_fields = '__all__',
 
 
@@ -21,10 +32,11 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class RepresentationRecipeSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
 class ShoppingCartSerializer(serializers.ModelSerializer):
@@ -43,6 +55,12 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
                 {'status': 'Рецепт уже есть в списке покупок'})
         return data
 
+    def create(self, validated_data):
+        with transaction.atomic():
+            instance = super().create(validated_data)
+            ShoppingListTotal.add_recipe(instance.user, instance.recipe)
+        return instance
+
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
@@ -50,6 +68,30 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
             instance.recipe, context=context).data
 
 
+class ShoppingListExportSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField(read_only=True)
+
+    class Meta:
+        model = ShoppingListExport
+        fields = ('id', 'format', 'status', 'error', 'created',
+                  'download_url')
+        read_only_fields = ('status', 'error', 'created')
+
+    def validate(self, data):
+        request = self.context.get('request')
+        if not request.user.shopcart.exists():
+            raise serializers.ValidationError(
+                {'status': 'Список покупок пуст'})
+        return data
+
+    def get_download_url(self, obj):
+        if obj.status != ShoppingListExport.DONE:
+            return None
+        request = self.context.get('request')
+        url = reverse('shopping_list_exports-download', args=(obj.pk,))
+        return request.build_absolute_uri(url) if request else url
+
+
 class FavoriteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Favorite
@@ -89,13 +131,29 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
         )
 
 
+class AddIngredientsListSerializer(BulkRelatedListSerializer):
+    queryset = Ingredient.objects.all()
+    default_error_messages = {
+        'duplicates': 'Ингредиенты должны быть разными',
+        'does_not_exist': 'Ингредиенты с id {pk_list} не существуют',
+    }
+
+
 class AddIngredientsSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField(min_value=1)
     amount = serializers.IntegerField(write_only=True)
 
     class Meta:
         model = AmountOfIngredient
         fields = ('id', 'amount')
+        list_serializer_class = AddIngredientsListSerializer
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        return self.child.to_representations(list(iterable))
 
 
 class RecipeListGetSerializer(serializers.ModelSerializer):
@@ -104,6 +162,7 @@ class RecipeListGetSerializer(serializers.ModelSerializer):
     author = CustomUserSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     ingredients = serializers.SerializerMethodField(read_only=True)
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
@@ -116,27 +175,84 @@ class RecipeListGetSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time'
         )
         ordering = ['name']
+        list_serializer_class = RecipeListSerializer
         # read_only_fields = ('author',)
 
-    def check_anonymous_help_func(self, obj, model):
+    def check_anonymous_help_func(self, obj, model, annotation):
+        # RecipeViewSet.get_queryset уже посчитал флаг одним запросом
+        annotated = getattr(obj, annotation, None)
+        if annotated is not None:
+            return annotated
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
         return model.objects.filter(user=request.user, recipe=obj).exists()
 
     def get_is_favorited(self, obj):
-        return self.check_anonymous_help_func(obj=obj, model=Favorite)
+        return self.check_anonymous_help_func(
+            obj=obj, model=Favorite, annotation='is_favorited')
 
     def get_is_in_shopping_cart(self, obj):
-        return self.check_anonymous_help_func(obj=obj, model=ShoppingCart)
+        return self.check_anonymous_help_func(
+            obj=obj, model=ShoppingCart, annotation='is_in_shopping_cart')
 
     def get_ingredients(self, obj):
-        queryset = AmountOfIngredient.objects.filter(recipe=obj)
-        return IngredientAmountSerializer(queryset, many=True).data
+        return IngredientAmountSerializer(obj.amount.all(), many=True).data
+
+    def to_representation(self, instance):
+        return self.to_representations([instance])[0]
+
+    def to_representations(self, recipes):
+        view = self.context.get('view')
+        cached = recipe_cache.get_many(
+            [recipe.pk for recipe in recipes],
+            request=self.context.get('request'),
+            action=getattr(view, 'action', None) or 'other',
+        )
+        missing = [
+            recipe for recipe in recipes if cached[recipe.pk][1] is None]
+        prefetch_related_objects(missing, 'tags', 'amount__ingredient')
+        fresh = {}
+        for recipe in missing:
+            author_is_subscribed = getattr(
+                recipe, 'author_is_subscribed', None)
+            if author_is_subscribed is not None:
+                recipe.author.is_subscribed = author_is_subscribed
+            fresh[recipe.pk] = super().to_representation(recipe)
+        recipe_cache.set_many(
+            {cached[pk][0]: data for pk, data in fresh.items()})
+
+        result = []
+        for recipe in recipes:
+            data = fresh.get(recipe.pk)
+            if data is None:
+                data = cached[recipe.pk][1]
+                data['is_favorited'] = self.get_is_favorited(recipe)
+                data['is_in_shopping_cart'] = self.get_is_in_shopping_cart(
+                    recipe)
+                data['author']['is_subscribed'] = self.get_author_subscribed(
+                    recipe)
+            search_rank = getattr(recipe, 'search_rank', None)
+            if search_rank is not None:
+                # результат полнотекстового поиска, в кэш не попадает
+                data = dict(data, search={
+                    'rank': search_rank,
+                    'name': render_highlight(recipe.search_name),
+                    'text': render_highlight(recipe.search_text),
+                })
+            result.append(data)
+        return result
+
+    def get_author_subscribed(self, obj):
+        author_is_subscribed = getattr(obj, 'author_is_subscribed', None)
+        if author_is_subscribed is not None:
+            return author_is_subscribed
+        return self.fields['author'].get_is_subscribed(obj.author)
 
 
 class RecipePostSerializer(serializers.ModelSerializer):
@@ -147,9 +263,14 @@ class RecipePostSerializer(serializers.ModelSerializer):
             message='Рецепт с таким именем уже существует')],
     )
     ingredients = AddIngredientsSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(), many=True)
-    image = Base64ImageField()
+    tags = BulkPrimaryKeyRelatedField(
+        queryset=Tag.objects.all(),
+        error_messages={
+            'duplicates': 'Тэги не должны повторяться',
+            'does_not_exist': 'Тэги с id {pk_list} не существуют',
+        },
+    )
+    image = RecipeImageField()
 
     class Meta:
         model = Recipe
@@ -169,14 +290,7 @@ class RecipePostSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({
                 'ingredients': 'Добавьте хотя бы один ингредиент'
             })
-        ingredients_list = []
         for ingredient in ingredients:
-            ingredient_id = ingredient['id']
-            if ingredient_id in ingredients_list:
-                raise serializers.ValidationError({
-                    'ingredients': 'Ингредиенты должны быть разными'
-                })
-            ingredients_list.append(ingredient_id)
             amount = ingredient['amount']
             if int(amount) <= 0:
                 raise serializers.ValidationError({
@@ -188,13 +302,6 @@ class RecipePostSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({
                 'tags': 'Нужно выбрать хотя бы один тэг'
             })
-        tags_list = []
-        for tag in tags:
-            if tag in tags_list:
-                raise serializers.ValidationError({
-                    'tags': 'Тэги не должны повторяться'
-                })
-            tags_list.append(tag)
 
         cooking_time = data['cooking_time']
         if int(cooking_time) <= 0:
@@ -205,28 +312,81 @@ class RecipePostSerializer(serializers.ModelSerializer):
 
     @staticmethod
     def create_link_ingredients_recipe(ingredients_obj, recipe):
-        for obj in ingredients_obj:
-            AmountOfIngredient.objects.create(
+        AmountOfIngredient.objects.bulk_create([
+            AmountOfIngredient(
                 recipe=recipe,
                 ingredient=obj['id'],
                 amount=obj['amount']
             )
+            for obj in ingredients_obj
+        ])
+
+    @staticmethod
+    def update_link_ingredients_recipe(ingredients_obj, recipe):
+        """
+        Привести ингредиенты рецепта к ingredients_obj минимальным числом
+        запросов: bulk insert новых, bulk update изменённых количеств и
+        один delete лишних. Возвращает старые и новые количества
+        {ingredient_id: amount} для пересчёта списков покупок.
+        """
+        new_amounts = {obj['id'].id: obj['amount'] for obj in ingredients_obj}
+        old_amounts = {}
+        existing = {}
+        to_delete = []
+        # без сортировки по умолчанию: она добавляет JOIN ингредиентов
+        for amount in AmountOfIngredient.objects.filter(
+                recipe=recipe).order_by():
+            old_amounts[amount.ingredient_id] = (
+                old_amounts.get(amount.ingredient_id, 0) + amount.amount)
+            if (amount.ingredient_id in existing
+                    or amount.ingredient_id not in new_amounts):
+                to_delete.append(amount.pk)
+            else:
+                existing[amount.ingredient_id] = amount
+
+        to_update = []
+        for ingredient_id, amount in existing.items():
+            if amount.amount != new_amounts[ingredient_id]:
+                amount.amount = new_amounts[ingredient_id]
+                to_update.append(amount)
+        to_create = [
+            AmountOfIngredient(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount)
+            for ingredient_id, amount in new_amounts.items()
+            if ingredient_id not in existing
+        ]
+
+        if to_delete:
+            AmountOfIngredient.objects.filter(pk__in=to_delete).delete()
+        if to_update:
+            AmountOfIngredient.objects.bulk_update(to_update, ('amount',))
+        if to_create:
+            AmountOfIngredient.objects.bulk_create(to_create)
+        return old_amounts, new_amounts
 
     def create(self, validated_data):
         author = self.context.get('request').user
         ingredients_obj = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
-        recipe = Recipe.objects.create(author=author, **validated_data)
-        self.create_link_ingredients_recipe(ingredients_obj, recipe)
-        recipe.tags.set(tags)
+        with transaction.atomic():
+            recipe = Recipe.objects.create(author=author, **validated_data)
+            self.create_link_ingredients_recipe(ingredients_obj, recipe)
+            recipe.tags.set(tags)
+            run_in_background(generate_image_variants, recipe.pk)
         return recipe
 
     def update(self, instance, validated_data):
         ingredients_obj = validated_data.pop('ingredients')
-        instance = super().update(instance, validated_data)
-        instance.ingredients.clear()
-        instance.tags.set(validated_data['tags'])
-        self.create_link_ingredients_recipe(ingredients_obj, instance)
+        tags = validated_data.pop('tags')
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            if 'image' in validated_data:
+                run_in_background(generate_image_variants, instance.pk)
+            instance.tags.set(tags)
+            old_amounts, new_amounts = self.update_link_ingredients_recipe(
+                ingredients_obj, instance)
+            ShoppingListTotal.change_recipe(
+                instance, old_amounts, new_amounts)
         return instance
 
     def to_representation(self, instance):
@@ -1,36 +1,75 @@
-from api.filters import IngredientSearchFilter, RecipeFilterSet
-from api.paginations import CustomPageNumberPagination
-from api.permissions import IsAuthorOrAdminOrReadOnly
-from django.http import HttpResponse
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BooleanField, Exists, OuterRef, Value
+from django.http import FileResponse, HttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
-from reportlab.pdfgen import canvas
-from rest_framework import status
+from rest_framework import mixins, status
 from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
+from rest_framework.viewsets import (GenericViewSet, ModelViewSet,
+                                     ReadOnlyModelViewSet)
+
+from api.filters import RecipeFilterSet
+from api.paginations import RecipeCursorPagination, RecipePagination
+from api.parsers import JSONFieldsMultiPartParser
+from api.permissions import IsAuthorOrAdminOrReadOnly
+from recipes.exporters import EXPORT_FORMATS, get_filename
+from recipes.models import (Favorite, FeedItem, Ingredient, Recipe,
+                            ShoppingCart, ShoppingListExport,
+                            ShoppingListTotal, Tag)
+from recipes.tasks import run_export, run_in_background
+from users.models import Follow
 
+from .catalogue import INGREDIENTS, TAGS, CatalogueETagMixin
+from .ingredient_index import ingredient_index, normalize
 from .serializers import (FavoriteSerializer, IngredientSerializer,
                           RecipeListGetSerializer, RecipePostSerializer,
-                          ShoppingCartSerializer, TagSerializer)
+                          ShoppingCartSerializer, ShoppingListExportSerializer,
+                          TagSerializer)
 
 
-class TagsViewSet(ReadOnlyModelViewSet):
+class TagsViewSet(CatalogueETagMixin, ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
+    catalogue = TAGS
 
 
-class IngredientsViewSet(ReadOnlyModelViewSet):
+class IngredientsViewSet(CatalogueETagMixin, ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all().order_by('id')
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
-    filter_backends = (IngredientSearchFilter,)
-    search_fields = (r'^name', )
+    catalogue = INGREDIENTS
+    search_param = 'name'
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params['limit'])
+        except (KeyError, ValueError):
+            return settings.INGREDIENT_SEARCH_LIMIT
+        return max(1, min(limit, settings.INGREDIENT_SEARCH_MAX_LIMIT))
+
+    def get_cache_params(self, request, **kwargs):
+        if self.action != 'list':
+            return super().get_cache_params(request, **kwargs)
+        # ?name=Соль и ?name=соль дают один ответ и одну запись кэша, а
+        # без name отдаётся весь справочник независимо от limit
+        name = normalize(request.query_params.get(self.search_param, ''))
+        return (name, self.get_limit()) if name else (name,)
+
+    def search(self, request):
+        return Response(ingredient_index.search(
+            request.query_params.get(self.search_param, ''),
+            self.get_limit()
+        ))
+
+    def list(self, request, *args, **kwargs):
+        return self.catalogue_response(self.search, request)
 
 
 class RecipeViewSet(ModelViewSet):
@@ -38,10 +77,34 @@ class RecipeViewSet(ModelViewSet):
     permission_classes = [IsAuthorOrAdminOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilterSet
-    pagination_class = CustomPageNumberPagination
+    pagination_class = RecipePagination
+    # изображение можно прислать строкой base64 в JSON или файлом
+    parser_classes = (JSONParser, JSONFieldsMultiPartParser)
+
+    def get_queryset(self):
+        # теги и ингредиенты догружает сериализатор для рецептов,
+        # которых нет в кэше представлений
+        queryset = super().get_queryset().select_related('author')
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(
+                    False, output_field=BooleanField()),
+                author_is_subscribed=Value(
+                    False, output_field=BooleanField()),
+            )
+        return queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            author_is_subscribed=Exists(Follow.objects.filter(
+                follower=user, author=OuterRef('author'))),
+        )
 
     def get_serializer_class(self):
-        if self.action in ('list', 'retrieve'):
+        if self.action in ('list', 'retrieve', 'feed'):
             return RecipeListGetSerializer
         return RecipePostSerializer
 
@@ -63,7 +126,10 @@ class RecipeViewSet(ModelViewSet):
                 "Объекта не существует",
                 status=status.HTTP_400_BAD_REQUEST
             )
-        object_.delete()
+        with transaction.atomic():
+            object_.delete()
+            if model is ShoppingCart:
+                ShoppingListTotal.remove_recipe(user, recipe)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=['POST', 'DELETE'],
@@ -88,21 +154,84 @@ class RecipeViewSet(ModelViewSet):
                 request=request, pk=pk, model=ShoppingCart)
         return None
 
+    @action(detail=False, methods=['get'],
+            permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        queryset = FeedItem.get_feed(
+            request.user, self.filter_queryset(self.get_queryset()))
+        paginator = RecipeCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
     @action(detail=False, methods=['get'],
             permission_classes=[IsAuthenticated])
     def download_shopping_cart(self, request):
         user = request.user
         if not user.shopcart.exists():
             return Response(status=status.HTTP_400_BAD_REQUEST)
-        response = HttpResponse(content_type='application/pdf')
+        format_ = request.query_params.get(
+            'export_format', ShoppingListExport.PDF)
+        export_format = EXPORT_FORMATS.get(format_)
+        if export_format is None:
+            return Response(
+                {'export_format': f'Доступные форматы: '
+                                  f'{", ".join(EXPORT_FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if (user.shopping_totals.count()
+                > settings.SHOPPING_LIST_SYNC_MAX_ITEMS):
+            export = ShoppingListExport.objects.create(
+                user=user, format=format_)
+            run_in_background(run_export, export.pk)
+            serializer = ShoppingListExportSerializer(
+                export, context={'request': request})
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+        response = HttpResponse(
+            export_format.render(user),
+            content_type=export_format.content_type
+        )
         response['Content-Disposition'] = (
             f'attachment; '
-            f'filename="{user.username}_shopping_list.pdf"'
+            f'filename="{get_filename(user, export_format)}"'
         )
-        page = canvas.Canvas(response)
-        Recipe.get_shopping_cart(user, page)
         return response
 
     def perform_destroy(self, instance):
-        instance.image.delete()
-        instance.delete()
+        with transaction.atomic():
+            ShoppingListTotal.change_recipe(
+                instance, ShoppingListTotal.get_recipe_amounts(instance), {})
+            instance.delete()
+
+
+class ShoppingListExportViewSet(mixins.CreateModelMixin,
+                                mixins.RetrieveModelMixin,
+                                GenericViewSet):
+    serializer_class = ShoppingListExportSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        return self.request.user.shopping_list_exports.all()
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        export = serializer.save(user=request.user)
+        run_in_background(run_export, export.pk)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk):
+        export = self.get_object()
+        if export.status != ShoppingListExport.DONE:
+            return Response(
+                {'status': export.status},
+                status=status.HTTP_409_CONFLICT
+            )
+        export_format = EXPORT_FORMATS[export.format]
+        return FileResponse(
+            export.file.open('rb'),
+            as_attachment=True,
+            filename=get_filename(request.user, export_format),
+            content_type=export_format.content_type,
+        )
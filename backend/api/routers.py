@@ -0,0 +1,54 @@
+"""
+Чтение с реплики базы.
+
+Реплика (DATABASES['replica']) используется только там, где её выбрал
+ReplicaMiddleware: для безопасных запросов к маршрутам из
+REPLICA_READ_ROUTES. Запись, чтение внутри транзакции, остальные запросы,
+фоновые задачи и команды manage.py всегда идут в основную базу.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = 'replica'
+
+# выбор ReplicaMiddleware для текущего запроса: {'alias': ...}. Сам
+# словарь ставится в начале запроса, а заполняется в process_view,
+# который под ASGI выполняется в другом потоке с копией контекста
+routing = ContextVar('routing', default=None)
+
+
+def reads_replica():
+    """Читают ли запросы в текущем контексте с реплики."""
+    state = routing.get()
+    return (state is not None and state.get('alias') == REPLICA
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block)
+
+
+@contextmanager
+def primary():
+    """Читать внутри блока из основной базы: для заполнения кэшей."""
+    token = routing.set(None)
+    try:
+        yield
+    finally:
+        routing.reset(token)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        # в транзакции читается то, что в ней записано, а не реплика
+        return REPLICA if reads_replica() else None
+
+    def db_for_write(self, model, **hints):
+        # явно: иначе объект, прочитанный с реплики, сохранится в неё
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # схему реплики переносит репликация
+        return db == DEFAULT_DB_ALIAS
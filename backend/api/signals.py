@@ -0,0 +1,170 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes import counters
+from recipes.images import delete_image_files
+from recipes.models import (AmountOfIngredient, Favorite, FeedItem, Ingredient,
+                            Recipe, ShoppingCart, ShoppingListExport, Tag)
+from recipes.tasks import run_in_background
+from users.models import Follow, User
+
+from . import authentication
+from .recipes_api import cache as recipe_cache
+from .recipes_api import catalogue
+
+# поля автора, которые попадают в представление рецепта
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    recipe_cache.invalidate([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_recipe_images(sender, instance, **kwargs):
+    # после коммита: при откате рецепт остаётся со своими файлами
+    transaction.on_commit(lambda: delete_image_files(instance))
+
+
+@receiver(post_delete, sender=ShoppingListExport)
+def delete_export_file(sender, instance, **kwargs):
+    if instance.file:
+        transaction.on_commit(lambda: instance.file.delete(save=False))
+
+
+@receiver(post_save, sender=AmountOfIngredient)
+@receiver(post_delete, sender=AmountOfIngredient)
+def invalidate_recipe_amount(sender, instance, **kwargs):
+    recipe_cache.invalidate([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_recipe_relations(sender, instance, action, reverse, pk_set,
+                                **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            recipe_cache.invalidate([instance.pk])
+        return
+    if action == 'pre_clear':
+        recipe_cache.invalidate(
+            instance.recipes.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        recipe_cache.invalidate(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def invalidate_catalogue_recipes(sender, instance, created=False,
+                                 **kwargs):
+    if created:
+        return
+    recipe_cache.invalidate(instance.recipes.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_recipes(sender, instance, created, update_fields=None,
+                              **kwargs):
+    if created:
+        return
+    if update_fields is not None and not AUTHOR_FIELDS & set(update_fields):
+        return
+    recipe_cache.invalidate(instance.recipes.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    # после коммита, иначе параллельный запрос успеет снова закэшировать
+    # пользователя по ещё не удалённому токену
+    key = instance.key
+    transaction.on_commit(lambda: authentication.invalidate([key]))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, created, update_fields=None,
+                           **kwargs):
+    # смена пароля, деактивация и любые другие поля закэшированного
+    # пользователя; last_login меняется при каждом входе через админку
+    if created or update_fields is not None and set(update_fields) <= {
+            'last_login'}:
+        return
+    user_id = instance.pk
+    transaction.on_commit(lambda: authentication.invalidate_user(user_id))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tags_version(sender, **kwargs):
+    catalogue.bump_version(catalogue.TAGS)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_ingredients_version(sender, **kwargs):
+    catalogue.bump_version(catalogue.INGREDIENTS)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created, **kwargs):
+    if created:
+        run_in_background(FeedItem.fan_out, instance.pk)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def update_recipe_tags_mask(sender, instance, action, reverse, pk_set,
+                            **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            Recipe.update_tags_mask([instance.pk])
+        return
+    if action == 'pre_clear':
+        instance._cleared_recipe_ids = list(
+            instance.recipes.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        Recipe.update_tags_mask(instance.__dict__.pop(
+            '_cleared_recipe_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        Recipe.update_tags_mask(pk_set)
+
+
+@receiver(pre_delete, sender=Tag)
+def clear_tag_bit(sender, instance, **kwargs):
+    if instance.bit is not None:
+        instance.recipes.update(
+            tags_mask=F('tags_mask').bitand(~(1 << instance.bit)))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Follow)
+def increment_counters(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        update_counters(sender, instance, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Follow)
+def decrement_counters(sender, instance, **kwargs):
+    update_counters(sender, instance, -1)
+
+
+def update_counters(sender, instance, delta):
+    for counter in counters.COUNTERS:
+        if counter.related is sender:
+            counters.change(
+                counter.model,
+                getattr(instance, f'{counter.related_field}_id'),
+                counter.field,
+                delta,
+            )
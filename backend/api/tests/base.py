@@ -0,0 +1,73 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import tokens
+from recipes.models import (AmountOfIngredient, Favorite, Ingredient, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Follow, User
+
+
+class RecipesTestCase(TestCase):
+    """
+    Два автора по RECIPES_PER_AUTHOR рецептов и читатель, который
+    подписан на первого автора, а первый рецепт держит в избранном и в
+    корзине. У рецепта i тэги tags[:1 + i % 3].
+    """
+    RECIPES_PER_AUTHOR = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [
+            User.objects.create_user(
+                username=f'author{index}', email=f'author{index}@test.ru',
+                password='author-password', first_name='Автор',
+                last_name=str(index))
+            for index in range(2)
+        ]
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@test.ru',
+            password='reader-password', first_name='Читатель',
+            last_name='Тестовый')
+        cls.tags = [
+            Tag.objects.create(name=name, color=color, slug=slug)
+            for name, color, slug in (
+                ('Завтрак', '#E26C2D', 'breakfast'),
+                ('Обед', '#49B64E', 'lunch'),
+                ('Ужин', '#8775D2', 'dinner'),
+            )
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'ингредиент {index}', measurement_unit='г')
+            for index in range(5)
+        ]
+        cls.recipes = []
+        for index in range(2 * cls.RECIPES_PER_AUTHOR):
+            recipe = Recipe.objects.create(
+                author=cls.authors[index % 2], name=f'Рецепт {index}',
+                image='recipes_img/test.png', text='Описание',
+                cooking_time=10)
+            recipe.tags.set(cls.tags[:1 + index % 3])
+            AmountOfIngredient.objects.bulk_create(
+                AmountOfIngredient(recipe=recipe, ingredient=ingredient,
+                                   amount=index + 1)
+                for ingredient in cls.ingredients[:3]
+            )
+            cls.recipes.append(recipe)
+        Favorite.objects.create(user=cls.reader, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.reader, recipe=cls.recipes[0])
+        Follow.objects.create(follower=cls.reader, author=cls.authors[0])
+
+    def setUp(self):
+        cache.clear()
+        tokens.clear()
+
+    @staticmethod
+    def get_client(user=None):
+        client = APIClient()
+        if user is not None:
+            token = Token.objects.get_or_create(user=user)[0]
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
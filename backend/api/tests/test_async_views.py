@@ -0,0 +1,78 @@
+import asyncio
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from django.urls import clear_url_caches
+
+from api.recipes_api.views import TagsViewSet
+from recipes.models import Tag
+
+DELAY = 0.5
+REQUESTS = 4
+
+
+@override_settings(ROOT_URLCONF='backend.urls_asgi')
+class AsyncReadViewsTest(TransactionTestCase):
+
+    def setUp(self):
+        clear_url_caches()
+        Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+
+    def tearDown(self):
+        clear_url_caches()
+
+    def test_reads_run_concurrently(self):
+        """Медленные чтения под ASGI не ждут друг друга."""
+        original = TagsViewSet.list
+
+        def slow_list(view, request, *args, **kwargs):
+            time.sleep(DELAY)
+            return original(view, request, *args, **kwargs)
+
+        async def fetch():
+            client = AsyncClient()
+            return await asyncio.gather(*(
+                client.get('/api/tags/') for none_ in range(REQUESTS)))
+
+        with mock.patch.object(TagsViewSet, 'list', slow_list):
+            started = time.perf_counter()
+            responses = asyncio.run(fetch())
+            elapsed = time.perf_counter() - started
+        self.assertEqual([response.status_code for response in responses],
+                         [200] * REQUESTS)
+        self.assertLess(elapsed, DELAY * REQUESTS / 2)
+
+
+class AsgiEntrypointTest(TransactionTestCase):
+    """Маршруты ASGI задаются запросу, а не общим ROOT_URLCONF."""
+
+    def test_request_urlconf(self):
+        from backend.asgi import ASYNC_URLCONF, application
+
+        Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': '/api/tags/',
+            'query_string': b'', 'headers': [(b'host', b'testserver')],
+        }
+        urlconfs = []
+        original = TagsViewSet.list
+
+        def list_(view, request, *args, **kwargs):
+            urlconfs.append(request.urlconf)
+            return original(view, request, *args, **kwargs)
+
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            messages.append(message)
+
+        with mock.patch.object(TagsViewSet, 'list', list_):
+            asyncio.run(application(scope, receive, send))
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertEqual(urlconfs, [ASYNC_URLCONF])
+        self.assertEqual(settings.ROOT_URLCONF, 'backend.urls')
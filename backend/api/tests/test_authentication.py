@@ -0,0 +1,94 @@
+from unittest import mock
+
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+
+from api import authentication
+
+from .base import RecipesTestCase
+
+
+class CachedTokenAuthenticationTest(RecipesTestCase):
+    """
+    Отозванный токен перестаёт приниматься: в этом процессе сразу после
+    коммита, в других - не позже AUTH_TOKEN_CACHE_TIMEOUT.
+    """
+    PATH = '/api/users/me/'
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.get_client(self.reader)
+        self.key = Token.objects.get(user=self.reader).key
+        # пользователь токена попадает в кэш
+        self.assertEqual(self.client.get(self.PATH).status_code, 200)
+
+    def is_cached(self):
+        return authentication.tokens.get(
+            authentication.get_digest(self.key)) is not None
+
+    def test_warm_cache_skips_token_query(self):
+        # только is_subscribed профиля, без чтения токена
+        with self.assertNumQueries(1):
+            response = self.client.get(self.PATH)
+        self.assertEqual(response.data['email'], self.reader.email)
+
+    def test_logout(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(self.is_cached())
+        self.assertEqual(self.client.get(self.PATH).status_code, 401)
+
+    def test_password_change(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.post('/api/users/set_password/', {
+                'current_password': 'reader-password',
+                'new_password': 'new-reader-password',
+            })
+        self.assertEqual(response.status_code, 204)
+        self.assertTrue(callbacks)
+        # токен остаётся действительным, но пользователь читается заново
+        self.assertFalse(self.is_cached())
+        self.assertEqual(self.client.get(self.PATH).status_code, 200)
+        cached = authentication.tokens.get(
+            authentication.get_digest(self.key))
+        self.assertTrue(cached.check_password('new-reader-password'))
+
+    def test_deactivation(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reader.is_active = False
+            self.reader.save()
+        self.assertFalse(self.is_cached())
+        self.assertEqual(self.client.get(self.PATH).status_code, 401)
+
+    def test_subscribe_keeps_author_cached(self):
+        author = self.authors[1]
+        self.assertEqual(
+            self.get_client(author).get(self.PATH).status_code, 200)
+        author_key = Token.objects.get(user=author).key
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/users/{author.id}/subscribe/')
+        self.assertEqual(response.status_code, 201)
+        # подписка не сохраняет автора целиком и не сбрасывает его кэши
+        self.assertIsNotNone(authentication.tokens.get(
+            authentication.get_digest(author_key)))
+
+    def test_invalidated_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            Token.objects.filter(user=self.reader).delete()
+            # до коммита запись не сбрасывается
+            self.assertTrue(self.is_cached())
+        for callback in callbacks:
+            callback()
+        self.assertFalse(self.is_cached())
+
+    @override_settings(AUTH_TOKEN_CACHE_TIMEOUT=5)
+    def test_other_process_window(self):
+        self.setUp()
+        # токен удалён в другом процессе: сигнал сюда не приходит
+        Token.objects.filter(user=self.reader).update(key='0' * 40)
+        self.assertEqual(self.client.get(self.PATH).status_code, 200)
+        later = authentication.time.monotonic() + 5
+        with mock.patch.object(
+                authentication.time, 'monotonic', return_value=later):
+            self.assertEqual(self.client.get(self.PATH).status_code, 401)
@@ -0,0 +1,42 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+
+from api.recipes_api import catalogue
+from recipes.models import Tag
+
+from .base import RecipesTestCase
+
+
+class CatalogueVersionTest(RecipesTestCase):
+    """
+    Версия справочника, сменённая в другом процессе со своим кэшем
+    (например, командой load_tags), доходит до этого процесса не позже
+    CATALOGUE_VERSION_TIMEOUT.
+    """
+
+    def create_tag_elsewhere(self):
+        other_cache = LocMemCache('other-process', {})
+        with mock.patch.object(catalogue, 'cache', other_cache), \
+                self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Полдник', color='#FFFFFF', slug='snack')
+
+    def test_version_from_other_process(self):
+        client = self.get_client()
+        etag = client.get('/api/tags/')['ETag']
+        self.create_tag_elsewhere()
+        # до истечения версии в кэше этого процесса ответ прежний
+        self.assertEqual(client.get('/api/tags/')['ETag'], etag)
+        cache.delete(catalogue.version_key(catalogue.TAGS))
+        response = client.get('/api/tags/')
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('snack', [tag['slug'] for tag in response.json()])
+        self.assertIn('snack', catalogue.get_tags())
+        self.assertEqual(client.get('/api/recipes/?tags=snack').status_code,
+                         200)
+
+    def test_version_survives_cache_clear(self):
+        version = catalogue.get_version(catalogue.TAGS)
+        cache.clear()
+        self.assertEqual(catalogue.get_version(catalogue.TAGS), version)
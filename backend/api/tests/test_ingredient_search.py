@@ -0,0 +1,55 @@
+from api.recipes_api.ingredient_index import normalize
+from recipes.models import Ingredient
+
+from .base import RecipesTestCase
+
+
+class IngredientSearchTest(RecipesTestCase):
+    """Автодополнение ингредиентов: префикс, затем середина названия."""
+    PATH = '/api/ingredients/'
+    NAMES = ('соль', 'соль морская', 'морская соль', 'Сок лимона',
+             'лимон', 'мёд', 'медовик', 'сода пищевая', 'пищевая сода')
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in cls.NAMES)
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.get_client()
+
+    def get_names(self, query):
+        response = self.client.get(self.PATH, query)
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.json()]
+
+    def test_empty_name_returns_everything(self):
+        expected = list(Ingredient.objects.order_by('id').values_list(
+            'name', flat=True))
+        self.assertEqual(self.get_names({}), expected)
+        self.assertEqual(self.get_names({'name': ' ', 'limit': 1}), expected)
+
+    def test_matches_linear_scan(self):
+        keys = sorted(
+            (normalize(name), name)
+            for name in Ingredient.objects.values_list('name', flat=True))
+        for query in ('соль', 'со', 'ль', 'Мед', 'ая с', 'лимон', 'о',
+                      'нет такого'):
+            with self.subTest(query=query):
+                key = normalize(query)
+                expected = [
+                    name for item, name in keys if item.startswith(key)
+                ] + [
+                    name for item, name in keys
+                    if key in item and not item.startswith(key)
+                ]
+                self.assertEqual(
+                    self.get_names({'name': query, 'limit': 5}), expected[:5])
+
+    def test_limit(self):
+        self.assertEqual(
+            self.get_names({'name': 'соль', 'limit': 2}),
+            ['соль', 'соль морская'])
@@ -0,0 +1,61 @@
+import os
+import tempfile
+
+from django.test import Client, TestCase, override_settings
+
+from api.metrics import archive_process, registry
+from users.models import User
+
+
+@override_settings(METRICS_TOKEN=None)
+class MetricsAccessTest(TestCase):
+    """Без METRICS_TOKEN метрики видят только сотрудники."""
+    PATH = '/api/metrics'
+
+    def get_status(self, user=None, **headers):
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        return client.get(self.PATH, **headers).status_code
+
+    def test_anonymous_denied(self):
+        self.assertEqual(self.get_status(), 403)
+
+    def test_user_denied(self):
+        user = User.objects.create_user(
+            username='user', email='user@example.com', password='password')
+        self.assertEqual(self.get_status(user), 403)
+
+    def test_staff_allowed(self):
+        user = User.objects.create_user(
+            username='staff', email='staff@example.com', password='password',
+            is_staff=True)
+        self.assertEqual(self.get_status(user), 200)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        self.assertEqual(self.get_status(), 403)
+        self.assertEqual(
+            self.get_status(HTTP_AUTHORIZATION='Bearer secret'), 200)
+
+
+class MetricsFilesTest(TestCase):
+    """Метрики завершившегося воркера переносятся в archive.json."""
+
+    def test_archive_process(self):
+        labels = (('view', 'tags-list'),)
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+                METRICS_DIR=directory):
+            for pid in (1, 2):
+                path = os.path.join(directory, f'{pid}.json')
+                with open(path, 'w') as file:
+                    file.write('{"counters": [["db_routing_total", '
+                               '[["view", "tags-list"]], 3]], '
+                               '"histograms": []}')
+                archive_process(pid)
+                self.assertFalse(os.path.exists(path))
+            archive_process(3)
+            counters, none_ = registry.collect()
+            self.assertEqual(counters[('db_routing_total', labels)], 6)
+            self.assertCountEqual(
+                os.listdir(directory), ['archive.json', f'{os.getpid()}.json'])
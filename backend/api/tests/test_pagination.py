@@ -0,0 +1,53 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from recipes.models import Recipe
+
+from .base import RecipesTestCase
+
+
+class RecipePaginationTest(RecipesTestCase):
+    """
+    ?page= отдаёт страницу с count, ?cursor= листает по (pub_date, id)
+    без OFFSET, в том числе по рецептам с одинаковой датой.
+    """
+    LIMIT = 3
+
+    def get(self, path, params=None):
+        response = self.get_client().get(path, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_page_and_cursor(self):
+        data = self.get('/api/recipes/', {'page': 2, 'limit': self.LIMIT})
+        self.assertEqual(data['count'], len(self.recipes))
+        self.assertEqual(len(data['results']), self.LIMIT)
+        data = self.get('/api/recipes/', {'cursor': '', 'limit': self.LIMIT})
+        self.assertNotIn('count', data)
+        self.assertIsNone(data['previous'])
+        self.assertIn('cursor=', data['next'])
+        self.assertEqual(
+            [recipe['id'] for recipe in data['results']],
+            list(Recipe.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True)[:self.LIMIT]))
+
+    def test_cursor_equal_dates(self):
+        Recipe.objects.update(pub_date=timezone.now())
+        expected = list(Recipe.objects.order_by('-id').values_list(
+            'id', flat=True))
+        data = self.get('/api/recipes/', {'cursor': '', 'limit': self.LIMIT})
+        pages = [[recipe['id'] for recipe in data['results']]]
+        while data['next']:
+            with CaptureQueriesContext(connection) as queries:
+                data = self.get(data['next'])
+            self.assertFalse(any(
+                'OFFSET' in query['sql'] for query in queries))
+            pages.append([recipe['id'] for recipe in data['results']])
+        self.assertEqual(sum(pages, []), expected)
+        # назад по previous до первой страницы
+        while data['previous']:
+            data = self.get(data['previous'])
+            self.assertEqual(
+                [recipe['id'] for recipe in data['results']], pages.pop(-2))
+        self.assertEqual(len(pages), 1)
@@ -0,0 +1,73 @@
+from recipes.models import AmountOfIngredient
+
+from .base import RecipesTestCase
+
+
+class RecipeCacheTest(RecipesTestCase):
+    """
+    Кэш представлений рецептов: с прогретым кэшем читаются только сами
+    рецепты, после коммита изменения рецепт читается заново.
+    """
+    # COUNT(*) и рецепты с авторами и флагами пользователя
+    WARM_LIST_QUERIES = 2
+    WARM_DETAIL_QUERIES = 1
+    # плюс тэги, ингредиенты рецепта и названия ингредиентов изменённого
+    COLD_RECIPE_QUERIES = 3
+
+    def get(self, client, path, queries):
+        with self.assertNumQueries(queries):
+            response = client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_warm_cache_hit(self):
+        detail = f'/api/recipes/{self.recipes[0].pk}/'
+        for user in (None, self.reader):
+            client = self.get_client(user)
+            cold_list = client.get('/api/recipes/?limit=20').data
+            cold_detail = client.get(detail).data
+            with self.subTest(user=user):
+                self.assertEqual(
+                    self.get(client, '/api/recipes/?limit=20',
+                             self.WARM_LIST_QUERIES),
+                    cold_list)
+                self.assertEqual(
+                    self.get(client, detail, self.WARM_DETAIL_QUERIES),
+                    cold_detail)
+        # флаги пользователя не берутся из кэша
+        anonymous = self.get(
+            self.get_client(), detail, self.WARM_DETAIL_QUERIES)
+        self.assertFalse(anonymous['is_favorited'])
+        self.assertFalse(anonymous['author']['is_subscribed'])
+
+    def test_reread_after_update(self):
+        client = self.get_client(self.reader)
+        detail = f'/api/recipes/{self.recipes[0].pk}/'
+        client.get('/api/recipes/?limit=20')
+        client.get(detail)
+        recipe = self.recipes[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.name = 'Новое название'
+            recipe.save()
+            AmountOfIngredient.objects.filter(recipe=recipe).update(
+                amount=500)
+            recipe.tags.add(self.tags[2])
+        data = self.get(client, detail, self.WARM_DETAIL_QUERIES
+                        + self.COLD_RECIPE_QUERIES)
+        self.assertEqual(data['name'], 'Новое название')
+        self.assertEqual(
+            {ingredient['amount'] for ingredient in data['ingredients']},
+            {500})
+        self.assertEqual(len(data['tags']), 2)
+        self.assertTrue(data['is_favorited'])
+        self.get(client, detail, self.WARM_DETAIL_QUERIES)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes[1].tags.clear()
+        results = self.get(
+            client, '/api/recipes/?limit=20',
+            self.WARM_LIST_QUERIES + self.COLD_RECIPE_QUERIES)['results']
+        recipes = {recipe['id']: recipe for recipe in results}
+        self.assertEqual(recipes[self.recipes[1].pk]['tags'], [])
+        self.assertEqual(recipes[recipe.pk]['name'], 'Новое название')
+        self.get(client, '/api/recipes/?limit=20', self.WARM_LIST_QUERIES)
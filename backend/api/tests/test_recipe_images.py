@@ -0,0 +1,50 @@
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import override_settings
+
+from recipes.images import VARIANTS_DIR
+
+from .base import RecipesTestCase
+
+
+class RecipeImagesTest(RecipesTestCase):
+    """С рецептом удаляются оригинал и уменьшенные копии изображения."""
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.recipe = self.recipes[0]
+        self.recipe.image = default_storage.save(
+            'recipes_img/recipe.png', ContentFile(b'image'))
+        self.recipe.image_variants = {
+            f'{size}_webp': default_storage.save(
+                f'{VARIANTS_DIR}/recipe_{size}.webp', ContentFile(b'image'))
+            for size in ('small', 'medium')
+        }
+        self.recipe.save(update_fields=('image', 'image_variants'))
+        self.paths = [self.recipe.image.name,
+                      *self.recipe.image_variants.values()]
+
+    def test_delete_recipe(self):
+        client = self.get_client(self.authors[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.delete(f'/api/recipes/{self.recipe.pk}/')
+        self.assertEqual(response.status_code, 204)
+        for path in self.paths:
+            self.assertFalse(default_storage.exists(path), path)
+
+    def test_files_kept_until_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.recipe.delete()
+        for path in self.paths:
+            self.assertTrue(default_storage.exists(path), path)
+        for callback in callbacks:
+            callback()
+        for path in self.paths:
+            self.assertFalse(default_storage.exists(path), path)
@@ -0,0 +1,59 @@
+from .base import RecipesTestCase
+
+
+class RecipeQueriesTest(RecipesTestCase):
+    """
+    Число SQL-запросов списка и карточки рецепта не зависит от размера
+    страницы. Кэш представлений пуст, с ним запросов меньше (см.
+    test_recipe_cache.py).
+    """
+    # COUNT(*), рецепты с авторами, тэги, ингредиенты рецептов, названия
+    # ингредиентов
+    LIST_QUERIES = 5
+    # рецепт с автором, тэги, ингредиенты рецепта, названия ингредиентов
+    DETAIL_QUERIES = 4
+    # токен с пользователем
+    AUTH_QUERIES = 1
+
+    def assert_queries(self, user, path, expected):
+        self.setUp()
+        client = self.get_client(user)
+        with self.subTest(user=user, path=path):
+            with self.assertNumQueries(expected):
+                response = client.get(path)
+            self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list_anonymous(self):
+        for limit in (2, 20):
+            response = self.assert_queries(
+                None, f'/api/recipes/?limit={limit}', self.LIST_QUERIES)
+            self.assertEqual(len(response.data['results']), limit)
+            self.assertFalse(any(
+                recipe['is_favorited'] for recipe in response.data['results']))
+
+    def test_list_authenticated(self):
+        for limit in (2, 20):
+            response = self.assert_queries(
+                self.reader, f'/api/recipes/?limit={limit}',
+                self.LIST_QUERIES + self.AUTH_QUERIES)
+            self.assertEqual(len(response.data['results']), limit)
+        recipes = {recipe['id']: recipe
+                   for recipe in response.data['results']}
+        first = recipes[self.recipes[0].pk]
+        self.assertTrue(first['is_favorited'])
+        self.assertTrue(first['is_in_shopping_cart'])
+        self.assertTrue(first['author']['is_subscribed'])
+        self.assertFalse(
+            recipes[self.recipes[1].pk]['author']['is_subscribed'])
+
+    def test_detail_anonymous(self):
+        self.assert_queries(
+            None, f'/api/recipes/{self.recipes[0].pk}/', self.DETAIL_QUERIES)
+
+    def test_detail_authenticated(self):
+        response = self.assert_queries(
+            self.reader, f'/api/recipes/{self.recipes[0].pk}/',
+            self.DETAIL_QUERIES + self.AUTH_QUERIES)
+        self.assertTrue(response.data['is_favorited'])
+        self.assertEqual(len(response.data['ingredients']), 3)
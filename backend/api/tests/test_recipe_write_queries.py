@@ -0,0 +1,118 @@
+import base64
+import io
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import override_settings
+from PIL import Image
+
+from recipes.models import AmountOfIngredient, Ingredient
+
+from .base import RecipesTestCase
+
+
+class RecipeWriteQueriesTest(RecipesTestCase):
+    """
+    Создание и правка рецепта с 30 ингредиентами: число запросов не
+    зависит от числа ингредиентов и изменённых строк.
+    """
+    INGREDIENTS = 30
+    # проверка тэгов, ингредиентов и имени, вставка рецепта, счётчик
+    # автора, ингредиенты одним запросом, тэги и их маска, ответ
+    CREATE_QUERIES = 19
+    # рецепт, проверки, UPDATE рецепта, тэги, старые строки, по одному
+    # DELETE (с выборкой строк для сигналов), UPDATE и INSERT
+    # ингредиентов, корзины для пересчёта итогов и ответ
+    UPDATE_QUERIES = 17
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'добавка {index}', measurement_unit='г')
+            for index in range(cls.INGREDIENTS + 10)
+        )
+        cls.extra_ingredients = list(Ingredient.objects.filter(
+            name__startswith='добавка').order_by('id'))
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        # уменьшенные копии изображения здесь не нужны
+        patcher = mock.patch('api.recipes_api.serializers.run_in_background')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = self.get_client(self.authors[0])
+        # пользователь токена попадает в кэш
+        self.client.get('/api/users/me/')
+        image = io.BytesIO()
+        Image.new('RGB', (10, 10), 'red').save(image, 'PNG')
+        self.image = ('data:image/png;base64,'
+                      + base64.b64encode(image.getvalue()).decode())
+
+    def get_data(self, name, amounts):
+        return {
+            'name': name,
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': self.image,
+            'tags': [tag.pk for tag in self.tags],
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': amount}
+                for ingredient, amount in amounts
+            ],
+        }
+
+    def request(self, method, path, data, queries):
+        # после коммита сбрасывается кэш представления рецепта
+        with self.captureOnCommitCallbacks(execute=True), \
+                self.assertNumQueries(queries):
+            return getattr(self.client, method)(path, data, format='json')
+
+    def create(self, name, count, queries=None):
+        amounts = [(ingredient, 10)
+                   for ingredient in self.extra_ingredients[:count]]
+        if queries is None:
+            response = self.client.post(
+                '/api/recipes/', self.get_data(name, amounts), format='json')
+        else:
+            response = self.request(
+                'post', '/api/recipes/', self.get_data(name, amounts), queries)
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['id'], amounts
+
+    def test_create(self):
+        self.create('Рецепт с 3', 3, self.CREATE_QUERIES)
+        recipe_id, none_ = self.create(
+            'Рецепт с 30', self.INGREDIENTS, self.CREATE_QUERIES)
+        self.assertEqual(
+            AmountOfIngredient.objects.filter(recipe_id=recipe_id).count(),
+            self.INGREDIENTS)
+
+    def test_update(self):
+        recipe_id, amounts = self.create('Рецепт', self.INGREDIENTS)
+        # 5 количеств меняются, 5 строк удаляются, 5 добавляются
+        amounts = (
+            [(ingredient, 20) for ingredient, none_ in amounts[:5]]
+            + amounts[5:self.INGREDIENTS - 5]
+            + [(ingredient, 30) for ingredient in self.extra_ingredients[
+                self.INGREDIENTS:self.INGREDIENTS + 5]]
+        )
+        data = self.get_data('Рецепт', amounts)
+        del data['image']
+        # вне тестовой транзакции представление сбрасывается коммитом
+        # правки ещё до ответа
+        cache.clear()
+        response = self.request(
+            'patch', f'/api/recipes/{recipe_id}/', data, self.UPDATE_QUERIES)
+        self.assertEqual(response.status_code, 200, response.data)
+        saved = AmountOfIngredient.objects.filter(
+            recipe_id=recipe_id).values_list('ingredient_id', 'amount')
+        self.assertEqual(
+            dict(saved),
+            {ingredient.pk: amount for ingredient, amount in amounts})
@@ -0,0 +1,23 @@
+from recipes.models import Recipe
+
+from .base import RecipesTestCase
+
+
+class SearchHighlightTest(RecipesTestCase):
+    """Подсветка совпадений не пропускает HTML из названия и текста."""
+
+    def test_highlight_escapes_recipe_html(self):
+        recipe = self.recipes[0]
+        Recipe.objects.filter(pk=recipe.pk).update(
+            name='<img src=x onerror=alert(1)> Борщ',
+            text='Борщ & <script>alert(1)</script>')
+        response = self.get_client().get('/api/recipes/?search=борщ')
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([result['id'] for result in results], [recipe.pk])
+        search = results[0]['search']
+        self.assertEqual(
+            search['name'],
+            '&lt;img src=x onerror=alert(1)&gt; <b>Борщ</b>')
+        self.assertIn('<b>Борщ</b> &amp; &lt;script&gt;', search['text'])
+        self.assertNotIn('<script>', search['text'])
@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+
+class SharedCacheSettingsTest(SimpleTestCase):
+    """С несколькими воркерами кэш в памяти процесса не принимается."""
+
+    def import_settings(self, **environment):
+        return subprocess.run(
+            [sys.executable, '-c', 'import backend.settings'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+            env={**os.environ, **environment},
+        )
+
+    def test_local_cache_with_workers(self):
+        result = self.import_settings(
+            CACHE_BACKEND='django.core.cache.backends.locmem.LocMemCache',
+            WEB_CONCURRENCY='3')
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn('ImproperlyConfigured', result.stderr)
+
+    def test_shared_cache_with_workers(self):
+        result = self.import_settings(
+            CACHE_BACKEND=(
+                'django.core.cache.backends.memcached.PyMemcacheCache'),
+            WEB_CONCURRENCY='3')
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_local_cache_single_worker(self):
+        result = self.import_settings(
+            CACHE_BACKEND='django.core.cache.backends.locmem.LocMemCache',
+            WEB_CONCURRENCY='1')
+        self.assertEqual(result.returncode, 0, result.stderr)
@@ -0,0 +1,64 @@
+from recipes.models import Recipe
+from users.models import Follow, User
+
+from .base import RecipesTestCase
+
+
+class SubscriptionQueriesTest(RecipesTestCase):
+    """
+    Число запросов списка подписок не зависит от числа авторов: рецепты
+    всех авторов страницы догружаются одним запросом с recipes_limit.
+    """
+    AUTHORS = 20
+    RECIPES = 3
+    RECIPES_LIMIT = 2
+    # токен с пользователем, COUNT(*), авторы, последние рецепты авторов
+    QUERIES = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.followed = []
+        for index in range(cls.AUTHORS):
+            author = User.objects.create_user(
+                username=f'followed{index}', email=f'followed{index}@test.ru',
+                password='author-password')
+            for number in range(cls.RECIPES):
+                Recipe.objects.create(
+                    author=author, name=f'Рецепт {index}-{number}',
+                    image='recipes_img/test.png', text='Описание',
+                    cooking_time=10)
+            cls.followed.append(author)
+        cls.followers = {}
+        for count in (2, cls.AUTHORS):
+            follower = User.objects.create_user(
+                username=f'follower{count}', email=f'follower{count}@test.ru',
+                password='follower-password')
+            Follow.objects.bulk_create(
+                Follow(follower=follower, author=author)
+                for author in cls.followed[:count])
+            cls.followers[count] = follower
+
+    def test_subscriptions(self):
+        for count, follower in self.followers.items():
+            self.setUp()
+            client = self.get_client(follower)
+            with self.subTest(authors=count):
+                with self.assertNumQueries(self.QUERIES):
+                    response = client.get(
+                        '/api/users/subscriptions/',
+                        {'limit': self.AUTHORS,
+                         'recipes_limit': self.RECIPES_LIMIT})
+                self.assertEqual(response.status_code, 200)
+                results = response.data['results']
+                self.assertEqual(
+                    [author['id'] for author in results],
+                    [author.id for author in self.followed[:count]])
+                for author in results:
+                    self.assertEqual(author['recipes_count'], self.RECIPES)
+                    latest = Recipe.objects.filter(
+                        author_id=author['id']).order_by(
+                        '-pub_date', '-id')[:self.RECIPES_LIMIT]
+                    self.assertEqual(
+                        [recipe['id'] for recipe in author['recipes']],
+                        [recipe.id for recipe in latest])
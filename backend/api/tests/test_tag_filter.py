@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Recipe
+
+from .base import RecipesTestCase
+
+
+class TagFilterTest(RecipesTestCase):
+    """
+    Фильтр ?tags= отдаёт каждый рецепт один раз и считает count без
+    дублей во всех режимах: по tags_mask (условие IN или битовое И) и
+    через EXISTS.
+    """
+
+    def get_expected(self, slugs, match_all):
+        expected = set()
+        for index, recipe in enumerate(self.recipes):
+            tags = {tag.slug for tag in self.tags[:1 + index % 3]}
+            if (slugs <= tags) if match_all else (slugs & tags):
+                expected.add(recipe.pk)
+        return expected
+
+    def check_filter(self):
+        client = self.get_client(self.reader)
+        slugs = {self.tags[1].slug, self.tags[2].slug}
+        query = '&'.join(f'tags={slug}' for slug in sorted(slugs))
+        for match_all in (False, True):
+            path = f'/api/recipes/?{query}&limit=100'
+            if match_all:
+                path += '&tags_match=all'
+            with self.subTest(path=path):
+                response = client.get(path)
+                self.assertEqual(response.status_code, 200)
+                ids = [recipe['id'] for recipe in response.data['results']]
+                self.assertEqual(len(ids), len(set(ids)))
+                expected = self.get_expected(slugs, match_all)
+                self.assertEqual(set(ids), expected)
+                self.assertEqual(response.data['count'], len(expected))
+
+    def test_mask_in(self):
+        self.check_filter()
+
+    def test_mask_bitand(self):
+        # подмасок справочника больше, чем допускает условие IN
+        with mock.patch.object(Recipe, 'TAGS_MASK_IN_MAX', 1):
+            self.check_filter()
+
+    def test_exists(self):
+        with self.settings(RECIPE_TAGS_MASK_FILTER=False):
+            self.check_filter()
+
+    def test_unknown_tag(self):
+        response = self.get_client().get('/api/recipes/?tags=unknown')
+        self.assertEqual(response.status_code, 400)
+
+    def test_query_plan(self):
+        """Фильтр не соединяет рецепты с таблицей связей и без DISTINCT."""
+        with CaptureQueriesContext(connection) as context:
+            self.get_client().get(
+                f'/api/recipes/?tags={self.tags[1].slug}')
+        recipe_queries = [
+            query['sql'] for query in context.captured_queries
+            if 'FROM "recipes_recipe"' in query['sql']
+        ]
+        self.assertEqual(len(recipe_queries), 2)
+        for sql in recipe_queries:
+            self.assertNotIn('recipes_recipe_tags', sql)
+            self.assertNotIn('DISTINCT', sql)
+        queryset = Recipe.filter_by_tags(
+            Recipe.objects.all(), [(self.tags[1].pk, self.tags[1].bit)],
+            sum(1 << tag.bit for tag in self.tags))
+        plan = queryset.explain()
+        self.assertIn('tags_mask', plan)
+        self.assertNotIn('recipes_recipe_tags ', plan)
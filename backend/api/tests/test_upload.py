@@ -0,0 +1,45 @@
+import io
+import json
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from PIL import Image
+from rest_framework import parsers
+
+from .base import RecipesTestCase
+
+
+class RecipeUploadTest(RecipesTestCase):
+    """Слишком большая загрузка изображения рецепта отклоняется с 413."""
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.get_client(self.authors[0])
+        image = io.BytesIO()
+        Image.new('RGB', (50, 40), 'red').save(image, 'JPEG')
+        self.data = {
+            'name': 'Рецепт с файлом',
+            'text': 'Описание',
+            'cooking_time': '5',
+            'image': SimpleUploadedFile(
+                'recipe.jpg', image.getvalue(), 'image/jpeg'),
+            'tags': json.dumps([self.tags[0].pk]),
+            'ingredients': json.dumps(
+                [{'id': self.ingredients[0].pk, 'amount': 2}]),
+        }
+
+    def post(self, **extra):
+        return self.client.post(
+            '/api/recipes/', self.data, format='multipart', **extra)
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_file_too_large(self):
+        self.assertEqual(self.post().status_code, 413)
+
+    @override_settings(RECIPE_MAX_REQUEST_SIZE=100)
+    def test_content_length_checked_before_reading(self):
+        with mock.patch.object(parsers.MultiPartParser, 'parse') as parse:
+            response = self.post()
+        self.assertEqual(response.status_code, 413)
+        parse.assert_not_called()
@@ -1,9 +1,19 @@
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from recipes.models import Recipe
 from rest_framework import serializers, status
+
+from api.fields import ImageVariantsField
+from recipes.models import Recipe
 from users.models import Follow, User
 
 
+def get_recipes_limit(request):
+    try:
+        recipes_limit = int(request.query_params['recipes_limit'])
+    except (KeyError, ValueError):
+        return None
+    return max(recipes_limit, 0)
+
+
 class CustomUserSerializer(UserSerializer):
 
     is_subscribed = serializers.SerializerMethodField(read_only=True)
@@ -20,6 +30,9 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        is_subscribed = getattr(obj, 'is_subscribed', None)
+        if is_subscribed is not None:
+            return is_subscribed
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
@@ -54,16 +67,16 @@ class CustomUserCreateSerializer(UserCreateSerializer):
 
 
 class RecipeMiniSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
 class FollowSerializer(CustomUserSerializer):
 
     recipes = serializers.SerializerMethodField(read_only=True)
-    recipes_count = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = User
@@ -77,7 +90,8 @@ class FollowSerializer(CustomUserSerializer):
             'recipes',
             'recipes_count'
         )
-        read_only_fields = ('email', 'username', 'first_name', 'last_name')
+        read_only_fields = ('email', 'username', 'first_name', 'last_name',
+                            'recipes_count')
 
     def validate(self, data):
         author = self.instance
@@ -95,12 +109,11 @@ class FollowSerializer(CustomUserSerializer):
         return data
 
     def get_recipes(self, obj):
-        recipes = obj.recipes.all()
-        request = self.context.get('request')
-        recipes_limit = request.query_params.get('recipes_limit')
-        if recipes_limit:
-            recipes = recipes[:int(recipes_limit)]
+        # список подписок догружает рецепты заранее (recent_recipes)
+        recipes = getattr(obj, 'recent_recipes', None)
+        if recipes is None:
+            recipes = obj.recipes.all()
+            recipes_limit = get_recipes_limit(self.context.get('request'))
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
         return RecipeMiniSerializer(recipes, many=True).data
-
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
@@ -1,8 +1,9 @@
-from api.users_api.views import (CustomUserViewSet, FollowCreateDestroyViewSet,
-                                 FollowListViewSet)
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from api.users_api.views import (CustomUserViewSet, FollowCreateDestroyViewSet,
+                                 FollowListViewSet)
+
 router = DefaultRouter()
 router.register('users', CustomUserViewSet, basename='users')
 
@@ -1,12 +1,17 @@
-from api.paginations import CustomPageNumberPagination
+from django.db import transaction
+from django.db.models import BooleanField, Prefetch, Value
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+
+from api.paginations import CustomPageNumberPagination, FollowPagination
+from recipes.models import FeedItem, Recipe
 from users.models import User
 
-from .serializers import CustomUserSerializer, FollowSerializer
+from .serializers import (CustomUserSerializer, FollowSerializer,
+                          get_recipes_limit)
 
 
 class CustomUserViewSet(UserViewSet):
@@ -24,9 +29,23 @@ class BaseForFollowViewSets(generics.ListAPIView):
 
 
 class FollowListViewSet(BaseForFollowViewSets):
+    pagination_class = FollowPagination
 
     def get_queryset(self):
-        return User.objects.filter(follower__follower=self.request.user)
+        user = self.request.user
+        recipes_limit = get_recipes_limit(self.request)
+        if recipes_limit is None:
+            recipes = Recipe.objects.order_by('-pub_date', '-id')
+        else:
+            recipes = Recipe.get_latest_by_author(
+                Recipe.objects.filter(author__follower__follower=user),
+                recipes_limit,
+            )
+        return User.objects.filter(follower__follower=user).annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='recent_recipes')
+        ).order_by('id')
 
 
 class FollowCreateDestroyViewSet(
@@ -45,9 +64,12 @@ class FollowCreateDestroyViewSet(
         serializer = self.get_serializer(
             author, data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
-        request.user.author.create(author=author)
-        self.perform_create(serializer)
+        with transaction.atomic():
+            request.user.author.create(author=author)
+            FeedItem.backfill(request.user.id, author.id)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def perform_destroy(self, author):
-        self.request.user.author.filter(author=author).delete()
+        with transaction.atomic():
+            self.request.user.author.filter(author=author).delete()
+            FeedItem.prune(self.request.user.id, author.id)
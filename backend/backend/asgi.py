@@ -9,8 +9,28 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+ASYNC_URLCONF = 'backend.urls_asgi'
+
+
+class AsyncReadASGIHandler(ASGIHandler):
+    """
+    Маршруты с асинхронными представлениями для чтения (см.
+    api/async_views.py) только у запросов через ASGI: ROOT_URLCONF
+    остаётся общим для WSGI, команд и тестов.
+    """
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = ASYNC_URLCONF
+        return request, error_response
+
+
+# то же, что get_asgi_application(), но со своим обработчиком
+django.setup(set_prefix=False)
+application = AsyncReadASGIHandler()
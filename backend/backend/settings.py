@@ -13,6 +13,7 @@ import os
 from pathlib import Path
 
 import dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 dotenv.load_dotenv()
 dotenv.load_dotenv(dotenv_path='./example.env')
@@ -54,6 +55,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.ReplicaMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -64,6 +67,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# запросы через backend/asgi.py разбираются по backend/urls_asgi.py
 ROOT_URLCONF = 'backend.urls'
 
 TEMPLATES = [
@@ -108,6 +112,38 @@ else:
         }
     }
 
+# Реплика основной базы только для чтения (см. api/routers.py): для
+# PostgreSQL - хост DB_REPLICA_HOST, для SQLite - файл-копия DB_REPLICA_NAME
+if os.getenv('DB_REPLICA_HOST') or os.getenv('DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv(
+            'DB_REPLICA_NAME', default=DATABASES['default']['NAME']),
+        'HOST': os.getenv(
+            'DB_REPLICA_HOST', default=DATABASES['default'].get('HOST', '')),
+        'PORT': os.getenv(
+            'DB_REPLICA_PORT', default=DATABASES['default'].get('PORT', '')),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['api.routers.ReplicaRouter']
+
+# Маршруты, безопасные запросы к которым читают с реплики, и сколько
+# секунд после записи клиент читает из основной базы
+REPLICA_READ_ROUTES = {
+    'recipes-list',
+    'recipes-detail',
+    'recipes-feed',
+    'recipes-download-shopping-cart',
+    'tags-list',
+    'tags-detail',
+    'ingredients-list',
+    'ingredients-detail',
+    'users-list',
+}
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', default=10))
+REPLICA_STICKY_COOKIE = 'read_primary'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -157,7 +193,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 6
@@ -181,4 +217,145 @@ DJOSER = {
 AUTH_USER_MODEL = 'users.User'
 
 CORS_ORIGIN_ALLOW_ALL = True
-CORS_URLS_REGEX = r'^/api/.*$'
\ No newline at end of file
+CORS_URLS_REGEX = r'^/api/.*$'
+
+# Кэш по умолчанию хранит представления рецептов, пользователей токенов
+# и признаки чтения с основной базы. LocMemCache у каждого процесса свой:
+# запись в одном воркере не сбрасывает кэш остальных, и они отдают
+# старые рецепты до RECIPE_CACHE_TIMEOUT. Поэтому с несколькими
+# воркерами (WEB_CONCURRENCY, его же читает gunicorn) нужен общий кэш,
+# например CACHE_BACKEND=django.core.cache.backends.memcached.
+# PyMemcacheCache и CACHE_LOCATION=memcached:11211 (см. infra/)
+CACHE_BACKEND = os.getenv(
+    'CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache')
+LOCAL_CACHE = CACHE_BACKEND.endswith('.LocMemCache')
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', default=1))
+if LOCAL_CACHE and WEB_CONCURRENCY > 1:
+    raise ImproperlyConfigured(
+        f'LocMemCache не разделяется между {WEB_CONCURRENCY} воркерами, '
+        f'задайте общий CACHE_BACKEND')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+        # MAX_ENTRIES понимает только кэш в памяти процесса
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', default=10000)),
+        } if LOCAL_CACHE else {},
+    }
+}
+
+# Время жизни закэшированных представлений рецептов, секунды
+RECIPE_CACHE_TIMEOUT = int(os.getenv('RECIPE_CACHE_TIMEOUT', default=60 * 60))
+
+# Потоки для фоновых задач (выгрузки списков покупок и т.п.)
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', default=2))
+
+# Корзины с большим числом ингредиентов выгружаются фоновой задачей
+SHOPPING_LIST_SYNC_MAX_ITEMS = int(
+    os.getenv('SHOPPING_LIST_SYNC_MAX_ITEMS', default=500))
+
+# Готовые выгрузки хранятся SHOPPING_LIST_EXPORT_TTL секунд. Выгрузка,
+# которая дольше SHOPPING_LIST_EXPORT_TIMEOUT секунд в очереди или в
+# работе, отмечается ошибкой. Очистку запускает фоновая выгрузка не чаще
+# раза в SHOPPING_LIST_EXPORT_SWEEP_INTERVAL секунд или команда
+# clear_shopping_list_exports
+SHOPPING_LIST_EXPORT_TTL = int(
+    os.getenv('SHOPPING_LIST_EXPORT_TTL', default=86_400))
+SHOPPING_LIST_EXPORT_TIMEOUT = int(
+    os.getenv('SHOPPING_LIST_EXPORT_TIMEOUT', default=900))
+SHOPPING_LIST_EXPORT_SWEEP_INTERVAL = int(
+    os.getenv('SHOPPING_LIST_EXPORT_SWEEP_INTERVAL', default=600))
+
+# Размер выдачи автодополнения ингредиентов по умолчанию и максимальный;
+# без name отдаётся весь справочник
+INGREDIENT_SEARCH_LIMIT = int(
+    os.getenv('INGREDIENT_SEARCH_LIMIT', default=50))
+INGREDIENT_SEARCH_MAX_LIMIT = int(
+    os.getenv('INGREDIENT_SEARCH_MAX_LIMIT', default=500))
+
+# Заголовок Cache-Control для справочников тэгов и ингредиентов:
+# клиент всегда перепроверяет версию по ETag
+CATALOGUE_CACHE_CONTROL = os.getenv(
+    'CATALOGUE_CACHE_CONTROL', default='public, max-age=0, must-revalidate')
+# Сколько секунд версия справочника хранится в кэше (сама версия - в
+# базе): при кэше в памяти процесса другие процессы видят изменение
+# справочника с такой задержкой
+CATALOGUE_VERSION_TIMEOUT = int(
+    os.getenv('CATALOGUE_VERSION_TIMEOUT', default=5))
+# Сколько отрендеренных ответов справочников держать в памяти процесса
+CATALOGUE_RENDERED_MAX = int(os.getenv('CATALOGUE_RENDERED_MAX', default=256))
+
+# Обработка изображений рецептов: предел размера в пикселях,
+# размеры уменьшенных копий (по большей стороне) и их форматы
+RECIPE_IMAGE_MAX_PIXELS = int(
+    os.getenv('RECIPE_IMAGE_MAX_PIXELS', default=40_000_000))
+RECIPE_IMAGE_VARIANTS = {
+    'thumbnail': 320,
+    'medium': 960,
+}
+RECIPE_IMAGE_FORMATS = ('webp', 'jpeg')
+
+# Загрузка изображения рецепта файлом (multipart/form-data): файлы больше
+# FILE_UPLOAD_MAX_MEMORY_SIZE пишутся во временный файл на диске,
+# загрузка больше RECIPE_IMAGE_MAX_UPLOAD_SIZE прерывается, а запрос с
+# Content-Length больше RECIPE_MAX_REQUEST_SIZE (файл и остальные поля)
+# отклоняется до чтения тела
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(
+    os.getenv('FILE_UPLOAD_MAX_MEMORY_SIZE', default=2_621_440))
+RECIPE_IMAGE_MAX_UPLOAD_SIZE = int(
+    os.getenv('RECIPE_IMAGE_MAX_UPLOAD_SIZE', default=10_485_760))
+RECIPE_MAX_REQUEST_SIZE = int(os.getenv(
+    'RECIPE_MAX_REQUEST_SIZE',
+    default=RECIPE_IMAGE_MAX_UPLOAD_SIZE + 1_048_576))
+
+# Лента рецептов из подписок: рецепты авторов с большим числом подписчиков
+# читаются при запросе ленты, а не раскладываются по лентам; сколько
+# последних рецептов автора добавить в ленту при подписке
+FEED_FANOUT_MAX_FOLLOWERS = int(
+    os.getenv('FEED_FANOUT_MAX_FOLLOWERS', default=1000))
+FEED_BACKFILL_LIMIT = int(os.getenv('FEED_BACKFILL_LIMIT', default=100))
+FEED_PULLED_AUTHORS_TIMEOUT = int(
+    os.getenv('FEED_PULLED_AUTHORS_TIMEOUT', default=5 * 60))
+
+# Фильтр рецептов по тэгам через предвычисленную Recipe.tags_mask
+# (иначе через EXISTS по таблице связей)
+RECIPE_TAGS_MASK_FILTER = (
+    os.getenv('RECIPE_TAGS_MASK_FILTER', 'True').capitalize() == 'True')
+
+# Списки в админке: для таблиц PostgreSQL больше этого числа строк
+# число записей без фильтров берётся из статистики, а не COUNT(*)
+ADMIN_ESTIMATED_COUNT_MIN = int(
+    os.getenv('ADMIN_ESTIMATED_COUNT_MIN', default=10_000))
+
+# Кэш пользователей по токену: время жизни записи (наибольшая задержка
+# отзыва токена в других процессах), число записей в памяти процесса и
+# хранение ещё и в общем кэше (CACHES) для всех воркеров
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', default=30))
+AUTH_TOKEN_CACHE_MAX_ENTRIES = int(
+    os.getenv('AUTH_TOKEN_CACHE_MAX_ENTRIES', default=10_000))
+AUTH_TOKEN_SHARED_CACHE = (
+    os.getenv('AUTH_TOKEN_SHARED_CACHE', 'False').capitalize() == 'True')
+
+# Метрики запросов для Prometheus (/api/metrics). METRICS_DIR - общий
+# каталог для файлов метрик воркеров gunicorn; без него отдаются
+# метрики только того процесса, который принял запрос. Без METRICS_TOKEN
+# (Authorization: Bearer <токен>) метрики видят только сотрудники
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 1))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+METRICS_PREFIX = 'foodgram_'
+METRICS_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Под ASGI безопасные запросы к этим маршрутам выполняются асинхронными
+# представлениями (api/async_views.py) в пуле из ASYNC_READ_THREADS
+# потоков; у каждого потока своё соединение с базой
+ASYNC_READ_ROUTES = {
+    'tags-list',
+    'ingredients-list',
+    'recipes-list',
+    'recipes-detail',
+    'subscriptions',
+}
+ASYNC_READ_THREADS = int(os.getenv('ASYNC_READ_THREADS', default=10))
@@ -3,8 +3,11 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from api.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/metrics', metrics_view, name='metrics'),
     path('api/', include('api.users_api.urls')),
     path('api/', include('api.recipes_api.urls')),
 ]
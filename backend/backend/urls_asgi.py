@@ -0,0 +1,7 @@
+from django.conf import settings
+
+from api.async_views import make_async
+
+from .urls import urlpatterns
+
+urlpatterns = make_async(urlpatterns, settings.ASYNC_READ_ROUTES)
@@ -0,0 +1,36 @@
+"""
+Настройки gunicorn (читаются из текущего каталога автоматически).
+Мастер проверяет, что у нескольких воркеров общий кэш, и следит за
+файлами метрик воркеров в METRICS_DIR (см. api/metrics.py).
+"""
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+
+def on_starting(server):
+    django.setup()
+    from django.conf import settings
+    if settings.LOCAL_CACHE and server.cfg.workers > 1:
+        # число воркеров задано не через WEB_CONCURRENCY, см. settings.py
+        from django.core.exceptions import ImproperlyConfigured
+        raise ImproperlyConfigured(
+            f'LocMemCache не разделяется между {server.cfg.workers} '
+            f'воркерами, задайте общий CACHE_BACKEND')
+    from api.metrics import clear_files
+    clear_files()
+
+
+def child_exit(server, worker):
+    from api.metrics import archive_process
+    archive_process(worker.pid)
+
+
+def worker_exit(server, worker):
+    # последние запросы воркера могли ещё не попасть в файл
+    from api.metrics import registry
+    with registry.lock:
+        registry.check_fork()
+        registry.flush()
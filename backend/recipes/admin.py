@@ -1,7 +1,70 @@
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.db import transaction
+from django.forms.models import BaseInlineFormSet
+from django.utils.text import Truncator
 
 from .models import (AmountOfIngredient, Favorite, Ingredient, Recipe,
-                     ShoppingCart, Tag)
+                     ShoppingCart, ShoppingListExport, ShoppingListTotal, Tag)
+from .paginators import EstimatedCountPaginator
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Список без второго COUNT(*) по всей таблице и с оценкой числа
+    строк для больших таблиц.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class ShoppingTotalsAdmin(LargeTableAdmin):
+    """
+    Админка моделей, от которых зависят итоги списков покупок. В api
+    итоги меняются вместе с корзиной и рецептом, здесь после сохранения
+    или удаления они пересчитываются у затронутых пользователей.
+    """
+
+    # путь от строки модели к пользователю корзины
+    cart_user_field = 'user'
+
+    def get_cart_users(self, queryset):
+        """id пользователей, чьи итоги зависят от строк queryset."""
+        return queryset.filter(**{
+            f'{self.cart_user_field}__isnull': False,
+        }).order_by().values_list(self.cart_user_field, flat=True).distinct()
+
+    def get_users(self, pk):
+        if pk is None:
+            return set()
+        return set(self.get_cart_users(self.model.objects.filter(pk=pk)))
+
+    @staticmethod
+    def rebuild_totals(users):
+        if users:
+            ShoppingListTotal.rebuild(sorted(users))
+
+    def save_model(self, request, obj, form, change):
+        # строка могла перейти к другому рецепту или пользователю
+        form.cart_users = self.get_users(obj.pk)
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        # ингредиенты рецепта сохраняются инлайнами, уже после save_model
+        super().save_related(request, form, formsets, change)
+        self.rebuild_totals(
+            form.cart_users | self.get_users(form.instance.pk))
+
+    def delete_model(self, request, obj):
+        users = self.get_users(obj.pk)
+        super().delete_model(request, obj)
+        self.rebuild_totals(users)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            users = set(self.get_cart_users(queryset))
+            super().delete_queryset(request, queryset)
+            self.rebuild_totals(users)
 
 
 @admin.register(Tag)
@@ -15,33 +78,78 @@ class TagAdmin(admin.ModelAdmin):
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(LargeTableAdmin):
     list_display = (
         'id',
         'name',
         'measurement_unit'
     )
-    list_filter = ('name',)
     search_fields = ('name',)
     empty_value_display = '-пусто-'
 
 
+class LoadedAutocompleteSelect(AutocompleteSelect):
+    """
+    Автодополнение, которое берёт подпись выбранного значения из labels,
+    а не отдельным запросом на каждую строку инлайна.
+    """
+    labels = None
+
+    def optgroups(self, name, value, attr=None):
+        selected = [str(item) for item in value if item not in ('', None)]
+        if self.labels is None or not set(selected) <= self.labels.keys():
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        for index, pk in enumerate(selected, len(options)):
+            options.append(
+                self.create_option(name, pk, self.labels[pk], True, index))
+        return [(None, options, 0)]
+
+
+class RecipesIngredientsFormSet(BaseInlineFormSet):
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        # ингредиент уже загружен через select_related
+        if form.instance.ingredient_id is not None:
+            widget = form.fields['ingredient'].widget
+            getattr(widget, 'widget', widget).labels = {
+                str(form.instance.ingredient_id): str(form.instance.ingredient)
+            }
+        return form
+
+
 class RecipesIngredientsInline(admin.TabularInline):
     model = AmountOfIngredient
+    formset = RecipesIngredientsFormSet
     extra = 3
+    autocomplete_fields = ('ingredient',)
+
+    def get_queryset(self, request):
+        # __str__ строки читает ingredient.name
+        return super().get_queryset(request).select_related('ingredient')
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'ingredient':
+            kwargs['widget'] = LoadedAutocompleteSelect(
+                db_field, self.admin_site, using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(ShoppingTotalsAdmin):
     list_display = (
         Recipe.id.field.name,
         Recipe.name.field.name,
         Recipe.author.field.name,
-        Recipe.text.field.name,
+        'short_text',
         Recipe.image.field.name,
         Recipe.cooking_time.field.name,
         Recipe.pub_date.field.name,
-        'amount_favorites'
+        'amount_favorites',
+        Recipe.in_carts_count.field.name,
     )
     fieldsets = (
         (None, {
@@ -54,16 +162,14 @@ class RecipeAdmin(admin.ModelAdmin):
     )
     inlines = (RecipesIngredientsInline,)
     filter_horizontal = (Recipe.tags.field.name,)
-    list_filter = (
-        Recipe.author.field.name,
-        Recipe.name.field.name,
-        Recipe.tags.field.name
-    )
+    autocomplete_fields = (Recipe.author.field.name,)
+    list_select_related = (Recipe.author.field.name,)
+    list_filter = (Recipe.tags.field.name,)
     list_display_links = (Recipe.name.field.name, Recipe.id.field.name,)
-    list_editable = (Recipe.text.field.name,)
-    search_fields = (Recipe.name.field.name,)
+    search_fields = (Recipe.name.field.name, 'author__username')
     readonly_fields = ('amount_favorites',)
     empty_value_display = '-пусто-'
+    cart_user_field = 'shopcart__user'
 
     @staticmethod
     def get_end_letter(value):
@@ -73,24 +179,51 @@ class RecipeAdmin(admin.ModelAdmin):
                 return end_lib[key]
         return ''
 
-    @admin.display(description='В избранном')
+    @admin.display(description='Описание')
+    def short_text(self, obj):
+        return Truncator(obj.text).chars(80)
+
+    @admin.display(description='В избранном',
+                   ordering=Recipe.favorites_count.field.name)
     def amount_favorites(self, obj):
-        count_ = obj.favorite.count()
-        end_letters = self.get_end_letter(obj.favorite.count())
+        count_ = obj.favorites_count
+        end_letters = self.get_end_letter(count_)
         return (f'Рецепт добавлен в '
                 f'избранное у авторов {count_} раз{end_letters}')
 
 
 @admin.register(AmountOfIngredient)
-class AmountOfIngredientAdmin(admin.ModelAdmin):
+class AmountOfIngredientAdmin(ShoppingTotalsAdmin):
     list_display = (
         'id',
         'ingredient',
         'recipe',
         'amount'
     )
+    list_select_related = ('ingredient', 'recipe')
+    autocomplete_fields = ('ingredient',)
+    raw_id_fields = ('recipe',)
     empty_value_display = '-пусто-'
+    cart_user_field = 'recipe__shopcart__user'
+
+
+@admin.register(Favorite)
+class UserRecipeAdmin(LargeTableAdmin):
+    list_display = (
+        'id',
+        'user',
+        'recipe'
+    )
+    list_select_related = ('user', 'recipe')
+    raw_id_fields = ('user', 'recipe')
+    empty_value_display = '-пусто-'
+
+
+@admin.register(ShoppingCart)
+class ShoppingCartAdmin(UserRecipeAdmin, ShoppingTotalsAdmin):
+    pass
 
 
-admin.site.register(Favorite)
-admin.site.register(ShoppingCart)
+@admin.register(ShoppingListExport)
+class ShoppingListExportAdmin(LargeTableAdmin):
+    raw_id_fields = ('user',)
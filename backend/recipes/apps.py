@@ -1,6 +1,22 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.signals import post_migrate
+
+SEARCH_MIGRATION = ('recipes', '0014_recipe_search')
+
+
+def restore_search_index(sender, using, **kwargs):
+    from .search import install_sqlite_fts
+    connection = connections[using]
+    if (connection.vendor == 'sqlite' and SEARCH_MIGRATION
+            in MigrationRecorder(connection).applied_migrations()):
+        install_sqlite_fts(connection)
 
 
 class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
+
+    def ready(self):
+        post_migrate.connect(restore_search_index, sender=self)
@@ -0,0 +1,59 @@
+"""
+Денормализованные счётчики: Recipe.favorites_count, Recipe.in_carts_count,
+User.recipes_count и User.followers_count.
+
+Счётчики меняются одним UPDATE ... SET x = x ± 1 в той же транзакции,
+что и создание или удаление связанной строки (см. api/signals.py).
+Расхождения находит и исправляет команда reconcile_counters.
+"""
+from collections import namedtuple
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from users.models import Follow, User
+
+from .models import Favorite, Recipe, ShoppingCart
+
+Counter = namedtuple('Counter', ('model', 'field', 'related', 'related_field'))
+
+COUNTERS = (
+    Counter(Recipe, 'favorites_count', Favorite, 'recipe'),
+    Counter(Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    Counter(User, 'recipes_count', Recipe, 'author'),
+    Counter(User, 'followers_count', Follow, 'author'),
+)
+
+
+def change(model, pk, field, delta):
+    # ниже нуля не опускаемся, даже если счётчик уже разошёлся
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)})
+
+
+def get_expected(counter):
+    """Выражение с настоящим числом связанных строк для каждого объекта."""
+    related = counter.related.objects.filter(
+        **{counter.related_field: OuterRef('pk')}
+    ).order_by().values(counter.related_field).annotate(
+        total=Count('pk')).values('total')
+    return Coalesce(Subquery(related, output_field=IntegerField()), 0)
+
+
+def find_drift(counter):
+    """[(pk, значение в столбце, настоящее значение), ...]"""
+    return list(
+        counter.model.objects.annotate(
+            expected=get_expected(counter),
+        ).exclude(
+            **{counter.field: F('expected')},
+        ).order_by('pk').values_list('pk', counter.field, 'expected')
+    )
+
+
+def repair(counter, pks=None):
+    """Пересчитать счётчик у объектов pks (по умолчанию у всех)."""
+    objects = counter.model.objects.all()
+    if pks is not None:
+        objects = objects.filter(pk__in=pks)
+    return objects.update(**{counter.field: get_expected(counter)})
@@ -0,0 +1,145 @@
+"""
+Выгрузка списка покупок в разные форматы.
+
+Каждый экспортёр получает пользователя и возвращает содержимое файла
+в байтах, поэтому одинаково подходит и для ответа в запросе,
+и для фоновой задачи.
+"""
+import csv
+import io
+import zipfile
+from collections import namedtuple
+from xml.sax.saxutils import escape
+
+from django.utils import timezone
+from reportlab.pdfgen import canvas
+
+from .models import Recipe, ShoppingListExport, ShoppingListTotal
+
+ExportFormat = namedtuple(
+    'ExportFormat', ('content_type', 'extension', 'render'))
+
+
+def get_filename(user, export_format):
+    return f'{user.username}_shopping_list.{export_format.extension}'
+
+
+def render_pdf(user):
+    buffer = io.BytesIO()
+    Recipe.get_shopping_cart(user, canvas.Canvas(buffer))
+    return buffer.getvalue()
+
+
+def render_csv(user):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(('name', 'measurement_unit', 'amount'))
+    for item in ShoppingListTotal.get_shopping_list(user):
+        writer.writerow((item.name, item.measurement_unit, item.amount))
+    return buffer.getvalue().encode('utf-8-sig')
+
+
+def render_txt(user):
+    today = timezone.now()
+    lines = [
+        'Foodgram - «Продуктовый помощник»',
+        '',
+        f'Список покупок пользователя: {user.get_full_name()}',
+        '',
+        f'Дата: {today.day}.{today.month}.{today.year}',
+        '',
+    ]
+    lines += [
+        f'• {item.name} ({item.measurement_unit}) — {item.amount}'
+        for item in ShoppingListTotal.get_shopping_list(user)
+    ]
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/'
+        'content-types">'
+        '<Default Extension="rels" ContentType="application/'
+        'vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/'
+        '2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/'
+        'officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<workbook xmlns="http://schemas.openxmlformats.org/'
+        'spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/'
+        'relationships">'
+        '<sheets><sheet name="Список покупок" sheetId="1" r:id="rId1"/>'
+        '</sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/'
+        '2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/'
+        'officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def render_xlsx_cell(value):
+    if isinstance(value, int):
+        return f'<c><v>{value}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+
+def render_xlsx(user):
+    # минимальная книга Office Open XML из одного листа, строки хранятся
+    # прямо в ячейках: без сторонних библиотек
+    rows = [('Ингредиент', 'Единица измерения', 'Количество')]
+    rows += [
+        (item.name, item.measurement_unit, item.amount)
+        for item in ShoppingListTotal.get_shopping_list(user)
+    ]
+    sheet = (
+        '<worksheet xmlns="http://schemas.openxmlformats.org/'
+        'spreadsheetml/2006/main"><sheetData>'
+        + ''.join(
+            '<row>' + ''.join(render_xlsx_cell(value) for value in row)
+            + '</row>'
+            for row in rows
+        )
+        + '</sheetData></worksheet>'
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, part in (*XLSX_PARTS.items(),
+                           ('xl/worksheets/sheet1.xml', sheet)):
+            archive.writestr(
+                name, '<?xml version="1.0" encoding="UTF-8" '
+                      'standalone="yes"?>\n' + part)
+    return buffer.getvalue()
+
+
+EXPORT_FORMATS = {
+    ShoppingListExport.PDF: ExportFormat(
+        'application/pdf', 'pdf', render_pdf),
+    ShoppingListExport.CSV: ExportFormat(
+        'text/csv; charset=utf-8', 'csv', render_csv),
+    ShoppingListExport.TXT: ExportFormat(
+        'text/plain; charset=utf-8', 'txt', render_txt),
+    # значение xls осталось прежним, чтобы не менять API и старые записи
+    ShoppingListExport.XLS: ExportFormat(
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        'xlsx', render_xlsx),
+}
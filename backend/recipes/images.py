@@ -0,0 +1,110 @@
+"""
+Уменьшенные копии изображений рецептов.
+
+Оригинал загрузки не меняется. Рядом с ним в recipes_img/variants/
+сохраняются копии каждого размера из RECIPE_IMAGE_VARIANTS в форматах
+RECIPE_IMAGE_FORMATS, а пути к ним записываются в Recipe.image_variants.
+Обработка выполняется в фоновом пуле (см. tasks.py) или командой
+process_recipe_images. Файлы удалённого рецепта удаляются вместе с ним
+(см. api/signals.py).
+"""
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, features
+
+from .models import Recipe
+
+VARIANTS_DIR = 'recipes_img/variants'
+
+SAVE_OPTIONS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True,
+             'progressive': True},
+}
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+def get_formats():
+    return [
+        format_ for format_ in settings.RECIPE_IMAGE_FORMATS
+        if format_ != 'webp' or features.check('webp')
+    ]
+
+
+def check_pixels(image):
+    width, height = image.size
+    if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+        raise ImageTooLarge(
+            f'Изображение {width}x{height} больше '
+            f'{settings.RECIPE_IMAGE_MAX_PIXELS} пикселей')
+
+
+def render_variants(image_file, stem):
+    """Вернуть {'<размер>_<формат>': (имя файла, байты)}."""
+    with Image.open(image_file) as image:
+        check_pixels(image)
+        image.load()
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands()
+                                  else 'RGB')
+        variants = {}
+        for size_name, max_side in settings.RECIPE_IMAGE_VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail((max_side, max_side), Image.LANCZOS)
+            for format_ in get_formats():
+                target = resized
+                if format_ == 'jpeg' and target.mode != 'RGB':
+                    target = target.convert('RGB')
+                buffer = io.BytesIO()
+                target.save(buffer, **SAVE_OPTIONS[format_])
+                extension = 'jpg' if format_ == 'jpeg' else format_
+                variants[f'{size_name}_{format_}'] = (
+                    f'{stem}_{size_name}.{extension}', buffer.getvalue())
+        return variants
+
+
+def delete_image_files(recipe):
+    """Удалить оригинал и уменьшенные копии изображения рецепта."""
+    for path in (recipe.image.name, *recipe.image_variants.values()):
+        if path:
+            default_storage.delete(path)
+
+
+def generate_image_variants(recipe_id):
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None or not recipe.image:
+        return
+    image_name = recipe.image.name
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    with recipe.image.open('rb') as image_file:
+        variants = render_variants(image_file, stem)
+
+    paths = {}
+    for key, (filename, content) in variants.items():
+        path = os.path.join(VARIANTS_DIR, filename)
+        if default_storage.exists(path):
+            default_storage.delete(path)
+        paths[key] = default_storage.save(path, ContentFile(content))
+
+    # пока шла обработка, изображение рецепта могли заменить, а сам
+    # рецепт - удалить
+    try:
+        recipe.refresh_from_db(fields=('image', 'image_variants'))
+    except Recipe.DoesNotExist:
+        recipe = None
+    if recipe is None or recipe.image.name != image_name:
+        for path in paths.values():
+            default_storage.delete(path)
+        return
+    stale = set(recipe.image_variants.values()) - set(paths.values())
+    recipe.image_variants = paths
+    recipe.save(update_fields=('image_variants',))
+    for path in stale:
+        default_storage.delete(path)
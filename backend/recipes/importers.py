@@ -0,0 +1,354 @@
+"""
+Потоковая загрузка справочников (ингредиенты, тэги) из CSV и JSON.
+
+Файл читается по частям и обрабатывается пачками: повторы внутри файла
+отбрасываются в памяти, для пачки выполняется один SELECT уже
+существующих ключей и один bulk_create(ignore_conflicts=True). Записи,
+которые совпадают с другой записью файла или базы не по ключу, а по
+другому уникальному полю (у тэгов name и color при ключе slug), в базу
+не попадают и считаются в отчёте отдельно как конфликты.
+В PostgreSQL с --copy пачка копируется командой COPY во временную
+таблицу и переносится одним INSERT ... ON CONFLICT DO NOTHING.
+bulk_create не отправляет сигналы, поэтому версия справочника меняется
+в конце загрузки явно, а после других массовых вставок (load_dump,
+generate_fake_data) производные данные пересчитывает refresh_derived.
+"""
+import csv
+import io
+import json
+import os
+import re
+import time
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.recipes_api import catalogue
+from users.models import Follow
+
+from . import counters
+from .models import (AmountOfIngredient, FeedItem, Ingredient, Recipe,
+                     ShoppingCart, ShoppingListTotal, Tag)
+
+DATA_ROOT = os.path.join(settings.BASE_DIR, 'data')
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r'\s*')
+FORMATS = ('csv', 'json')
+
+
+def iter_json_array(file, chunk_size=CHUNK_SIZE):
+    """
+    Элементы JSON-массива верхнего уровня по одному. В памяти держится
+    только текущий кусок файла. Элементы должны быть объектами или
+    массивами: число на границе куска разобралось бы не целиком.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+    # что ждём дальше: '[', элемент или ']' сразу после '[', ',' или ']'
+    # после элемента, элемент после ','
+    expected = '['
+    while True:
+        position = WHITESPACE.match(buffer, position).end()
+        if position < len(buffer):
+            char = buffer[position]
+            if expected == '[':
+                if char != '[':
+                    raise ValueError('Ожидается JSON-массив')
+                expected = 'item]'
+                position += 1
+                continue
+            if char == ']' and expected != 'item':
+                return
+            if expected == ',]':
+                if char != ',':
+                    raise ValueError(
+                        'Ожидается запятая или конец JSON-массива')
+                expected = 'item'
+                position += 1
+                continue
+            if char in ',]':
+                raise ValueError('Лишняя запятая в JSON-массиве')
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # элемент обрезан границей куска, дочитываем
+                if eof:
+                    raise
+            else:
+                yield item
+                expected = ',]'
+                continue
+        elif eof:
+            raise ValueError('JSON-массив не закрыт')
+        buffer = buffer[position:]
+        position = 0
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+
+def refresh_derived(models):
+    """
+    После массовой вставки в models пересчитать то, что при обычной
+    записи меняют сигналы: счётчики, итоги списков покупок, ленты и
+    версии справочников.
+    """
+    for counter in counters.COUNTERS:
+        if {counter.model, counter.related} & models:
+            counters.repair(counter)
+    if {ShoppingCart, AmountOfIngredient} & models:
+        ShoppingListTotal.rebuild()
+    if {Follow, Recipe} & models:
+        FeedItem.fill()
+    if Tag in models:
+        catalogue.bump_version(catalogue.TAGS)
+    if Ingredient in models:
+        catalogue.bump_version(catalogue.INGREDIENTS)
+
+
+def iter_records(file, file_format, columns):
+    """(номер записи, dict или None для неразборчивой записи)"""
+    if file_format == 'json':
+        for number, item in enumerate(iter_json_array(file), 1):
+            yield number, item if isinstance(item, dict) else None
+        return
+    for number, row in enumerate(csv.reader(file), 1):
+        if not row:
+            continue
+        yield number, (
+            dict(zip(columns, row)) if len(row) == len(columns) else None)
+
+
+class CatalogueImportCommand(BaseCommand):
+    """
+    Общая часть команд загрузки справочников. В наследнике задаются
+    модель, столбцы файла, ключ для поиска повторов и справочник,
+    версию которого нужно сменить после загрузки.
+    """
+    model = None
+    columns = ()
+    key = ()
+    catalogue_name = None
+    default_filename = None
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'filename',
+            default=self.default_filename,
+            nargs='?',
+            type=str,
+            help='file in the data directory or an absolute path',
+        )
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='input format, by default taken from the file extension',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+        )
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='PostgreSQL only: load batches with COPY and upsert',
+        )
+
+    def clean(self, record):
+        if record is None:
+            raise ValidationError('Неверный формат записи')
+        values = {}
+        for column in self.columns:
+            value = record.get(column)
+            if isinstance(value, str):
+                value = value.strip()
+            values[column] = self.model._meta.get_field(column).clean(
+                value, None)
+        return values
+
+    def get_unique_columns(self):
+        """Уникальные столбцы, кроме ключа."""
+        return [
+            column for column in self.columns
+            if self.model._meta.get_field(column).unique
+            and (column,) != tuple(self.key)
+        ]
+
+    def report_conflict(self, key, column, value, place):
+        if self.verbosity > 1:
+            self.stderr.write(
+                f'{", ".join(map(str, key))}: {column} «{value}» '
+                f'уже есть {place}')
+
+    def drop_conflicts(self, batch):
+        """
+        Убрать из пачки записи, чьё уникальное поле занято в базе
+        записью с другим ключом; вернуть их число.
+        """
+        conflicts = set()
+        for column in self.get_unique_columns():
+            owners = {
+                value: key for value, *key in self.model.objects.filter(**{
+                    f'{column}__in': {
+                        values[column] for values in batch.values()},
+                }).values_list(column, *self.key)
+            }
+            for key, values in batch.items():
+                owner = owners.get(values[column])
+                if owner is not None and tuple(owner) != key:
+                    conflicts.add(key)
+                    self.report_conflict(
+                        key, column, values[column], 'в базе')
+        for key in conflicts:
+            del batch[key]
+        return len(conflicts)
+
+    def prepare(self, objects):
+        """Дополнить новые объекты перед вставкой."""
+
+    def get_insert_fields(self):
+        return [self.model._meta.get_field(column) for column in self.columns]
+
+    def get_new(self, batch):
+        first = self.key[0]
+        existing = set(self.model.objects.filter(**{
+            f'{first}__in': {key[0] for key in batch},
+        }).values_list(*self.key))
+        return [
+            self.model(**values) for key, values in batch.items()
+            if key not in existing
+        ]
+
+    def insert(self, objects):
+        self.model.objects.bulk_create(objects, ignore_conflicts=True)
+
+    def copy(self, objects):
+        table = self.model._meta.db_table
+        fields = self.get_insert_fields()
+        columns = ', '.join(
+            connection.ops.quote_name(field.column) for field in fields)
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(
+            [field.get_db_prep_save(getattr(obj, field.attname), connection)
+             for field in fields]
+            for obj in objects
+        )
+        buffer.seek(0)
+        staging = connection.ops.quote_name(f'{table}_import')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE {staging} ON COMMIT DROP AS '
+                f'SELECT {columns} FROM {table} WITH NO DATA')
+            cursor.copy_expert(
+                f'COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv)',
+                buffer)
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) '
+                f'SELECT {columns} FROM {staging} ON CONFLICT DO NOTHING')
+
+    def load_batch(self, batch, use_copy):
+        """Загрузить пачку, вернуть число конфликтов с базой."""
+        with transaction.atomic():
+            conflicts = self.drop_conflicts(batch)
+            if use_copy:
+                objects = [self.model(**values) for values in batch.values()]
+            else:
+                objects = self.get_new(batch)
+            if not objects:
+                return conflicts
+            self.prepare(objects)
+            if use_copy:
+                self.copy(objects)
+            else:
+                self.insert(objects)
+        return conflicts
+
+    def get_path(self, filename):
+        # абсолютный путь os.path.join оставляет как есть
+        return os.path.join(DATA_ROOT, filename)
+
+    def handle(self, *args, **options):
+        path = self.get_path(options['filename'])
+        file_format = options['format'] or os.path.splitext(
+            path)[1].lstrip('.').lower()
+        if file_format not in FORMATS:
+            raise CommandError(
+                f'Неизвестный формат {file_format}, укажите --format')
+        use_copy = options['copy']
+        if use_copy and connection.vendor != 'postgresql':
+            raise CommandError('--copy работает только с PostgreSQL')
+        batch_size = options['batch_size']
+        verbosity = self.verbosity = options['verbosity']
+
+        before = self.model.objects.count()
+        seen = set()
+        seen_unique = {column: set() for column in self.get_unique_columns()}
+        batch = {}
+        processed = invalid = duplicates = conflicts = 0
+        started = time.perf_counter()
+        try:
+            with open(path, 'r', encoding='utf-8', newline='') as file:
+                records = iter_records(file, file_format, self.columns)
+                for number, record in records:
+                    processed += 1
+                    try:
+                        values = self.clean(record)
+                    except ValidationError as error:
+                        invalid += 1
+                        if verbosity > 1:
+                            self.stderr.write(
+                                f'{number}: {"; ".join(error.messages)}')
+                        continue
+                    key = tuple(values[column] for column in self.key)
+                    if key in seen:
+                        duplicates += 1
+                        continue
+                    conflict = next((
+                        column for column, values_seen in seen_unique.items()
+                        if values[column] in values_seen
+                    ), None)
+                    if conflict is not None:
+                        conflicts += 1
+                        self.report_conflict(
+                            key, conflict, values[conflict], 'в файле')
+                        continue
+                    seen.add(key)
+                    for column, values_seen in seen_unique.items():
+                        values_seen.add(values[column])
+                    batch[key] = values
+                    if len(batch) >= batch_size:
+                        conflicts += self.load_batch(batch, use_copy)
+                        batch = {}
+                        if verbosity:
+                            elapsed = time.perf_counter() - started
+                            self.stdout.write(
+                                f'{processed} rows, '
+                                f'{processed / elapsed:.0f} rows/s')
+                if batch:
+                    conflicts += self.load_batch(batch, use_copy)
+        except FileNotFoundError:
+            raise CommandError(
+                f'Добавьте файл {options["filename"]} в директорию data')
+        except ValueError as error:
+            raise CommandError(f'Ошибка в файле после {processed} строк: '
+                               f'{error}')
+        elapsed = time.perf_counter() - started
+
+        inserted = self.model.objects.count() - before
+        if inserted:
+            catalogue.bump_version(self.catalogue_name)
+        skipped = processed - invalid - conflicts - inserted
+        self.stdout.write(
+            f'Load {os.path.basename(path)} finished: '
+            f'{inserted} inserted, {skipped} skipped '
+            f'({duplicates} duplicated in file), {invalid} invalid, '
+            f'{conflicts} conflicting; '
+            f'{processed} rows in {elapsed:.2f}s '
+            f'({processed / max(elapsed, 1e-9):.0f} rows/s)')
+        if conflicts and verbosity < 2:
+            self.stderr.write(
+                f'{conflicts} records conflict with other records on a '
+                f'unique field, run with -v 2 to list them')
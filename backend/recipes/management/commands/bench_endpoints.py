@@ -0,0 +1,328 @@
+import base64
+import io
+import json
+import os
+import statistics
+import subprocess
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Count
+from django.test import Client
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from api.authentication import tokens
+from api.middleware import QueryCounter
+from recipes.models import Ingredient, Recipe, ShoppingListExport, Tag
+from recipes.tasks import run_export
+from users.models import Follow, User
+
+from .generate_fake_data import PASSWORD
+
+BUDGETS = os.path.join(settings.BASE_DIR, 'data', 'bench_budgets.json')
+
+# (название, метод, путь, тело запроса, от имени пользователя)
+CASES = (
+    ('tags-list', 'get', '/api/tags/', None, False),
+    ('tags-detail', 'get', '/api/tags/{tag}/', None, False),
+    ('ingredients-list', 'get', '/api/ingredients/?name={prefix}', None,
+     False),
+    ('ingredients-detail', 'get', '/api/ingredients/{ingredient}/', None,
+     False),
+    ('recipes-list-anonymous', 'get', '/api/recipes/', None, False),
+    ('recipes-list', 'get', '/api/recipes/', None, True),
+    ('recipes-list-tags', 'get', '/api/recipes/?tags={tag_slug}', None, True),
+    ('recipes-list-search', 'get', '/api/recipes/?search={word}', None, True),
+    ('recipes-list-favorited', 'get', '/api/recipes/?is_favorited=1', None,
+     True),
+    ('recipes-list-cart', 'get', '/api/recipes/?is_in_shopping_cart=1', None,
+     True),
+    ('recipes-detail', 'get', '/api/recipes/{recipe}/', None, True),
+    ('recipes-feed', 'get', '/api/recipes/feed/', None, True),
+    ('recipes-download-shopping-cart', 'get',
+     '/api/recipes/download_shopping_cart/', None, True),
+    ('recipes-download-shopping-cart-txt', 'get',
+     '/api/recipes/download_shopping_cart/?export_format=txt', None, True),
+    ('recipes-create', 'post', '/api/recipes/', 'recipe', True),
+    ('recipes-update', 'patch', '/api/recipes/{own_recipe}/', 'recipe',
+     True),
+    ('recipes-favorite', 'post', '/api/recipes/{other_recipe}/favorite/',
+     None, True),
+    ('recipes-favorite-delete', 'delete',
+     '/api/recipes/{favorited_recipe}/favorite/', None, True),
+    ('recipes-shopping-cart', 'post',
+     '/api/recipes/{other_recipe}/shopping_cart/', None, True),
+    ('recipes-shopping-cart-delete', 'delete',
+     '/api/recipes/{cart_recipe}/shopping_cart/', None, True),
+    ('recipes-delete', 'delete', '/api/recipes/{own_recipe}/', None, True),
+    ('shopping-list-exports-create', 'post', '/api/shopping_list_exports/',
+     'export', True),
+    ('shopping-list-exports-detail', 'get',
+     '/api/shopping_list_exports/{export}/', None, True),
+    ('shopping-list-exports-download', 'get',
+     '/api/shopping_list_exports/{export}/download/', None, True),
+    ('users-list', 'get', '/api/users/', None, True),
+    ('users-detail', 'get', '/api/users/{author}/', None, True),
+    ('users-me', 'get', '/api/users/me/', None, True),
+    ('subscriptions', 'get', '/api/users/subscriptions/?recipes_limit=3',
+     None, True),
+    ('subscribe', 'post', '/api/users/{author}/subscribe/', None, True),
+    ('unsubscribe', 'delete', '/api/users/{followed}/subscribe/', None,
+     True),
+    ('users-set-password', 'post', '/api/users/set_password/', 'password',
+     True),
+    ('token-login', 'post', '/api/auth/token/login/', 'login', False),
+    ('token-logout', 'post', '/api/auth/token/logout/', None, True),
+)
+
+
+class Command(BaseCommand):
+    """
+    Скрипт для замера времени ответа и числа SQL-запросов каждого
+    маршрута api на данных generate_fake_data. Запросы идут через
+    тестовый клиент в транзакции, которая откатывается, поэтому запросы
+    на запись не меняют данные. Превышение бюджета из
+    data/bench_budgets.json завершает команду с ошибкой; бюджеты
+    рассчитаны на generate_fake_data с параметрами по умолчанию.
+    """
+    help = 'benchmark api routes against query and latency budgets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=20)
+        parser.add_argument('--budgets', default=BUDGETS)
+        parser.add_argument(
+            '--output',
+            default='bench_results.json',
+            help='where to save the results as JSON',
+        )
+        parser.add_argument(
+            '--compare',
+            help='results JSON of a previous run to print the difference',
+        )
+        parser.add_argument(
+            '--update-budgets',
+            action='store_true',
+            help='write budgets from this run instead of checking them',
+        )
+        parser.add_argument(
+            '--case',
+            action='append',
+            help='run only these cases',
+        )
+
+    @staticmethod
+    def get_image():
+        buffer = io.BytesIO()
+        Image.new('RGB', (8, 8), 'orange').save(buffer, 'PNG')
+        return ('data:image/png;base64,'
+                + base64.b64encode(buffer.getvalue()).decode())
+
+    def prepare(self):
+        """Пользователь, объекты для путей и тела запросов."""
+        user = User.objects.filter(
+            username__startswith='fake', recipes_count__gt=0,
+        ).annotate(carts=Count('shopcart')).order_by(
+            '-carts', '-recipes_count').first()
+        if user is None:
+            raise CommandError(
+                'Создайте данные командой generate_fake_data')
+        followed = Follow.objects.filter(follower=user).values('author_id')
+        author = User.objects.exclude(pk__in=followed).exclude(
+            pk=user.pk).order_by('-followers_count').first()
+        recipe = Recipe.objects.order_by('-favorites_count').first()
+        other_recipe = Recipe.objects.exclude(author=user).exclude(
+            favorite__user=user).exclude(shopcart__user=user).order_by(
+            '-favorites_count').first()
+        tag = Tag.objects.order_by('id').first()
+        ingredients = list(Ingredient.objects.order_by('id')[:5])
+        # готовая выгрузка для download, файл удаляется в конце
+        self.export = ShoppingListExport.objects.create(
+            user=user, format=ShoppingListExport.TXT)
+        run_export(self.export.pk)
+        params = {
+            'tag': tag.pk,
+            'tag_slug': tag.slug,
+            'ingredient': ingredients[0].pk,
+            'prefix': ingredients[0].name[:2],
+            'recipe': recipe.pk,
+            'own_recipe': user.recipes.order_by('id').first().pk,
+            'other_recipe': other_recipe.pk,
+            'word': recipe.name.split()[0],
+            'favorited_recipe': user.favorite.values_list(
+                'recipe_id', flat=True).first(),
+            'cart_recipe': user.shopcart.values_list(
+                'recipe_id', flat=True).first(),
+            'author': author.pk,
+            'followed': followed.values_list('author_id', flat=True).first(),
+            'export': self.export.pk,
+        }
+        payloads = {
+            'recipe': {
+                'name': 'Замер', 'text': 'Замер', 'cooking_time': 10,
+                'image': self.get_image(),
+                'tags': [tag.pk],
+                'ingredients': [{'id': ingredient.pk, 'amount': 10}
+                                for ingredient in ingredients],
+            },
+            'export': {'format': ShoppingListExport.TXT},
+            'login': {'email': user.email, 'password': PASSWORD},
+            'password': {'current_password': PASSWORD,
+                         'new_password': f'{PASSWORD}-new'},
+        }
+        token = Token.objects.get_or_create(user=user)[0]
+        return user, token, params, payloads
+
+    def request(self, client, method, path, data, headers):
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            # запись в каждом запросе откатывается
+            stack.enter_context(transaction.atomic())
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            started = time.perf_counter()
+            response = getattr(client, method)(
+                path, data=json.dumps(data) if data else None,
+                content_type='application/json', **headers)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        return response.status_code, counter.count, elapsed
+
+    def run_case(self, client, case, params, payloads, headers, rounds):
+        name, method, path, payload, authenticated = case
+        path = path.format(**params)
+        data = payloads.get(payload)
+        headers = headers if authenticated else {}
+        # первый запрос с пустым кэшем, остальные с прогретым
+        cache.clear()
+        tokens.clear()
+        status, cold_queries, none_ = self.request(
+            client, method, path, data, headers)
+        queries, timings = 0, []
+        for none_ in range(rounds):
+            status, count, elapsed = self.request(
+                client, method, path, data, headers)
+            queries = max(queries, count)
+            timings.append(elapsed * 1000)
+        timings.sort()
+        return {
+            'status': status,
+            'cold_queries': cold_queries,
+            'queries': queries,
+            'median_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(
+                timings[max(0, int(len(timings) * 0.95 + 0.5) - 1)], 2),
+        }
+
+    @staticmethod
+    def get_commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True, cwd=settings.BASE_DIR,
+            ).stdout.strip() or None
+        except OSError:
+            return None
+
+    def check_budgets(self, results, budgets):
+        failures = []
+        for name, budget in budgets.items():
+            result = results.get(name)
+            if result is None:
+                continue
+            if result['status'] != budget.get('status', result['status']):
+                failures.append(
+                    f'{name}: status {result["status"]}, '
+                    f'expected {budget["status"]}')
+            failures.extend(
+                f'{name}: {key} {result[key]} > {limit}'
+                for key, limit in budget.items()
+                if key != 'status' and result[key] > limit)
+        return failures
+
+    @staticmethod
+    def make_budgets(results):
+        # число запросов не зависит от машины, время - зависит,
+        # поэтому для времени запас
+        return {
+            name: {
+                'status': result['status'],
+                'cold_queries': result['cold_queries'],
+                'queries': result['queries'],
+                'p95_ms': max(100, round(result['p95_ms'] * 3, -1)),
+            }
+            for name, result in results.items()
+        }
+
+    def print_comparison(self, results, path):
+        with open(path) as file:
+            previous = json.load(file)['results']
+        for name, result in results.items():
+            before = previous.get(name)
+            if before is None:
+                continue
+            self.stdout.write(
+                f'{name:36} queries {before["queries"]:3} -> '
+                f'{result["queries"]:3}, p95 {before["p95_ms"]:8.2f} -> '
+                f'{result["p95_ms"]:8.2f} ms')
+
+    def handle(self, *args, **options):
+        cases = [case for case in CASES
+                 if not options['case'] or case[0] in options['case']]
+        client = Client()
+        results = {}
+        with transaction.atomic():
+            user, token, params, payloads = self.prepare()
+            headers = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+            try:
+                for case in cases:
+                    result = self.run_case(client, case, params, payloads,
+                                           headers, options['rounds'])
+                    results[case[0]] = result
+                    self.stdout.write(
+                        f'{case[0]:36} {result["status"]} '
+                        f'queries {result["cold_queries"]:3} cold, '
+                        f'{result["queries"]:3} warm; '
+                        f'median {result["median_ms"]:8.2f} ms, '
+                        f'p95 {result["p95_ms"]:8.2f} ms')
+            finally:
+                self.export.refresh_from_db()
+                self.export.file.delete(save=False)
+            dataset = {
+                'users': User.objects.count(),
+                'recipes': Recipe.objects.count(),
+                'follows': Follow.objects.count(),
+            }
+            transaction.set_rollback(True)
+
+        with open(options['output'], 'w') as file:
+            json.dump({
+                'commit': self.get_commit(),
+                'created': timezone.now().isoformat(),
+                'vendor': connections['default'].vendor,
+                'dataset': dataset,
+                'rounds': options['rounds'],
+                'results': results,
+            }, file, ensure_ascii=False, indent=2)
+        if options['compare']:
+            self.print_comparison(results, options['compare'])
+
+        if options['update_budgets']:
+            with open(options['budgets'], 'w') as file:
+                json.dump(self.make_budgets(results), file, indent=2)
+                file.write('\n')
+            self.stdout.write(f'Budgets written to {options["budgets"]}')
+            return
+        with open(options['budgets']) as file:
+            failures = self.check_budgets(results, json.load(file))
+        if failures:
+            raise CommandError(
+                'Budgets exceeded:\n' + '\n'.join(failures))
+        self.stdout.write('All budgets met')
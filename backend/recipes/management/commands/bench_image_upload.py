@@ -0,0 +1,131 @@
+import base64
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.core.management.base import BaseCommand, CommandError
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from PIL import Image
+from rest_framework.request import Request
+
+from api.fields import RecipeImageField
+from api.recipes_api.views import RecipeViewSet
+
+
+class Command(BaseCommand):
+    """
+    Скрипт для сравнения пиковой памяти (RSS) при загрузке изображения
+    рецепта строкой base64 в JSON и файлом в multipart/form-data.
+    Каждый способ разбирается в отдельном процессе, потому что пик RSS
+    нельзя сбросить внутри процесса.
+    """
+    help = 'benchmark peak RSS of base64 JSON vs multipart image upload'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--width', type=int, default=4000)
+        parser.add_argument('--height', type=int, default=3000)
+        parser.add_argument(
+            '--body',
+            help='internal: parse the request body from this file',
+        )
+        parser.add_argument('--content-type', help='internal')
+
+    @staticmethod
+    def make_image(width, height):
+        # шум плохо сжимается, размер файла близок к худшему случаю
+        image = Image.frombytes('RGB', (width, height),
+                                os.urandom(width * height * 3))
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=90)
+        return buffer.getvalue()
+
+    @staticmethod
+    def get_max_rss():
+        # ru_maxrss переживает fork/exec и в дочернем процессе может быть
+        # пиком родителя, а VmHWM в Linux считается для нового процесса
+        try:
+            with open('/proc/self/status') as status:
+                for line in status:
+                    if line.startswith('VmHWM:'):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def parse_body(self, path, content_type):
+        environ = {
+            'REQUEST_METHOD': 'POST',
+            'PATH_INFO': '/api/recipes/',
+            'SERVER_NAME': 'testserver',
+            'SERVER_PORT': '80',
+            'wsgi.url_scheme': 'http',
+            'CONTENT_TYPE': content_type,
+            'CONTENT_LENGTH': str(os.path.getsize(path)),
+        }
+        with open(path, 'rb') as body:
+            environ['wsgi.input'] = body
+            baseline = self.get_max_rss()
+            request = Request(
+                WSGIRequest(environ),
+                parsers=[parser() for parser in RecipeViewSet.parser_classes],
+            )
+            image = RecipeImageField().to_internal_value(
+                request.data['image'])
+            image.close()
+        self.stdout.write(json.dumps({
+            'baseline': baseline,
+            'peak': self.get_max_rss(),
+        }))
+
+    def run_child(self, path, content_type, max_size):
+        environ = dict(os.environ, RECIPE_IMAGE_MAX_UPLOAD_SIZE=str(max_size))
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(sys.argv[0]),
+             'bench_image_upload', '--body', path,
+             '--content-type', content_type],
+            capture_output=True, text=True, env=environ,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr)
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        if options['body']:
+            self.parse_body(options['body'], options['content_type'])
+            return
+
+        image = self.make_image(options['width'], options['height'])
+        self.stdout.write(
+            f'image {options["width"]}x{options["height"]}, '
+            f'{len(image) / 2 ** 20:.1f} MiB')
+        fields = {'name': 'bench', 'text': 'bench', 'cooking_time': '1'}
+        with tempfile.TemporaryDirectory() as directory:
+            image_path = os.path.join(directory, 'image.jpg')
+            with open(image_path, 'wb') as file:
+                file.write(image)
+            with open(image_path, 'rb') as file:
+                multipart = encode_multipart(
+                    BOUNDARY, {**fields, 'image': file})
+            data_url = ('data:image/jpeg;base64,'
+                        + base64.b64encode(image).decode())
+            bodies = {
+                'base64 JSON': (
+                    json.dumps({**fields, 'image': data_url}).encode(),
+                    'application/json',
+                ),
+                'multipart': (multipart, MULTIPART_CONTENT),
+            }
+            for name, (body, content_type) in bodies.items():
+                path = os.path.join(directory, 'body')
+                with open(path, 'wb') as file:
+                    file.write(body)
+                result = self.run_child(path, content_type, len(body))
+                growth = (result['peak'] - result['baseline']) / 1024
+                self.stdout.write(
+                    f'{name:12} body {len(body) / 2 ** 20:6.1f} MiB, '
+                    f'peak RSS +{growth:.1f} MiB')
@@ -0,0 +1,76 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.recipes_api.ingredient_index import ingredient_index, normalize
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    """
+    Скрипт для сравнения поиска ингредиентов через базу и через индекс
+    """
+    help = 'benchmark ingredient autocomplete: database vs in-memory index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prefix-length',
+            type=int,
+            default=2,
+            help='length of the prefixes taken from ingredient names',
+        )
+        parser.add_argument(
+            '--rounds',
+            type=int,
+            default=3,
+        )
+
+    @staticmethod
+    def database_search(query, limit):
+        # как прежний SearchFilter: ILIKE по префиксу без ограничения
+        return list(Ingredient.objects.filter(
+            name__istartswith=query).order_by('id').values(
+            'id', 'name', 'measurement_unit'))
+
+    @staticmethod
+    def index_search(query, limit):
+        return ingredient_index.search(query, limit)
+
+    def measure(self, search, queries, limit, rounds):
+        best = None
+        for none_ in range(rounds):
+            started = time.perf_counter()
+            for query in queries:
+                search(query, limit)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best / len(queries)
+
+    def handle(self, *args, **options):
+        names = Ingredient.objects.values_list('name', flat=True)
+        if not names.exists():
+            raise CommandError('Загрузите ингредиенты командой load_ingrs')
+        length = options['prefix_length']
+        queries = sorted({
+            name[:length] for name in names if len(normalize(name)) >= length
+        })
+        limit = settings.INGREDIENT_SEARCH_LIMIT
+
+        # первый вызов строит индекс, его время считаем отдельно
+        started = time.perf_counter()
+        ingredient_index.search('', limit)
+        build_time = time.perf_counter() - started
+
+        database = self.measure(
+            self.database_search, queries, limit, options['rounds'])
+        index = self.measure(
+            self.index_search, queries, limit, options['rounds'])
+        self.stdout.write(
+            f'{names.count()} ingredients, {len(queries)} queries '
+            f'of {length} characters, limit {limit}\n'
+            f'index build:   {build_time * 1000:.1f} ms\n'
+            f'database path: {database * 1e6:.1f} us/query\n'
+            f'index path:    {index * 1e6:.1f} us/query\n'
+            f'speedup:       {database / index:.1f}x'
+        )
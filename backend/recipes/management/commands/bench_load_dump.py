@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from recipes.importers import iter_json_array
+
+DUMP = os.path.join(os.path.dirname(settings.BASE_DIR), 'infra', 'dump.json')
+# служебные таблицы заполняет migrate, с ними loaddata падает на
+# конфликте уникальности, поэтому в фикстуру они не попадают
+SYSTEM_MODELS = {'contenttypes.contenttype', 'auth.permission'}
+LOADERS = ('loaddata', 'load_dump')
+
+
+class Command(BaseCommand):
+    """
+    Скрипт для сравнения loaddata и load_dump на синтетической фикстуре
+    в scale раз больше infra/dump.json. Каждая загрузка идёт в отдельном
+    процессе в новую тестовую базу, чтобы пик RSS считался отдельно.
+    """
+    help = 'benchmark wall time and peak RSS of loaddata vs load_dump'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=DUMP)
+        parser.add_argument('--scale', type=int, default=100)
+        parser.add_argument('--run', choices=LOADERS, help='internal')
+        parser.add_argument('--fixture', help='internal')
+
+    @staticmethod
+    def read_status():
+        status = {}
+        with open('/proc/self/status') as file:
+            for line in file:
+                key, none_, value = line.partition(':')
+                if key in ('VmHWM', 'VmRSS'):
+                    status[key] = int(value.split()[0])
+        return status
+
+    def run_loader(self, loader, fixture):
+        # при DEBUG в памяти копится журнал запросов с текстом bulk INSERT
+        settings.DEBUG = False
+        database = connection.settings_dict
+        with tempfile.TemporaryDirectory() as directory:
+            if connection.vendor == 'sqlite':
+                # база на диске, иначе загруженные строки попадут в RSS
+                database['TEST']['NAME'] = os.path.join(directory, 'db')
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False)
+            try:
+                # сбросить пик RSS, накопленный migrate (Linux 4.0+)
+                try:
+                    with open('/proc/self/clear_refs', 'w') as file:
+                        file.write('5')
+                except OSError:
+                    pass
+                baseline = self.read_status()['VmRSS']
+                started = time.perf_counter()
+                call_command(loader, fixture, verbosity=0, stdout=self.stderr)
+                elapsed = time.perf_counter() - started
+                peak = self.read_status()['VmHWM']
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        self.stdout.write(json.dumps({
+            'seconds': elapsed,
+            'rss_growth': max(peak - baseline, 0),
+        }))
+
+    @staticmethod
+    def get_unique_fields(model):
+        names = {field.name for field in model._meta.fields
+                 if field.unique and not field.primary_key}
+        for constraint in model._meta.constraints:
+            names.add(constraint.fields[0])
+        for fields in model._meta.unique_together:
+            names.add(fields[0])
+        return names
+
+    def scale_item(self, item, copy, offsets):
+        model = apps.get_model(item['model'])
+        fields = dict(item['fields'])
+        unique = self.get_unique_fields(model)
+        for field in model._meta.get_fields():
+            if field.name not in fields or fields[field.name] is None:
+                continue
+            value = fields[field.name]
+            if field.is_relation:
+                offset = offsets.get(
+                    field.related_model._meta.label_lower, 0) * copy
+                fields[field.name] = (
+                    [pk + offset for pk in value] if field.many_to_many
+                    else value + offset)
+            elif field.name == 'color' and field.name in unique:
+                fields[field.name] = f'#{offsets["color"]:06x}'
+                offsets['color'] += 1
+            elif field.name in unique and isinstance(value, str):
+                suffix = f'-{copy}' if copy else ''
+                fields[field.name] = (
+                    value[:field.max_length - len(suffix)] + suffix)
+            elif field.name in unique and copy:
+                # например, бит тэга: пусть его назначит загрузчик
+                fields[field.name] = None
+        pk = item['pk']
+        if isinstance(pk, int):
+            pk += offsets[item['model'].lower()] * copy
+        else:
+            pk = hashlib.sha1(f'{pk}{copy}'.encode()).hexdigest()
+        return {'model': item['model'], 'pk': pk, 'fields': fields}
+
+    def make_fixture(self, source, scale, path):
+        """Записать фикстуру по частям, не собирая её в памяти."""
+        offsets = {'color': 0}
+        with open(source, encoding='utf-8') as file:
+            for item in iter_json_array(file):
+                label = item['model'].lower()
+                if isinstance(item['pk'], int):
+                    offsets[label] = max(offsets.get(label, 0), item['pk'])
+        count = 0
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write('[\n')
+            for copy in range(scale):
+                with open(source, encoding='utf-8') as file:
+                    for item in iter_json_array(file):
+                        if item['model'].lower() in SYSTEM_MODELS:
+                            continue
+                        if count:
+                            output.write(',\n')
+                        json.dump(self.scale_item(item, copy, offsets),
+                                  output, ensure_ascii=False)
+                        count += 1
+            output.write('\n]\n')
+        return count
+
+    def run_child(self, loader, fixture):
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(sys.argv[0]),
+             'bench_load_dump', '--run', loader, '--fixture', fixture],
+            capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr)
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        if options['run']:
+            self.run_loader(options['run'], options['fixture'])
+            return
+
+        with tempfile.TemporaryDirectory() as directory:
+            fixture = os.path.join(directory, 'dump.json')
+            count = self.make_fixture(
+                options['source'], options['scale'], fixture)
+            self.stdout.write(
+                f'fixture x{options["scale"]}: {count} objects, '
+                f'{os.path.getsize(fixture) / 2 ** 20:.1f} MiB')
+            for loader in LOADERS:
+                result = self.run_child(loader, fixture)
+                self.stdout.write(
+                    f'{loader:10} {result["seconds"]:7.2f}s, '
+                    f'peak RSS +{result["rss_growth"] / 1024:.1f} MiB')
@@ -0,0 +1,237 @@
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe
+from users.models import User
+
+SERVERS = {
+    'wsgi': (
+        '-m', 'gunicorn', 'backend.wsgi:application',
+        '--bind', '127.0.0.1:{port}',
+        '--workers', '{workers}', '--threads', '{threads}',
+    ),
+    'asgi': (
+        '-m', 'uvicorn', 'backend.asgi:application',
+        '--host', '127.0.0.1', '--port', '{port}',
+        '--workers', '{workers}',
+    ),
+}
+# маршруты из ASYNC_READ_ROUTES
+PATHS = (
+    '/api/tags/',
+    '/api/ingredients/?name={prefix}',
+    '/api/recipes/',
+    '/api/recipes/{recipe}/',
+    '/api/users/subscriptions/?recipes_limit=3',
+)
+
+
+class Command(BaseCommand):
+    """
+    Скрипт для сравнения пропускной способности WSGI (gunicorn,
+    backend.wsgi) и ASGI (uvicorn, backend.asgi) при большом числе
+    одновременных соединений. Серверы запускаются по очереди с текущими
+    настройками, клиенты открывают новое соединение на каждый запрос.
+    Медленные клиенты (--slow-clients) присылают заголовки по одному в
+    секунду и занимают соединение всё время замера.
+    """
+    help = 'compare concurrent-connection throughput of WSGI and ASGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--server',
+            action='append',
+            choices=SERVERS,
+            help='servers to run, both by default',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            nargs='+',
+            default=(10, 50, 200),
+        )
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument('--slow-clients', type=int, default=0)
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='more than one needs a shared CACHE_BACKEND',
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=1,
+            help='gunicorn threads per worker',
+        )
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument(
+            '--path',
+            action='append',
+            help='paths to request, the async read routes by default',
+        )
+        parser.add_argument(
+            '--output',
+            help='where to save the results as JSON',
+        )
+
+    def get_paths(self, paths):
+        """Пути запросов и заголовок авторизации."""
+        user = User.objects.filter(
+            username__startswith='fake', author__isnull=False).first()
+        recipe = Recipe.objects.order_by('id').first()
+        ingredient = Ingredient.objects.order_by('id').first()
+        if user is None or recipe is None or ingredient is None:
+            raise CommandError(
+                'Создайте данные командой generate_fake_data')
+        token = Token.objects.get_or_create(user=user)[0]
+        params = {
+            'prefix': quote(ingredient.name[:2]),
+            'recipe': recipe.pk,
+        }
+        return ([path.format(**params) for path in paths or PATHS],
+                f'Authorization: Token {token.key}\r\n')
+
+    @staticmethod
+    def is_up(port):
+        with socket.socket() as sock:
+            return sock.connect_ex(('127.0.0.1', port)) == 0
+
+    def start(self, server, options):
+        port = options['port']
+        if self.is_up(port):
+            raise CommandError(f'Порт {port} занят')
+        arguments = [
+            argument.format(port=port, workers=options['workers'],
+                            threads=options['threads'])
+            for argument in SERVERS[server]
+        ]
+        environment = dict(
+            os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        process = subprocess.Popen(
+            [sys.executable, *arguments], cwd=settings.BASE_DIR,
+            env=environment, stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while not self.is_up(port):
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                raise CommandError(f'{server} не запустился')
+            time.sleep(0.2)
+        return process
+
+    def warm_up(self, port, paths, authorization):
+        # первые запросы загружают приложение и индекс ингредиентов
+        for path in paths:
+            asyncio.run(self.fetch(port, path, authorization))
+
+    @staticmethod
+    async def fetch(port, path, authorization):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            writer.write(
+                f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n'
+                f'{authorization}Connection: close\r\n\r\n'.encode())
+            await writer.drain()
+            response = await reader.read()
+        finally:
+            writer.close()
+        return int(response.split(b' ', 2)[1])
+
+    async def client(self, port, paths, authorization, deadline, results,
+                     offset):
+        index = offset
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                status = await self.fetch(
+                    port, paths[index % len(paths)], authorization)
+            except (OSError, IndexError, ValueError):
+                status = None
+            results.append((status, time.perf_counter() - started))
+            index += 1
+
+    @staticmethod
+    async def slow_client(port, deadline):
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        except OSError:
+            return
+        try:
+            writer.write(
+                f'GET /api/tags/ HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n'
+                .encode())
+            while time.monotonic() < deadline:
+                await asyncio.sleep(1)
+                writer.write(b'X-Slow: 1\r\n')
+                await writer.drain()
+        except OSError:
+            pass
+        finally:
+            writer.close()
+
+    async def load(self, port, paths, authorization, concurrency, options):
+        deadline = time.monotonic() + options['duration']
+        results = []
+        await asyncio.gather(
+            *(self.slow_client(port, deadline)
+              for none_ in range(options['slow_clients'])),
+            *(self.client(port, paths, authorization, deadline, results,
+                          offset)
+              for offset in range(concurrency)),
+        )
+        timings = sorted(elapsed * 1000 for status, elapsed in results)
+        if not timings:
+            raise CommandError('Ни один запрос не завершился')
+        errors = sum(1 for status, elapsed in results
+                     if status is None or status >= 400)
+        return {
+            'requests': len(results),
+            'rps': round(len(results) / options['duration'], 1),
+            'errors': errors,
+            'median_ms': round(statistics.median(timings), 1),
+            'p95_ms': round(timings[int(len(timings) * 0.95)], 1),
+        }
+
+    def handle(self, *args, **options):
+        paths, authorization = self.get_paths(options['path'])
+        results = {}
+        for server in options['server'] or SERVERS:
+            process = self.start(server, options)
+            try:
+                self.warm_up(options['port'], paths, authorization)
+                for concurrency in options['concurrency']:
+                    result = asyncio.run(self.load(
+                        options['port'], paths, authorization, concurrency,
+                        options))
+                    results[f'{server}-{concurrency}'] = result
+                    self.stdout.write(
+                        f'{server} x{concurrency:<4} {result["rps"]:8.1f} '
+                        f'req/s, median {result["median_ms"]:8.1f} ms, '
+                        f'p95 {result["p95_ms"]:8.1f} ms, '
+                        f'{result["errors"]} errors')
+            finally:
+                process.terminate()
+                process.wait()
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump({
+                    'paths': paths,
+                    'options': {
+                        key: options[key] for key in (
+                            'duration', 'slow_clients', 'workers', 'threads')
+                    },
+                    'results': results,
+                }, file, indent=2)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import ShoppingListExport
+
+
+class Command(BaseCommand):
+    """
+    Скрипт для удаления устаревших выгрузок списков покупок и отметки
+    прерванных
+    """
+    help = 'delete expired shopping list exports and fail stale ones'
+
+    def handle(self, *args, **options):
+        failed = ShoppingListExport.fail_stale()
+        deleted = ShoppingListExport.delete_expired()
+        self.stdout.write(
+            f'{failed} stale exports failed, {deleted} expired deleted')
@@ -0,0 +1,184 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Case, Max, Value, When
+from django.utils import timezone
+
+from recipes.importers import refresh_derived
+from recipes.models import (AmountOfIngredient, Favorite, Ingredient, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Follow, User
+
+WORDS = (
+    'домашний', 'быстрый', 'пряный', 'запечённый', 'летний', 'бабушкин',
+    'сытный', 'лёгкий', 'праздничный', 'острый', 'сливочный', 'овощной',
+)
+PASSWORD = 'fake-password'
+
+
+class Command(BaseCommand):
+    """
+    Скрипт для создания синтетических данных для нагрузочных замеров:
+    пользователи, подписки, рецепты с ингредиентами и тэгами, избранное
+    и корзины. Популярность авторов, ингредиентов и рецептов распределена
+    по закону Ципфа: немногие авторы пишут большую часть рецептов, соль и
+    вода встречаются почти везде. С одинаковым --seed данные одинаковые.
+    """
+    help = 'generate a reproducible synthetic dataset with bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument(
+            '--follows', type=int, default=10,
+            help='average subscriptions per user',
+        )
+        parser.add_argument(
+            '--favorites', type=int, default=20,
+            help='average favorites per user',
+        )
+        parser.add_argument(
+            '--carts', type=int, default=5,
+            help='average shopping cart recipes per user',
+        )
+        parser.add_argument(
+            '--ingredients', type=int, nargs=2, default=(3, 12),
+            metavar=('MIN', 'MAX'),
+            help='ingredients per recipe',
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    @staticmethod
+    def zipf_weights(count, exponent=1.1):
+        return [1 / rank ** exponent for rank in range(1, count + 1)]
+
+    def pick(self, population, weights, count):
+        """count разных элементов с учётом весов, в стабильном порядке."""
+        count = min(count, len(population))
+        picked = set()
+        while len(picked) < count:
+            picked.update(self.random.choices(
+                population, weights, k=count - len(picked)))
+        return sorted(picked)
+
+    def around(self, average):
+        return int(self.random.expovariate(1 / average)) if average else 0
+
+    def bulk_create(self, model, objects):
+        model.objects.bulk_create(objects, batch_size=self.batch_size)
+
+    def create_users(self, count):
+        start = (User.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+        password = make_password(PASSWORD)
+        ids = list(range(start, start + count))
+        self.bulk_create(User, [
+            User(id=pk, username=f'fake{pk}', email=f'fake{pk}@example.com',
+                 first_name=f'Имя{pk}', last_name=f'Фамилия{pk}',
+                 password=password)
+            for pk in ids
+        ])
+        return ids
+
+    def create_follows(self, users, average):
+        weights = self.zipf_weights(len(users))
+        follows = []
+        for follower in users:
+            authors = self.pick(users, weights, self.around(average))
+            follows.extend(
+                Follow(follower_id=follower, author_id=author)
+                for author in authors if author != follower)
+        self.bulk_create(Follow, follows)
+        return len(follows)
+
+    def create_recipes(self, users, count, ingredients_range):
+        ingredients = list(
+            Ingredient.objects.order_by('id').values_list('id', 'name'))
+        tags = list(Tag.objects.order_by('id').values_list('id', flat=True))
+        if not ingredients or not tags:
+            raise CommandError(
+                'Загрузите ингредиенты и тэги командами load_ingrs и '
+                'load_tags')
+        # популярные ингредиенты и авторы - в случайном месте списка
+        self.random.shuffle(ingredients)
+        ingredient_weights = self.zipf_weights(len(ingredients))
+        author_weights = self.zipf_weights(len(users))
+        tag_weights = self.zipf_weights(len(tags), exponent=0.5)
+        start = (Recipe.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+        now = timezone.now()
+        ids = []
+        for offset in range(0, count, self.batch_size):
+            batch = range(start + offset,
+                          start + min(offset + self.batch_size, count))
+            recipes, amounts, recipe_tags, dates = [], [], [], []
+            for pk in batch:
+                chosen = self.pick(ingredients, ingredient_weights,
+                                   self.random.randint(*ingredients_range))
+                recipes.append(Recipe(
+                    id=pk,
+                    author_id=self.random.choices(users, author_weights)[0],
+                    # название уникально у автора
+                    name=f'{self.random.choice(chosen)[1].capitalize()} '
+                         f'{self.random.choice(WORDS)} №{pk}'[-200:],
+                    text=' '.join(self.random.choices(WORDS, k=40)),
+                    image='recipes_img/fake.png',
+                    cooking_time=self.random.randint(5, 180),
+                ))
+                amounts.extend(
+                    AmountOfIngredient(recipe_id=pk, ingredient_id=ingredient,
+                                       amount=self.random.randint(1, 500))
+                    for ingredient, none_ in chosen)
+                recipe_tags.extend(
+                    Recipe.tags.through(recipe_id=pk, tag_id=tag)
+                    for tag in self.pick(tags, tag_weights,
+                                         self.random.randint(1, 3)))
+                dates.append(When(pk=pk, then=Value(now - timedelta(
+                    seconds=self.random.randint(0, 365 * 24 * 3600)))))
+            self.bulk_create(Recipe, recipes)
+            self.bulk_create(AmountOfIngredient, amounts)
+            self.bulk_create(Recipe.tags.through, recipe_tags)
+            # pub_date с auto_now_add, bulk_create ставит текущее время
+            Recipe.objects.filter(pk__in=batch).update(pub_date=Case(*dates))
+            Recipe.update_tags_mask(batch)
+            ids.extend(batch)
+        return ids
+
+    def create_user_recipes(self, model, users, recipes, average):
+        weights = self.zipf_weights(len(recipes))
+        rows = [
+            model(user_id=user, recipe_id=recipe)
+            for user in users
+            for recipe in self.pick(recipes, weights, self.around(average))
+        ]
+        self.bulk_create(model, rows)
+        return len(rows)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.perf_counter()
+        with transaction.atomic():
+            users = self.create_users(options['users'])
+            follows = self.create_follows(users, options['follows'])
+            recipes = self.create_recipes(
+                users, options['recipes'], options['ingredients'])
+            favorites = self.create_user_recipes(
+                Favorite, users, recipes, options['favorites'])
+            carts = self.create_user_recipes(
+                ShoppingCart, users, recipes, options['carts'])
+            refresh_derived({User, Follow, Recipe, AmountOfIngredient,
+                             Favorite, ShoppingCart})
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(
+                        no_style(), [User, Recipe]):
+                    cursor.execute(sql)
+        self.stdout.write(
+            f'Created {len(users)} users, {follows} follows, '
+            f'{len(recipes)} recipes, {favorites} favorites, '
+            f'{carts} cart rows in {time.perf_counter() - started:.1f}s; '
+            f'password of every user: {PASSWORD}')
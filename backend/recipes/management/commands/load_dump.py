@@ -0,0 +1,182 @@
+import time
+from collections import Counter
+
+from django.apps import apps
+from django.core import serializers
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.core.serializers.base import DeserializationError
+from django.db import connection, transaction
+from django.db.models import Case, Value, When
+
+from recipes.importers import iter_json_array, refresh_derived
+from recipes.models import Recipe, Tag
+
+
+class Command(BaseCommand):
+    """
+    Скрипт для загрузки фикстуры (например, infra/dump.json) без чтения
+    всего файла в память. Файл читается по частям: первый проход
+    находит модели, затем на каждую модель в порядке зависимостей
+    (пользователи, тэги, ингредиенты, рецепты, ...) свой проход с
+    bulk_create пачками. Сигналы не отправляются, поэтому счётчики,
+    маски тэгов, итоги списков покупок и ленты пересчитываются в конце.
+    Строки, которые уже есть в базе, не перезаписываются.
+    """
+    help = 'load a JSON fixture in streaming batches with bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('fixture')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+        )
+        parser.add_argument(
+            '--ignorenonexistent', '-i',
+            action='store_true',
+            help='ignore fields that do not exist on the current models',
+        )
+
+    @staticmethod
+    def iter_objects(path):
+        with open(path, encoding='utf-8') as file:
+            yield from iter_json_array(file)
+
+    @staticmethod
+    def sort_models(models):
+        """Модели, на которые ссылаются ForeignKey и ManyToMany, раньше."""
+        remaining = list(models)
+        ordered = []
+        while remaining:
+            for model in remaining:
+                related = {
+                    field.related_model
+                    for field in model._meta.get_fields()
+                    if field.is_relation and not field.auto_created
+                }
+                if not related.intersection(remaining) - {model}:
+                    break
+            else:
+                # цикл: ограничения всё равно проверяются в конце
+                model = remaining[0]
+            remaining.remove(model)
+            ordered.append(model)
+        return ordered
+
+    def get_models(self, path):
+        labels = Counter(item['model'].lower()
+                         for item in self.iter_objects(path))
+        try:
+            return self.sort_models(
+                [apps.get_model(label) for label in labels])
+        except LookupError as error:
+            raise CommandError(error)
+
+    @staticmethod
+    def get_auto_now_fields(model):
+        return [
+            field for field in model._meta.concrete_fields
+            if getattr(field, 'auto_now', False)
+            or getattr(field, 'auto_now_add', False)
+        ]
+
+    def restore_auto_now(self, model, objects, fields):
+        """
+        bulk_create ставит полям auto_now и auto_now_add текущее время,
+        вернуть значения из фикстуры (pub_date рецептов, created выгрузок).
+        """
+        for field, values in fields.items():
+            whens = [When(pk=pk, then=Value(value))
+                     for pk, value in values.items()]
+            if whens:
+                model.objects.filter(pk__in=values).update(**{
+                    field.attname: Case(*whens, output_field=field)})
+
+    def insert(self, model, items, ignorenonexistent):
+        deserialized = list(serializers.deserialize(
+            'python', items, ignorenonexistent=ignorenonexistent))
+        objects = [item.object for item in deserialized]
+        if model is Tag:
+            Tag.assign_bits(objects)
+        auto_now_fields = self.get_auto_now_fields(model)
+        if auto_now_fields:
+            # строки, которые уже есть в базе, не перезаписываются
+            existing = set(model.objects.filter(
+                pk__in=[obj.pk for obj in objects]).values_list(
+                'pk', flat=True))
+            dumped = {
+                field: {
+                    obj.pk: getattr(obj, field.attname) for obj in objects
+                    if obj.pk not in existing
+                    and getattr(obj, field.attname) is not None
+                }
+                for field in auto_now_fields
+            }
+        model.objects.bulk_create(objects, ignore_conflicts=True)
+        if auto_now_fields:
+            self.restore_auto_now(model, objects, dumped)
+        for field in model._meta.many_to_many:
+            through = field.remote_field.through
+            if not through._meta.auto_created:
+                continue
+            source = through._meta.get_field(field.m2m_field_name()).attname
+            target = through._meta.get_field(
+                field.m2m_reverse_field_name()).attname
+            through.objects.bulk_create(
+                [through(**{source: item.object.pk, target: pk})
+                 for item in deserialized
+                 for pk in item.m2m_data.get(field.name, ())],
+                ignore_conflicts=True,
+            )
+        if model is Recipe:
+            Recipe.update_tags_mask([recipe.pk for recipe in objects])
+
+    def load_model(self, path, model, batch_size, ignorenonexistent):
+        label = model._meta.label_lower
+        batch = []
+        loaded = 0
+        for item in self.iter_objects(path):
+            if item['model'].lower() != label:
+                continue
+            batch.append(item)
+            if len(batch) >= batch_size:
+                self.insert(model, batch, ignorenonexistent)
+                loaded += len(batch)
+                batch = []
+        if batch:
+            self.insert(model, batch, ignorenonexistent)
+            loaded += len(batch)
+        return loaded
+
+    def handle(self, *args, **options):
+        path = options['fixture']
+        started = time.perf_counter()
+        total = 0
+        try:
+            models = self.get_models(path)
+            with transaction.atomic(), \
+                    connection.constraint_checks_disabled():
+                for model in models:
+                    model_started = time.perf_counter()
+                    loaded = self.load_model(
+                        path, model, options['batch_size'],
+                        options['ignorenonexistent'])
+                    total += loaded
+                    self.stdout.write(
+                        f'{model._meta.label}: {loaded} objects in '
+                        f'{time.perf_counter() - model_started:.2f}s')
+                connection.check_constraints(
+                    table_names=[model._meta.db_table for model in models])
+                refresh_derived(set(models))
+                with connection.cursor() as cursor:
+                    for sql in connection.ops.sequence_reset_sql(
+                            no_style(), models):
+                        cursor.execute(sql)
+        except FileNotFoundError:
+            raise CommandError(f'Файл {path} не найден')
+        except (KeyError, ValueError, DeserializationError) as error:
+            raise CommandError(f'Ошибка в фикстуре {path}: {error!r}')
+        self.stdout.write(
+            f'Installed {total} objects from {len(models)} models in '
+            f'{time.perf_counter() - started:.2f}s')
@@ -1,38 +1,22 @@
-import csv
-import os
-
-from django.conf import settings
-from django.core.management.base import BaseCommand, CommandError
+from api.recipes_api.catalogue import TAGS
+from recipes.importers import CatalogueImportCommand
 from recipes.models import Tag
 
-DATA_ROOT = os.path.join(settings.BASE_DIR, 'data')
-
 
-class Command(BaseCommand):
+class Command(CatalogueImportCommand):
     """
-    Скрипт для формирования команды добавки тэгов в базу из csv file
+    Скрипт для добавления тэгов в базу из csv или json файла
     """
-    help = 'loading tags from data in csv'
+    help = 'loading tags from data in json or csv'
+    model = Tag
+    columns = ('name', 'color', 'slug')
+    key = ('slug',)
+    catalogue_name = TAGS
+    default_filename = 'tags.csv'
 
-    def add_arguments(self, parser):
-        parser.add_argument(
-            'filename',
-            default='tags.csv',
-            nargs='?',
-            type=str
-        )
+    def prepare(self, objects):
+        # bulk_create не вызывает Tag.save
+        Tag.assign_bits(objects)
 
-    def handle(self, *args, **options):
-        try:
-            with open(os.path.join(DATA_ROOT, options['filename']), 'r',
-                      encoding='utf-8') as f:
-                datareader = csv.reader(f)
-                for row in datareader:
-                    Tag.objects.get_or_create(
-                        name=row[0],
-                        color=row[1],
-                        slug=row[2]
-                    )
-                print('Load tags.csv have successfully finished')
-        except FileNotFoundError:
-            raise CommandError('Добавьте файл tags.csv в директорию data')
+    def get_insert_fields(self):
+        return [*super().get_insert_fields(), Tag._meta.get_field('bit')]
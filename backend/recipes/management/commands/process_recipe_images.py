@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from recipes.images import generate_image_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """
+    Скрипт для создания уменьшенных копий изображений рецептов
+    """
+    help = 'generate thumbnail and WebP variants of recipe images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='regenerate variants for recipes that already have them',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='number of images processed in parallel',
+        )
+
+    def process(self, recipe_id):
+        try:
+            generate_image_variants(recipe_id)
+        except Exception as error:
+            return recipe_id, error
+        return recipe_id, None
+
+    def process_in_thread(self, recipe_id):
+        try:
+            return self.process(recipe_id)
+        finally:
+            connections.close_all()
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['force']:
+            recipes = recipes.filter(image_variants={})
+        recipe_ids = list(recipes.values_list('id', flat=True))
+        failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            if options['workers'] > 1:
+                results = executor.map(self.process_in_thread, recipe_ids)
+            else:
+                results = map(self.process, recipe_ids)
+            for recipe_id, error in results:
+                if error is not None:
+                    failed += 1
+                    self.stderr.write(f'recipe {recipe_id}: {error}')
+        self.stdout.write(
+            f'Processed {len(recipe_ids) - failed} of {len(recipe_ids)} '
+            f'recipe images')
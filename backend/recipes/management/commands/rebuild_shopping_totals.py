@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import ShoppingListTotal
+
+
+class Command(BaseCommand):
+    """
+    Скрипт для пересчёта таблицы итогов списков покупок по корзинам
+    """
+    help = 'rebuild or verify shopping list totals'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='only compare the table with the carts, do not change it',
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            with transaction.atomic():
+                count = ShoppingListTotal.rebuild()
+            self.stdout.write(f'Rebuilt {count} shopping list totals')
+            return
+
+        expected = ShoppingListTotal.get_expected_totals()
+        actual = {
+            (user_id, ingredient_id): total
+            for user_id, ingredient_id, total
+            in ShoppingListTotal.objects.values_list(
+                'user_id', 'ingredient_id', 'total_amount')
+        }
+        mismatches = [
+            (key, actual.get(key), expected.get(key))
+            for key in {*expected, *actual}
+            if actual.get(key) != expected.get(key)
+        ]
+        for (user_id, ingredient_id), found, wanted in sorted(
+                mismatches, key=lambda item: item[0]):
+            self.stdout.write(
+                f'user {user_id}, ingredient {ingredient_id}: '
+                f'{found} in table, {wanted} expected')
+        if mismatches:
+            raise CommandError(
+                f'{len(mismatches)} shopping list totals are out of date, '
+                f'run rebuild_shopping_totals')
+        self.stdout.write(f'All {len(actual)} shopping list totals match')
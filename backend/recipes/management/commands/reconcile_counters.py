@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.counters import COUNTERS, find_drift, repair
+
+
+class Command(BaseCommand):
+    """
+    Скрипт для сверки денормализованных счётчиков с таблицами связей
+    """
+    help = 'find and repair drift in favorites/cart/recipes/followers counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='only report drifted counters, do not change them',
+        )
+
+    def handle(self, *args, **options):
+        drifted = 0
+        for counter in COUNTERS:
+            name = f'{counter.model._meta.model_name}.{counter.field}'
+            with transaction.atomic():
+                drift = find_drift(counter)
+                for pk, found, expected in drift:
+                    self.stdout.write(
+                        f'{name} {pk}: {found} in column, {expected} expected')
+                if drift and not options['verify']:
+                    repair(counter, [pk for pk, none_, none_ in drift])
+            drifted += len(drift)
+        if not drifted:
+            self.stdout.write('All counters match')
+        elif options['verify']:
+            raise CommandError(
+                f'{drifted} counters are out of date, run reconcile_counters')
+        else:
+            self.stdout.write(f'Repaired {drifted} counters')
@@ -0,0 +1,52 @@
+# Generated by Django 3.2.18 on 2026-10-18 19:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_shopping_list_totals(apps, schema_editor):
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    ShoppingListTotal = apps.get_model('recipes', 'ShoppingListTotal')
+    rows = ShoppingCart.objects.values(
+        'user_id', 'recipe__amount__ingredient_id',
+    ).annotate(
+        total=models.Sum('recipe__amount__amount'),
+    ).filter(total__gt=0).order_by()
+    ShoppingListTotal.objects.bulk_create(
+        [ShoppingListTotal(user_id=row['user_id'],
+                           ingredient_id=row['recipe__amount__ingredient_id'],
+                           total_amount=row['total'])
+         for row in rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0009_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_amount', models.IntegerField(verbose_name='общее количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_totals', to='recipes.ingredient', verbose_name='ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_totals', to=settings.AUTH_USER_MODEL, verbose_name='пользователь')),
+            ],
+            options={
+                'verbose_name': 'итог списка покупок',
+                'verbose_name_plural': 'итоги списков покупок',
+                'default_related_name': 'shopping_totals',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglisttotal',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique shopping_list_total'),
+        ),
+        migrations.RunPython(fill_shopping_list_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.2.18 on 2026-10-18 19:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0010_shoppinglisttotal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListExport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('format', models.CharField(choices=[('pdf', 'PDF'), ('csv', 'CSV'), ('txt', 'Текст'), ('xls', 'Excel')], default='pdf', max_length=3, verbose_name='формат')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Формируется'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=7, verbose_name='статус')),
+                ('file', models.FileField(blank=True, upload_to='shopping_lists/%Y/%m/', verbose_name='файл')),
+                ('error', models.TextField(blank=True, verbose_name='ошибка')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='создан')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list_exports', to=settings.AUTH_USER_MODEL, verbose_name='пользователь')),
+            ],
+            options={
+                'verbose_name': 'выгрузка списка покупок',
+                'verbose_name_plural': 'выгрузки списков покупок',
+                'ordering': ('-created',),
+                'default_related_name': 'shopping_list_exports',
+            },
+        ),
+    ]
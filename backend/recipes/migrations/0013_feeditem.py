@@ -0,0 +1,73 @@
+# Generated by Django 3.2.18 on 2026-10-18 19:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_feeds(apps, schema_editor):
+    Follow = apps.get_model('users', 'Follow')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FeedItem = apps.get_model('recipes', 'FeedItem')
+    pulled = set(
+        Follow.objects.values('author_id').annotate(
+            followers=models.Count('id'),
+        ).filter(
+            followers__gt=settings.FEED_FANOUT_MAX_FOLLOWERS,
+        ).order_by().values_list('author_id', flat=True)
+    )
+    latest = {}
+    items = []
+    for follower_id, author_id in Follow.objects.values_list(
+            'follower_id', 'author_id').iterator():
+        if author_id in pulled:
+            continue
+        if author_id not in latest:
+            latest[author_id] = list(
+                Recipe.objects.filter(author_id=author_id).order_by(
+                    '-pub_date', '-id').values_list(
+                    'id', flat=True)[:settings.FEED_BACKFILL_LIMIT])
+        items.extend(
+            FeedItem(user_id=follower_id, recipe_id=recipe_id,
+                     author_id=author_id)
+            for recipe_id in latest[author_id]
+        )
+        if len(items) >= 1000:
+            FeedItem.objects.bulk_create(items)
+            items = []
+    FeedItem.objects.bulk_create(items)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0012_recipe_image_variants'),
+        ('users', '0004_follow_unique follower_author'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='автор')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to='recipes.recipe', verbose_name='рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to=settings.AUTH_USER_MODEL, verbose_name='пользователь')),
+            ],
+            options={
+                'verbose_name': 'запись ленты',
+                'verbose_name_plural': 'записи лент',
+                'default_related_name': 'feed_items',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['user', 'author'], name='feed_item_user_author_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feeditem',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique feed_item'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
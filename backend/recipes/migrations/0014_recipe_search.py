@@ -0,0 +1,84 @@
+# Полнотекстовый поиск рецептов (см. recipes/search.py). SQL скопирован
+# сюда, чтобы миграция не менялась вместе с модулем поиска.
+from django.db import DatabaseError, migrations
+
+POSTGRES_INSTALL = (
+    "ALTER TABLE recipes_recipe ADD COLUMN search_vector tsvector "
+    "GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(text, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(text, '')), 'B')"
+    ") STORED",
+    'CREATE INDEX recipe_search_vector_idx ON recipes_recipe '
+    'USING GIN (search_vector)',
+)
+POSTGRES_UNINSTALL = (
+    'DROP INDEX IF EXISTS recipe_search_vector_idx',
+    'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector',
+)
+
+SQLITE_TABLE = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts '
+    "USING fts5(name, text, content='recipes_recipe', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')"
+)
+SQLITE_TRIGGERS = {
+    'recipes_recipe_fts_insert': (
+        'AFTER INSERT ON recipes_recipe BEGIN '
+        'INSERT INTO recipes_recipe_fts(rowid, name, text) '
+        'VALUES (new.id, new.name, new.text); END'),
+    'recipes_recipe_fts_delete': (
+        'AFTER DELETE ON recipes_recipe BEGIN '
+        'INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rowid, name, '
+        "text) VALUES ('delete', old.id, old.name, old.text); END"),
+    'recipes_recipe_fts_update': (
+        'AFTER UPDATE OF name, text ON recipes_recipe BEGIN '
+        'INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rowid, name, '
+        "text) VALUES ('delete', old.id, old.name, old.text); "
+        'INSERT INTO recipes_recipe_fts(rowid, name, text) '
+        'VALUES (new.id, new.name, new.text); END'),
+}
+
+
+def install_search(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        for statement in POSTGRES_INSTALL:
+            schema_editor.execute(statement)
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            try:
+                cursor.execute(SQLITE_TABLE)
+            except DatabaseError:
+                # SQLite собран без FTS5, поиск пойдёт через icontains
+                return
+            for name, definition in SQLITE_TRIGGERS.items():
+                cursor.execute(
+                    f'CREATE TRIGGER IF NOT EXISTS {name} {definition}')
+            cursor.execute(
+                "INSERT INTO recipes_recipe_fts(recipes_recipe_fts) "
+                "VALUES ('rebuild')")
+
+
+def uninstall_search(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        for statement in POSTGRES_UNINSTALL:
+            schema_editor.execute(statement)
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute('DROP TABLE IF EXISTS recipes_recipe_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_feeditem'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
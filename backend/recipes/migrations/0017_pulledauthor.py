@@ -0,0 +1,39 @@
+# Generated by Django 3.2.18 on 2026-10-18 20:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_pulled_authors(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    PulledAuthor = apps.get_model('recipes', 'PulledAuthor')
+    PulledAuthor.objects.bulk_create(
+        PulledAuthor(author_id=author_id)
+        for author_id in User.objects.filter(
+            followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS,
+        ).values_list('id', flat=True)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0005_counters'),
+        ('recipes', '0016_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PulledAuthor',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='автор')),
+            ],
+            options={
+                'verbose_name': 'автор без раскладки по лентам',
+                'verbose_name_plural': 'авторы без раскладки по лентам',
+            },
+        ),
+        migrations.RunPython(fill_pulled_authors, migrations.RunPython.noop),
+    ]
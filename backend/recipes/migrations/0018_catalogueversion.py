@@ -0,0 +1,35 @@
+# Generated by Django 3.2.18 on 2026-10-18 20:51
+
+import uuid
+
+from django.db import migrations, models
+
+
+def create_versions(apps, schema_editor):
+    CatalogueVersion = apps.get_model('recipes', 'CatalogueVersion')
+    CatalogueVersion.objects.bulk_create(
+        CatalogueVersion(name=name, version=uuid.uuid4().hex)
+        for name in ('tags', 'ingredients')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0017_pulledauthor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogueVersion',
+            fields=[
+                ('name', models.CharField(max_length=32, primary_key=True, serialize=False, verbose_name='справочник')),
+                ('version', models.CharField(max_length=32, verbose_name='версия')),
+            ],
+            options={
+                'verbose_name': 'версия справочника',
+                'verbose_name_plural': 'версии справочников',
+            },
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,20 @@
+import uuid
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
 from django.core.validators import MinValueValidator
-from django.db import models
-from django.db.models import Sum
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, models, transaction
+from django.db.models import (Exists, ExpressionWrapper, F, OuterRef, Sum,
+                              Window)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 from django.utils import timezone
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
-from users.models import User
+
+from users.models import CountersModelMixin, Follow, User
 
 
 class Tag(models.Model):
@@ -26,6 +36,16 @@ class Tag(models.Model):
         unique=True,
         help_text='Введите уникальный адрес',
     )
+    # номер бита тэга в Recipe.tags_mask; у тэгов сверх MAX_BITS его нет
+    bit = models.PositiveSmallIntegerField(
+        'бит в маске тэгов',
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+    )
+
+    MAX_BITS = 63
 
     class Meta:
         verbose_name = 'тэг'
@@ -35,6 +55,33 @@ class Tag(models.Model):
     def __str__(self):
         return self.name[:15]
 
+    def save(self, *args, **kwargs):
+        if self.bit is not None or self.pk is not None:
+            return super().save(*args, **kwargs)
+        # два процесса могут одновременно выбрать один свободный бит:
+        # второй получит IntegrityError и возьмёт следующий
+        while True:
+            self.assign_bits([self])
+            try:
+                with transaction.atomic(using=kwargs.get('using')):
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if self.bit is None or not Tag.objects.filter(
+                        bit=self.bit).exists():
+                    raise
+                self.bit = None
+
+    @classmethod
+    def assign_bits(cls, tags):
+        """Раздать свободные биты маски новым тэгам, у которых его нет."""
+        used = set(cls.objects.exclude(bit=None).values_list(
+            'bit', flat=True))
+        used.update(tag.bit for tag in tags if tag.bit is not None)
+        free = (bit for bit in range(cls.MAX_BITS) if bit not in used)
+        for tag in tags:
+            if tag.bit is None:
+                tag.bit = next(free, None)
+
 
 class Ingredient(models.Model):
     name = models.CharField(
@@ -59,7 +106,7 @@ class Ingredient(models.Model):
         return f'{self.name}, {self.measurement_unit}'
 
 
-class Recipe(models.Model):
+class Recipe(CountersModelMixin, models.Model):
     author = models.ForeignKey(
         User,
         verbose_name='автор',
@@ -76,6 +123,12 @@ class Recipe(models.Model):
         upload_to='recipes_img/%Y/%m/',
         help_text='Загрузите изображение рецепта'
     )
+    image_variants = models.JSONField(
+        'уменьшенные копии изображения',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     text = models.TextField(
         'текст рецепта',
         help_text='Содержание рецепта'
@@ -101,6 +154,28 @@ class Recipe(models.Model):
         'дата публикации',
         auto_now_add=True
     )
+    favorites_count = models.PositiveIntegerField(
+        'в избранном',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'в списках покупок',
+        default=0,
+        editable=False,
+    )
+    tags_mask = models.BigIntegerField(
+        'маска тэгов',
+        default=0,
+        editable=False,
+        db_index=True,
+        help_text='Побитовое ИЛИ Tag.bit тэгов рецепта',
+    )
+
+    PROTECTED_FIELDS = ('favorites_count', 'in_carts_count', 'tags_mask')
+    # до скольких значений маски фильтр по тэгам раскрывается в IN
+    # по индексу tags_mask, иначе проверяется побитовым И
+    TAGS_MASK_IN_MAX = 256
 
     class Meta:
         verbose_name = 'рецепт'
@@ -111,25 +186,104 @@ class Recipe(models.Model):
                 fields=('name', 'author'),
                 name='recipe_name_unique')
         ]
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='recipe_pub_date_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def update_tags_mask(cls, recipe_ids):
+        masks = dict.fromkeys(recipe_ids, 0)
+        for recipe_id, bit in cls.tags.through.objects.filter(
+                recipe_id__in=masks, tag__bit__isnull=False).values_list(
+                'recipe_id', 'tag__bit'):
+            masks[recipe_id] |= 1 << bit
+        cls.objects.bulk_update(
+            [cls(pk=pk, tags_mask=mask) for pk, mask in masks.items()],
+            ['tags_mask'],
+            batch_size=1000,
+        )
+
+    @classmethod
+    def filter_by_tags_mask(cls, queryset, mask, all_bits, match_all):
+        """
+        Рецепты, у которых в tags_mask есть все (match_all) или хотя бы
+        один бит из mask. all_bits - биты всех тэгов справочника.
+        """
+        if 2 ** bin(all_bits).count('1') <= cls.TAGS_MASK_IN_MAX:
+            # перебор подмасок all_bits: одно условие IN по индексу
+            masks = []
+            submask = all_bits
+            while True:
+                if (submask & mask == mask if match_all
+                        else submask & mask):
+                    masks.append(submask)
+                if not submask:
+                    break
+                submask = (submask - 1) & all_bits
+            return queryset.filter(tags_mask__in=masks)
+        queryset = queryset.annotate(tags_matched=ExpressionWrapper(
+            F('tags_mask').bitand(mask),
+            output_field=models.BigIntegerField(),
+        ))
+        if match_all:
+            return queryset.filter(tags_matched=mask)
+        return queryset.exclude(tags_matched=0)
+
+    @classmethod
+    def filter_by_tags(cls, queryset, tags, all_bits, match_all=False):
+        """
+        Отфильтровать рецепты по тэгам [(id, bit), ...] без JOIN и
+        повторяющихся строк: по tags_mask или через EXISTS.
+        """
+        if not tags:
+            return queryset
+        if (settings.RECIPE_TAGS_MASK_FILTER
+                and all(bit is not None for none_, bit in tags)):
+            mask = 0
+            for none_, bit in tags:
+                mask |= 1 << bit
+            return cls.filter_by_tags_mask(
+                queryset, mask, all_bits, match_all)
+        recipe_tags = cls.tags.through.objects.filter(
+            recipe_id=OuterRef('pk'))
+        if match_all:
+            for tag_id, none_ in tags:
+                queryset = queryset.filter(
+                    Exists(recipe_tags.filter(tag_id=tag_id)))
+            return queryset
+        return queryset.filter(Exists(recipe_tags.filter(
+            tag_id__in=[tag_id for tag_id, none_ in tags])))
+
+    @classmethod
+    def get_latest_by_author(cls, recipes, limit):
+        """
+        Не больше limit последних рецептов каждого автора из recipes
+        одним запросом с ROW_NUMBER() OVER (PARTITION BY author_id).
+        """
+        ranked = recipes.order_by().annotate(
+            author_rank=Window(
+                RowNumber(),
+                partition_by=F('author_id'),
+                order_by=(F('pub_date').desc(), F('id').desc()),
+            )
+        ).values('id', 'author_rank')
+        sql, params = ranked.query.sql_with_params()
+        return cls.objects.filter(id__in=RawSQL(
+            f'SELECT ranked.id FROM ({sql}) ranked '
+            f'WHERE ranked.author_rank <= %s',
+            (*params, limit),
+        )).order_by('-pub_date', '-id')
+
     @classmethod
     def get_shopping_cart(cls, user, page):
         today = timezone.now()
-        queryset = AmountOfIngredient.get_queryset_recipe_users(
-            user=user)
-        ingredients_list = queryset.values_list(
-            'ingredient__name', 'ingredient__measurement_unit',
-            'recipe__name', 'amount')
-        ingredients_sum_amount = queryset.values(
-            'ingredient__name').annotate(sum_amount=Sum('amount'))
-
-        ingredient_amount_dict = {}  # словарик:имя ингредиента и общ.колич.
-        for item in ingredients_sum_amount:
-            ingredient_amount_dict[
-                item.get('ingredient__name')] = f'{item.get("sum_amount")}'
+        shopping_list = ShoppingListTotal.get_shopping_list(user)
+        recipe_names = user.shopcart.order_by('recipe__name').values_list(
+            'recipe__name', flat=True)
 
         pdfmetrics.registerFont(
             TTFont('Handicraft1', 'data/Handicraft1.ttf', 'UTF-8'))
@@ -151,25 +305,28 @@ class Recipe(models.Model):
             height -= 30
         page.setFont('Handicraft1', size=12)
         height = 700
-        recipe_list = []
-        name_ingredient_list = []
-        for i, item in enumerate(ingredients_list):
-            if item[0] not in name_ingredient_list:
-                page.drawString(
-                    75, height,
-                    f'--{item[0]} - {ingredient_amount_dict[item[0]]} '
-                    f'{item[1]}')
-                height -= 20
-                recipe_list = []
-            if item[2] not in recipe_list:
-                page.drawString(150, height, f'Рецепт-{item[2]}: ')
-                height -= 30
-                recipe_list.append(item[2])
-            name_ingredient_list.append(item[0])
+        lines = [(75, 20, 'Рецепты:')]
+        lines += [(150, 20, f'Рецепт-{name}') for name in recipe_names]
+        lines += [(75, 20, f'--{item.name} - {item.amount} '
+                           f'{item.measurement_unit}')
+                  for item in shopping_list]
+        for x, step, line in lines:
+            if height < 50:
+                page.showPage()
+                page.setFont('Handicraft1', size=12)
+                height = 800
+            page.drawString(x, height, line)
+            height -= step
         page.showPage()
         page.save()
 
 
+ShoppingListItem = namedtuple(
+    'ShoppingListItem',
+    ('ingredient_id', 'name', 'measurement_unit', 'amount')
+)
+
+
 class RecipeBaseModel(models.Model):
     recipe = models.ForeignKey(
         Recipe,
@@ -213,12 +370,6 @@ class AmountOfIngredient(RecipeBaseModel):
     def __str__(self):
         return self.ingredient.name
 
-    @classmethod
-    def get_queryset_recipe_users(cls, user):
-        return cls.objects.select_related(
-            'recipe', 'ingredient').filter(
-            recipe__shopcart__user=user)
-
 
 class Favorite(RecipeBaseModel, UserBaseModel):
 
@@ -242,3 +393,434 @@ class ShoppingCart(RecipeBaseModel, UserBaseModel):
             models.UniqueConstraint(fields=['user', 'recipe'],
                                     name='unique shopping_cart')
         ]
+
+
+class ShoppingListTotal(UserBaseModel):
+    """
+    Денормализованные итоги списка покупок: сколько каждого ингредиента
+    нужно пользователю по всем рецептам из его корзины. Обновляется в той
+    же транзакции, что и корзина или ингредиенты рецепта.
+    """
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='ингредиент',
+        on_delete=models.CASCADE,
+    )
+    total_amount = models.IntegerField('общее количество')
+
+    class Meta:
+        default_related_name = 'shopping_totals'
+        verbose_name = 'итог списка покупок'
+        verbose_name_plural = 'итоги списков покупок'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'ingredient'],
+                                    name='unique shopping_list_total')
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient_id}: {self.total_amount}'
+
+    @staticmethod
+    def get_recipe_amounts(recipe):
+        return dict(
+            AmountOfIngredient.objects.filter(recipe=recipe).values(
+                'ingredient_id').annotate(total=Sum('amount')).order_by(
+                'ingredient_id').values_list('ingredient_id', 'total')
+        )
+
+    @classmethod
+    def apply_delta(cls, user_ids, delta):
+        """
+        Прибавить delta ({ingredient_id: количество}) к итогам
+        пользователей user_ids. Вызывается внутри transaction.atomic.
+        """
+        # строки блокируются в одном порядке во всех транзакциях
+        delta = {key: value for key, value in sorted(delta.items()) if value}
+        if not delta:
+            return
+        user_ids = sorted(user_ids)
+        if not user_ids:
+            return
+        # недостающие строки вставляются с нулём одним INSERT ... ON
+        # CONFLICT DO NOTHING: строку, которую в это же время вставила
+        # другая транзакция, база пропускает, и прибавка ложится на неё
+        cls.objects.bulk_create([
+            cls(user_id=user_id, ingredient_id=ingredient_id,
+                total_amount=0)
+            for user_id in user_ids
+            for ingredient_id, amount in delta.items()
+            if amount > 0
+        ], batch_size=1000, ignore_conflicts=True)
+        rows = cls.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=delta)
+        rows.update(total_amount=models.F('total_amount') + models.Case(
+            *(models.When(ingredient_id=ingredient_id, then=amount)
+              for ingredient_id, amount in delta.items()),
+            output_field=models.IntegerField(),
+        ))
+        rows.filter(total_amount__lte=0).delete()
+
+    @classmethod
+    def add_recipe(cls, user, recipe):
+        cls.apply_delta([user.id], cls.get_recipe_amounts(recipe))
+
+    @classmethod
+    def remove_recipe(cls, user, recipe):
+        cls.apply_delta([user.id], {
+            ingredient_id: -amount for ingredient_id, amount
+            in cls.get_recipe_amounts(recipe).items()
+        })
+
+    @classmethod
+    def change_recipe(cls, recipe, old_amounts, new_amounts):
+        """Учесть новые ингредиенты рецепта у всех, у кого он в корзине."""
+        delta = {
+            ingredient_id: (new_amounts.get(ingredient_id, 0)
+                            - old_amounts.get(ingredient_id, 0))
+            for ingredient_id in {*old_amounts, *new_amounts}
+        }
+        cls.apply_delta(
+            ShoppingCart.objects.filter(recipe=recipe).values_list(
+                'user_id', flat=True),
+            delta
+        )
+
+    @classmethod
+    def get_shopping_list(cls, user):
+        return [
+            ShoppingListItem(
+                ingredient_id, name, measurement_unit, total_amount)
+            for ingredient_id, name, measurement_unit, total_amount
+            in cls.objects.filter(user=user).values_list(
+                'ingredient_id', 'ingredient__name',
+                'ingredient__measurement_unit', 'total_amount',
+            ).order_by('ingredient__name', 'ingredient__measurement_unit')
+        ]
+
+    @classmethod
+    def get_expected_totals(cls, users=None):
+        """Итоги, посчитанные заново по корзинам: {(user_id, ingr_id): n}."""
+        carts = ShoppingCart.objects.all()
+        if users is not None:
+            carts = carts.filter(user__in=users)
+        rows = carts.values(
+            'user_id', 'recipe__amount__ingredient_id',
+        ).annotate(
+            total=Sum('recipe__amount__amount'),
+        ).filter(total__gt=0).order_by().values_list(
+            'user_id', 'recipe__amount__ingredient_id', 'total')
+        return {(user_id, ingredient_id): total
+                for user_id, ingredient_id, total in rows}
+
+    @classmethod
+    def rebuild(cls, users=None):
+        expected = cls.get_expected_totals(users)
+        rows = cls.objects.all()
+        if users is not None:
+            rows = rows.filter(user__in=users)
+        rows.delete()
+        cls.objects.bulk_create(
+            [cls(user_id=user_id, ingredient_id=ingredient_id,
+                 total_amount=total)
+             for (user_id, ingredient_id), total in expected.items()],
+            batch_size=1000,
+        )
+        return len(expected)
+
+
+class ShoppingListExport(UserBaseModel):
+    PDF = 'pdf'
+    CSV = 'csv'
+    TXT = 'txt'
+    XLS = 'xls'
+    FORMATS = (
+        (PDF, 'PDF'),
+        (CSV, 'CSV'),
+        (TXT, 'Текст'),
+        (XLS, 'Excel'),
+    )
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    SWEEP_KEY = 'shopping-list-exports-sweep'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Формируется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+    format = models.CharField(
+        'формат',
+        max_length=max(len(format_) for format_, none_ in FORMATS),
+        choices=FORMATS,
+        default=PDF,
+    )
+    status = models.CharField(
+        'статус',
+        max_length=max(len(status) for status, none_ in STATUSES),
+        choices=STATUSES,
+        default=PENDING,
+    )
+    file = models.FileField(
+        'файл',
+        upload_to='shopping_lists/%Y/%m/',
+        blank=True,
+    )
+    error = models.TextField('ошибка', blank=True)
+    created = models.DateTimeField('создан', auto_now_add=True)
+
+    class Meta:
+        default_related_name = 'shopping_list_exports'
+        verbose_name = 'выгрузка списка покупок'
+        verbose_name_plural = 'выгрузки списков покупок'
+        ordering = ('-created',)
+
+    def __str__(self):
+        return f'{self.user_id}: {self.format}, {self.status}'
+
+    @classmethod
+    def fail_stale(cls):
+        """
+        Отметить ошибкой выгрузки, которые дольше
+        SHOPPING_LIST_EXPORT_TIMEOUT секунд в очереди или в работе: их
+        задача пропала вместе с перезапущенным воркером.
+        """
+        deadline = timezone.now() - timedelta(
+            seconds=settings.SHOPPING_LIST_EXPORT_TIMEOUT)
+        return cls.objects.filter(
+            status__in=(cls.PENDING, cls.RUNNING), created__lt=deadline
+        ).update(status=cls.FAILED, error='Выгрузка прервана')
+
+    @classmethod
+    def delete_expired(cls):
+        """
+        Удалить выгрузки старше SHOPPING_LIST_EXPORT_TTL секунд; файлы
+        удаляются после коммита (см. api/signals.py).
+        """
+        deadline = timezone.now() - timedelta(
+            seconds=settings.SHOPPING_LIST_EXPORT_TTL)
+        return cls.objects.filter(created__lt=deadline).delete()[0]
+
+    @classmethod
+    def sweep_if_due(cls):
+        """Очистка не чаще раза в SHOPPING_LIST_EXPORT_SWEEP_INTERVAL."""
+        if cache.add(cls.SWEEP_KEY, True,
+                     timeout=settings.SHOPPING_LIST_EXPORT_SWEEP_INTERVAL):
+            cls.fail_stale()
+            cls.delete_expired()
+
+
+class FeedItem(RecipeBaseModel, UserBaseModel):
+    """
+    Лента рецептов из подписок, заполненная заранее (fan-out on write):
+    при публикации рецепта строка добавляется каждому подписчику автора.
+    Рецепты авторов, у которых больше FEED_FANOUT_MAX_FOLLOWERS
+    подписчиков, не раскладываются по лентам, а подмешиваются при
+    чтении (см. get_pulled_authors).
+    """
+    PULLED_AUTHORS_KEY = 'feed-pulled-authors'
+    PULLED_AUTHORS_SYNC_KEY = 'feed-pulled-authors-sync'
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='автор',
+    )
+
+    class Meta:
+        default_related_name = 'feed_items'
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'записи лент'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'recipe'],
+                                    name='unique feed_item')
+        ]
+        indexes = [
+            models.Index(fields=['user', 'author'],
+                         name='feed_item_user_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.recipe_id}'
+
+    @classmethod
+    def get_pulled_authors(cls):
+        """
+        Авторы, чьи рецепты читаются из Recipe, а не из лент (см.
+        PulledAuthor). Список кэшируется; когда кэш истекает, фоновая
+        задача сверяет его с числом подписчиков.
+        """
+        authors = cache.get(cls.PULLED_AUTHORS_KEY)
+        if authors is not None:
+            return authors
+        authors = frozenset(
+            PulledAuthor.objects.values_list('author_id', flat=True))
+        cache.set(cls.PULLED_AUTHORS_KEY, authors,
+                  timeout=settings.FEED_PULLED_AUTHORS_TIMEOUT)
+        if cache.add(cls.PULLED_AUTHORS_SYNC_KEY, True,
+                     timeout=settings.FEED_PULLED_AUTHORS_TIMEOUT):
+            from .tasks import run_in_background
+            run_in_background(cls.sync_pulled_authors)
+        return authors
+
+    @classmethod
+    def sync_pulled_authors(cls):
+        """
+        Привести PulledAuthor в соответствие с FEED_FANOUT_MAX_FOLLOWERS.
+        Автора, выпавшего из списка, сначала раскладывают по лентам
+        подписчиков и только потом убирают из списка, иначе его рецепты
+        на это время пропали бы из лент.
+        """
+        authors = set(User.objects.filter(
+            followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS,
+        ).values_list('id', flat=True))
+        stored = set(PulledAuthor.objects.values_list('author_id', flat=True))
+        PulledAuthor.objects.bulk_create(
+            [PulledAuthor(author_id=author_id)
+             for author_id in authors - stored],
+            ignore_conflicts=True,
+        )
+        for author_id in stored - authors:
+            cls.backfill_followers(author_id)
+            PulledAuthor.objects.filter(author_id=author_id).delete()
+        if authors != stored:
+            cache.delete(cls.PULLED_AUTHORS_KEY)
+
+    @classmethod
+    def fan_out(cls, recipe_id):
+        recipe = Recipe.objects.filter(pk=recipe_id).only(
+            'id', 'author_id').first()
+        if recipe is None or recipe.author_id in cls.get_pulled_authors():
+            return
+        follower_ids = Follow.objects.filter(
+            author_id=recipe.author_id).values_list('follower_id', flat=True)
+        cls.objects.bulk_create(
+            [cls(user_id=follower_id, recipe_id=recipe.id,
+                 author_id=recipe.author_id)
+             for follower_id in follower_ids.iterator()],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+    @classmethod
+    def backfill(cls, user_id, author_id):
+        """Добавить в ленту последние рецепты нового автора подписки."""
+        recipe_ids = cls.get_latest_recipe_ids(author_id)
+        cls.objects.bulk_create(
+            [cls(user_id=user_id, recipe_id=recipe_id, author_id=author_id)
+             for recipe_id in recipe_ids],
+            ignore_conflicts=True,
+        )
+
+    @staticmethod
+    def get_latest_recipe_ids(author_id):
+        return list(Recipe.objects.filter(author_id=author_id).order_by(
+            '-pub_date', '-id').values_list(
+            'id', flat=True)[:settings.FEED_BACKFILL_LIMIT])
+
+    @classmethod
+    def backfill_followers(cls, author_id):
+        """Разложить последние рецепты автора по лентам подписчиков."""
+        recipe_ids = cls.get_latest_recipe_ids(author_id)
+        follower_ids = Follow.objects.filter(
+            author_id=author_id).values_list('follower_id', flat=True)
+        cls.objects.bulk_create(
+            [cls(user_id=follower_id, recipe_id=recipe_id,
+                 author_id=author_id)
+             for follower_id in follower_ids.iterator()
+             for recipe_id in recipe_ids],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+    @classmethod
+    def fill(cls):
+        """Заполнить ленты по всем подпискам, например после загрузки."""
+        follows = Follow.objects.exclude(
+            author_id__in=cls.get_pulled_authors(),
+        ).order_by('author_id').values_list('author_id', 'follower_id')
+        author_id, recipe_ids, items = None, [], []
+        for follow_author_id, follower_id in follows.iterator():
+            # последние рецепты читаются один раз на автора
+            if follow_author_id != author_id:
+                author_id = follow_author_id
+                recipe_ids = cls.get_latest_recipe_ids(author_id)
+            items.extend(
+                cls(user_id=follower_id, recipe_id=recipe_id,
+                    author_id=author_id)
+                for recipe_id in recipe_ids)
+            if len(items) >= 1000:
+                cls.objects.bulk_create(items, ignore_conflicts=True)
+                items = []
+        cls.objects.bulk_create(items, ignore_conflicts=True)
+
+    @classmethod
+    def prune(cls, user_id, author_id):
+        cls.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+    @classmethod
+    def get_feed(cls, user, recipes=None):
+        """Рецепты ленты пользователя: из FeedItem и от pulled-авторов."""
+        if recipes is None:
+            recipes = Recipe.objects.all()
+        condition = models.Q(id__in=cls.objects.filter(
+            user=user).values('recipe_id'))
+        pulled = cls.get_pulled_authors()
+        if pulled:
+            condition |= models.Q(author_id__in=Follow.objects.filter(
+                follower=user, author_id__in=pulled).values('author_id'))
+        return recipes.filter(condition)
+
+
+class PulledAuthor(models.Model):
+    """
+    Авторы, у которых больше FEED_FANOUT_MAX_FOLLOWERS подписчиков: их
+    рецепты не раскладываются по лентам (см. FeedItem). Список
+    обновляет FeedItem.sync_pulled_authors.
+    """
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+        verbose_name='автор',
+    )
+
+    class Meta:
+        verbose_name = 'автор без раскладки по лентам'
+        verbose_name_plural = 'авторы без раскладки по лентам'
+
+    def __str__(self):
+        return str(self.author_id)
+
+
+class CatalogueVersion(models.Model):
+    """
+    Версии справочников (тэги, ингредиенты) для всех процессов: кэш по
+    умолчанию может быть у каждого процесса своим (см. catalogue.py).
+    """
+    name = models.CharField('справочник', max_length=32, primary_key=True)
+    version = models.CharField('версия', max_length=32)
+
+    class Meta:
+        verbose_name = 'версия справочника'
+        verbose_name_plural = 'версии справочников'
+
+    def __str__(self):
+        return f'{self.name}: {self.version}'
+
+    @classmethod
+    def get(cls, name):
+        version = cls.objects.using(DEFAULT_DB_ALIAS).filter(
+            name=name).values_list('version', flat=True).first()
+        return version or cls.bump(name)
+
+    @classmethod
+    def bump(cls, name):
+        # новое случайное значение, а не счётчик: после очистки таблицы
+        # старые ETag клиентов не совпадут с новой версией
+        version = uuid.uuid4().hex
+        cls.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+            name=name, defaults={'version': version})
+        return version
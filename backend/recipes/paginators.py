@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор для админки больших таблиц: для списка без фильтров в
+    PostgreSQL берёт оценку числа строк из pg_class.reltuples вместо
+    COUNT(*) по всей таблице. Небольшие таблицы и отфильтрованные
+    списки считаются как обычно.
+    """
+
+    def get_estimate(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql' or queryset.query.where:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        if row is None or row[0] < settings.ADMIN_ESTIMATED_COUNT_MIN:
+            return None
+        return int(row[0])
+
+    @cached_property
+    def count(self):
+        estimate = self.get_estimate()
+        if estimate is not None:
+            return estimate
+        return super().count
@@ -0,0 +1,213 @@
+"""
+Полнотекстовый поиск рецептов по названию и тексту.
+
+PostgreSQL: хранимый столбец recipes_recipe.search_vector (GENERATED
+ALWAYS AS ... STORED) по словарям russian и english с GIN-индексом,
+ранжирование ts_rank_cd, подсветка ts_headline.
+SQLite: внешняя таблица FTS5 recipes_recipe_fts над recipes_recipe,
+которую синхронизируют триггеры, ранжирование bm25, подсветка
+highlight/snippet.
+Оба варианта создаёт миграция 0014_recipe_search, поэтому индекс
+обновляется при любой записи в recipes_recipe, в том числе bulk_create.
+Для остальных баз (или SQLite без FTS5) поиск идёт через icontains.
+
+База отмечает совпадения управляющими символами HIGHLIGHT_START и
+HIGHLIGHT_STOP, а в HTML фрагмент переводит render_highlight: сначала
+экранирует текст рецепта, потом заменяет отметки на <b> и </b>.
+"""
+import re
+
+from django.db import DatabaseError, connections
+from django.db.models import BooleanField, FloatField, Q, TextField
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+
+CONFIGS = ('russian', 'english')
+FTS_TABLE = 'recipes_recipe_fts'
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_STOP = '\x03'
+
+# название весит больше текста
+POSTGRES_VECTOR = ' || '.join(
+    f"setweight(to_tsvector('{config}', coalesce({column}, '')), "
+    f"'{weight}')"
+    for column, weight in (('name', 'A'), ('text', 'B'))
+    for config in CONFIGS
+)
+
+POSTGRES_INSTALL = (
+    f'ALTER TABLE recipes_recipe ADD COLUMN search_vector tsvector '
+    f'GENERATED ALWAYS AS ({POSTGRES_VECTOR}) STORED',
+    'CREATE INDEX recipe_search_vector_idx ON recipes_recipe '
+    'USING GIN (search_vector)',
+)
+POSTGRES_UNINSTALL = (
+    'DROP INDEX IF EXISTS recipe_search_vector_idx',
+    'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector',
+)
+
+SQLITE_TRIGGERS = {
+    f'{FTS_TABLE}_insert': (
+        f'AFTER INSERT ON recipes_recipe BEGIN '
+        f'INSERT INTO {FTS_TABLE}(rowid, name, text) '
+        f'VALUES (new.id, new.name, new.text); END'),
+    f'{FTS_TABLE}_delete': (
+        f'AFTER DELETE ON recipes_recipe BEGIN '
+        f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text) '
+        f"VALUES ('delete', old.id, old.name, old.text); END"),
+    f'{FTS_TABLE}_update': (
+        f'AFTER UPDATE OF name, text ON recipes_recipe BEGIN '
+        f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text) '
+        f"VALUES ('delete', old.id, old.name, old.text); "
+        f'INSERT INTO {FTS_TABLE}(rowid, name, text) '
+        f'VALUES (new.id, new.name, new.text); END'),
+}
+
+_fts_available = {}
+
+
+def install_sqlite_fts(connection):
+    """
+    Создать таблицу FTS5 и триггеры, если их нет, и перестроить индекс.
+    Вызывается миграцией и после каждого migrate: SQLite пересоздаёт
+    recipes_recipe при изменении схемы, и триггеры при этом теряются.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+            "AND tbl_name = 'recipes_recipe'")
+        existing = {name for name, in cursor.fetchall()}
+        if existing >= set(SQLITE_TRIGGERS):
+            return True
+        try:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+                f"USING fts5(name, text, content='recipes_recipe', "
+                f"content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2')")
+        except DatabaseError:
+            # SQLite собран без FTS5, поиск пойдёт через icontains
+            return False
+        for name, definition in SQLITE_TRIGGERS.items():
+            cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {definition}')
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    _fts_available[connection.alias] = True
+    return True
+
+
+def uninstall_sqlite_fts(connection):
+    with connection.cursor() as cursor:
+        for name in SQLITE_TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    _fts_available.pop(connection.alias, None)
+
+
+def has_fts_table(connection):
+    if connection.alias not in _fts_available:
+        _fts_available[connection.alias] = (
+            FTS_TABLE in connection.introspection.table_names())
+    return _fts_available[connection.alias]
+
+
+def get_postgres_query():
+    """tsquery по всем словарям; параметр запроса повторяется."""
+    return ' || '.join(
+        f"websearch_to_tsquery('{config}', %s)" for config in CONFIGS)
+
+
+def get_fts5_query(query):
+    # каждое слово в кавычках и с * (поиск по префиксу), чтобы
+    # пользовательский ввод не разбирался как синтаксис FTS5
+    words = re.findall(r'\w+', query)
+    return ' '.join('"{}"*'.format(word) for word in words)
+
+
+def search_postgres(queryset, query):
+    table = queryset.model._meta.db_table
+    tsquery = get_postgres_query()
+    params = (query,) * len(CONFIGS)
+    headline_options = (
+        f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, '
+        f'HighlightAll=true')
+    text_options = (
+        f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, '
+        f'MaxFragments=2, MaxWords=20, MinWords=5')
+    return queryset.filter(RawSQL(
+        f'"{table}"."search_vector" @@ ({tsquery})',
+        params, output_field=BooleanField(),
+    )).annotate(
+        search_rank=RawSQL(
+            f'ts_rank_cd("{table}"."search_vector", {tsquery})',
+            params, output_field=FloatField()),
+        search_name=RawSQL(
+            f'ts_headline(\'{CONFIGS[0]}\', "{table}"."name", {tsquery}, '
+            f'%s)',
+            (*params, headline_options), output_field=TextField()),
+        search_text=RawSQL(
+            f'ts_headline(\'{CONFIGS[0]}\', "{table}"."text", {tsquery}, '
+            f'%s)',
+            (*params, text_options), output_field=TextField()),
+    )
+
+
+def search_sqlite(queryset, query):
+    table = queryset.model._meta.db_table
+    match = get_fts5_query(query)
+
+    def fts_subquery(expression):
+        return (f'(SELECT {expression} FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s '
+                f'AND {FTS_TABLE}.rowid = "{table}"."id")')
+
+    return queryset.filter(RawSQL(
+        f'"{table}"."id" IN (SELECT rowid FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s)',
+        (match,), output_field=BooleanField(),
+    )).annotate(
+        # bm25 тем меньше, чем лучше совпадение; название весит больше
+        search_rank=RawSQL(
+            fts_subquery(f'-bm25({FTS_TABLE}, 10.0, 1.0)'),
+            (match,), output_field=FloatField()),
+        search_name=RawSQL(
+            fts_subquery(f'highlight({FTS_TABLE}, 0, %s, %s)'),
+            (HIGHLIGHT_START, HIGHLIGHT_STOP, match),
+            output_field=TextField()),
+        search_text=RawSQL(
+            fts_subquery(f"snippet({FTS_TABLE}, 1, %s, %s, '…', 20)"),
+            (HIGHLIGHT_START, HIGHLIGHT_STOP, match),
+            output_field=TextField()),
+    )
+
+
+def render_highlight(fragment):
+    """Фрагмент с отметками совпадений в безопасный HTML с <b>."""
+    return escape(fragment).replace(HIGHLIGHT_START, '<b>').replace(
+        HIGHLIGHT_STOP, '</b>')
+
+
+def search_fallback(queryset, query):
+    return queryset.filter(
+        Q(name__icontains=query) | Q(text__icontains=query))
+
+
+def search_recipes(queryset, query):
+    """
+    Рецепты из queryset, подходящие под query, в порядке релевантности.
+    В полнотекстовых вариантах у рецептов есть атрибуты search_rank,
+    search_name и search_text (фрагменты с подсветкой совпадений).
+    """
+    query = query.strip()
+    if not query:
+        return queryset
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        queryset = search_postgres(queryset, query)
+    elif connection.vendor == 'sqlite' and has_fts_table(connection):
+        if not get_fts5_query(query):
+            return queryset.none()
+        queryset = search_sqlite(queryset, query)
+    else:
+        return search_fallback(queryset, query)
+    return queryset.order_by('-search_rank', '-pub_date', '-id')
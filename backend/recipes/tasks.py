@@ -0,0 +1,62 @@
+"""
+Фоновые задачи в локальном пуле потоков.
+
+Задача ставится в очередь только после фиксации текущей транзакции,
+чтобы поток видел созданные в запросе объекты.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+
+from .exporters import EXPORT_FORMATS, get_filename
+from .models import ShoppingListExport
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.BACKGROUND_WORKERS,
+    thread_name_prefix='foodgram-task',
+)
+
+
+def _call(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Background task %s failed', func.__name__)
+    finally:
+        connections.close_all()
+
+
+def run_in_background(func, *args):
+    transaction.on_commit(lambda: executor.submit(_call, func, *args))
+
+
+def run_export(export_id):
+    ShoppingListExport.sweep_if_due()
+    export = ShoppingListExport.objects.select_related('user').get(
+        pk=export_id)
+    if export.status != ShoppingListExport.PENDING:
+        # очистка уже отметила её прерванной
+        return
+    export.status = ShoppingListExport.RUNNING
+    export.save(update_fields=('status',))
+    export_format = EXPORT_FORMATS[export.format]
+    try:
+        content = export_format.render(export.user)
+    except Exception as error:
+        logger.exception('Shopping list export %s failed', export_id)
+        export.status = ShoppingListExport.FAILED
+        export.error = str(error)
+        export.save(update_fields=('status', 'error'))
+        return
+    export.file.save(
+        get_filename(export.user, export_format),
+        ContentFile(content),
+        save=False,
+    )
+    export.status = ShoppingListExport.DONE
+    export.save(update_fields=('status', 'file'))
@@ -0,0 +1,97 @@
+from django.contrib import admin
+from django.contrib.auth.models import Group, Permission
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (AmountOfIngredient, Favorite, Ingredient, Recipe,
+                            ShoppingCart, ShoppingListExport, Tag)
+from users.models import Follow, User
+
+
+class AdminQueriesTest(TestCase):
+    """
+    Список и форма изменения каждой зарегистрированной модели админки
+    выполняют одно и то же число SQL-запросов при любом числе строк и
+    укладываются в ADMIN_QUERY_BUDGET.
+    """
+    ADMIN_QUERY_BUDGET = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@test.ru', password='password',
+            first_name='Админ', last_name='Тестовый')
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast')
+        group = Group.objects.create(name='Редакторы')
+        group.permissions.set(Permission.objects.all()[:10])
+        cls.add_rows(0, 2)
+
+    @classmethod
+    def add_rows(cls, start, count):
+        """Пользователи с рецептами и всем, что на них ссылается."""
+        for index in range(start, start + count):
+            user = User.objects.create_user(
+                username=f'user{index}', email=f'user{index}@test.ru',
+                password='password', first_name='Имя', last_name='Фамилия')
+            user.user_permissions.set(Permission.objects.all()[:5])
+            Token.objects.create(user=user)
+            ingredient = Ingredient.objects.create(
+                name=f'ингредиент {index}', measurement_unit='г')
+            recipe = Recipe.objects.create(
+                author=user, name=f'Рецепт {index}',
+                image='recipes_img/test.png', text='Описание',
+                cooking_time=10)
+            recipe.tags.set([cls.tag])
+            for other in Ingredient.objects.all()[:3]:
+                AmountOfIngredient.objects.create(
+                    recipe=recipe, ingredient=other, amount=index + 1)
+            AmountOfIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=1)
+            Favorite.objects.create(user=cls.admin, recipe=recipe)
+            ShoppingCart.objects.create(user=cls.admin, recipe=recipe)
+            Follow.objects.create(follower=user, author=cls.admin)
+            ShoppingListExport.objects.create(user=user)
+
+    def get_pages(self):
+        for model in admin.site._registry:
+            info = model._meta.app_label, model._meta.model_name
+            yield reverse('admin:%s_%s_changelist' % info)
+            instance = model._default_manager.order_by('pk').first()
+            self.assertIsNotNone(instance, model._meta.label)
+            yield reverse('admin:%s_%s_change' % info, args=(instance.pk,))
+
+    def measure(self, pages):
+        counts = {}
+        for page in pages:
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(page)
+            self.assertEqual(response.status_code, 200, page)
+            counts[page] = len(context)
+        return counts
+
+    def test_pages(self):
+        self.client.force_login(self.admin)
+        pages = list(self.get_pages())
+        self.measure(pages)
+        before = self.measure(pages)
+        self.add_rows(2, 10)
+        after = self.measure(pages)
+        for page, count in before.items():
+            with self.subTest(page=page):
+                self.assertEqual(after[page], count)
+                self.assertLessEqual(count, self.ADMIN_QUERY_BUDGET)
+
+    def test_cart_users(self):
+        for model in (Recipe, AmountOfIngredient, ShoppingCart):
+            with self.subTest(model=model.__name__):
+                model_admin = admin.site._registry[model]
+                self.assertEqual(
+                    list(model_admin.get_cart_users(model.objects.all())),
+                    [self.admin.id])
+                self.assertEqual(
+                    list(model_admin.get_cart_users(model.objects.none())),
+                    [])
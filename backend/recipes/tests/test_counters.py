@@ -0,0 +1,63 @@
+from django.db.models.signals import post_save
+from django.test import TestCase
+
+from recipes.models import Favorite, Recipe
+from users.models import User
+
+
+class CountersSaveTest(TestCase):
+    """
+    save() без update_fields сохраняет все поля, кроме PROTECTED_FIELDS,
+    а удалённую строку вставляет заново.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@test.ru', password='password')
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', image='recipes_img/test.png',
+            text='Описание', cooking_time=10)
+
+    def test_save_keeps_counters(self):
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        Favorite.objects.create(user=self.author, recipe=self.recipe)
+        stale.name = 'Новое название'
+        stale.save()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.name, 'Новое название')
+        self.assertEqual(self.recipe.favorites_count, 1)
+
+    def test_save_deleted_inserts(self):
+        user = User.objects.create_user(
+            username='deleted', email='deleted@test.ru', password='password')
+        pk = user.pk
+        User.objects.filter(pk=pk).delete()
+        user.save()
+        self.assertTrue(User.objects.filter(pk=pk).exists())
+
+    def test_save_keeps_tags_mask(self):
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        Recipe.objects.filter(pk=self.recipe.pk).update(tags_mask=5)
+        stale.save()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.tags_mask, 5)
+
+    def test_signals_see_update_fields(self):
+        received = []
+
+        def receiver(sender, update_fields, **kwargs):
+            received.append(update_fields)
+
+        post_save.connect(receiver, sender=User)
+        try:
+            self.author.save()
+            self.author.save(update_fields=['first_name'])
+        finally:
+            post_save.disconnect(receiver, sender=User)
+        self.assertEqual(received, [
+            frozenset(self.author.get_saved_fields()),
+            frozenset({'first_name'}),
+        ])
+        self.assertNotIn('recipes_count', received[0])
+        self.assertIn('password', received[0])
@@ -0,0 +1,80 @@
+import io
+import tempfile
+import zipfile
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from recipes.exporters import EXPORT_FORMATS
+from recipes.models import ShoppingListExport
+from recipes.tasks import run_export
+from users.models import User
+
+
+class ShoppingListExportTest(TestCase):
+    """Формат Excel и очистка выгрузок списка покупок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='user', email='user@test.ru', password='password')
+
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def create(self, status, age, with_file=False):
+        export = ShoppingListExport.objects.create(
+            user=self.user, status=status)
+        if with_file:
+            export.file.save('list.txt', ContentFile(b'list'), save=False)
+        # created заполняется auto_now_add, поэтому задаётся отдельно
+        ShoppingListExport.objects.filter(pk=export.pk).update(
+            created=timezone.now() - timedelta(seconds=age), file=export.file)
+        return export
+
+    def test_xlsx(self):
+        export_format = EXPORT_FORMATS[ShoppingListExport.XLS]
+        self.assertEqual(export_format.extension, 'xlsx')
+        with zipfile.ZipFile(io.BytesIO(
+                export_format.render(self.user))) as archive:
+            self.assertIn('xl/worksheets/sheet1.xml', archive.namelist())
+            self.assertIn('Ингредиент', archive.read(
+                'xl/worksheets/sheet1.xml').decode())
+
+    @override_settings(SHOPPING_LIST_EXPORT_TTL=3600,
+                       SHOPPING_LIST_EXPORT_TIMEOUT=60)
+    def test_sweep(self):
+        expired = self.create(ShoppingListExport.DONE, 7200, with_file=True)
+        fresh = self.create(ShoppingListExport.DONE, 10, with_file=True)
+        stale = self.create(ShoppingListExport.RUNNING, 120)
+        running = self.create(ShoppingListExport.RUNNING, 10)
+        with self.captureOnCommitCallbacks(execute=True):
+            ShoppingListExport.sweep_if_due()
+        self.assertFalse(ShoppingListExport.objects.filter(
+            pk=expired.pk).exists())
+        self.assertFalse(default_storage.exists(expired.file.name))
+        self.assertTrue(default_storage.exists(fresh.file.name))
+        statuses = dict(ShoppingListExport.objects.values_list(
+            'pk', 'status'))
+        self.assertEqual(statuses, {
+            fresh.pk: ShoppingListExport.DONE,
+            stale.pk: ShoppingListExport.FAILED,
+            running.pk: ShoppingListExport.RUNNING,
+        })
+
+    @override_settings(SHOPPING_LIST_EXPORT_TIMEOUT=60)
+    def test_stale_export_not_run(self):
+        export = self.create(ShoppingListExport.PENDING, 120)
+        run_export(export.pk)
+        export.refresh_from_db()
+        self.assertEqual(export.status, ShoppingListExport.FAILED)
+        self.assertFalse(export.file)
@@ -0,0 +1,52 @@
+import io
+import tempfile
+from datetime import datetime, timezone
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from recipes.models import Recipe, ShoppingListExport
+from users.models import User
+
+
+class LoadDumpTest(TestCase):
+    """Фикстура загружается с датами из неё, а не с текущим временем."""
+    PUB_DATE = datetime(2023, 4, 7, 12, 30, tzinfo=timezone.utc)
+
+    def test_round_trip_keeps_dates(self):
+        author = User.objects.create_user(
+            username='author', email='author@test.ru', password='password')
+        recipe = Recipe.objects.create(
+            author=author, name='Рецепт', image='recipes_img/test.png',
+            text='Описание', cooking_time=10)
+        export = ShoppingListExport.objects.create(user=author)
+        Recipe.objects.filter(pk=recipe.pk).update(pub_date=self.PUB_DATE)
+        ShoppingListExport.objects.filter(pk=export.pk).update(
+            created=self.PUB_DATE)
+        with tempfile.NamedTemporaryFile(suffix='.json') as file:
+            call_command('dumpdata', 'recipes.recipe',
+                         'recipes.shoppinglistexport', output=file.name,
+                         stdout=io.StringIO())
+            Recipe.objects.all().delete()
+            ShoppingListExport.objects.all().delete()
+            call_command('load_dump', file.name, stdout=io.StringIO())
+        self.assertEqual(
+            Recipe.objects.get(pk=recipe.pk).pub_date, self.PUB_DATE)
+        self.assertEqual(
+            ShoppingListExport.objects.get(pk=export.pk).created,
+            self.PUB_DATE)
+
+    def test_existing_rows_kept(self):
+        author = User.objects.create_user(
+            username='author', email='author@test.ru', password='password')
+        recipe = Recipe.objects.create(
+            author=author, name='Рецепт', image='recipes_img/test.png',
+            text='Описание', cooking_time=10)
+        with tempfile.NamedTemporaryFile(suffix='.json') as file:
+            call_command('dumpdata', 'recipes.recipe', output=file.name,
+                         stdout=io.StringIO())
+            Recipe.objects.filter(pk=recipe.pk).update(
+                pub_date=self.PUB_DATE)
+            call_command('load_dump', file.name, stdout=io.StringIO())
+        self.assertEqual(
+            Recipe.objects.get(pk=recipe.pk).pub_date, self.PUB_DATE)
@@ -0,0 +1,79 @@
+import io
+import tempfile
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from recipes.importers import iter_json_array
+from recipes.models import Tag
+
+
+class LoadTagsTest(TestCase):
+    """
+    Тэги, занятые по name или color, не теряются молча; JSON с лишними
+    или пропущенными запятыми не загружается.
+    """
+    LUNCH = '{"name": "Обед", "color": "#49B64E", "slug": "lunch"}'
+    DINNER = '{"name": "Ужин", "color": "#8775D2", "slug": "dinner"}'
+
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+
+    def load(self, rows, verbosity=1):
+        with tempfile.NamedTemporaryFile(
+                'w', suffix='.csv', encoding='utf-8') as file:
+            file.write(''.join(f'{row}\n' for row in rows))
+            file.flush()
+            out, err = io.StringIO(), io.StringIO()
+            call_command('load_tags', file.name, verbosity=verbosity,
+                         stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_conflicts_reported(self):
+        out, err = self.load([
+            'Завтрак,#E26C2D,breakfast',
+            'Обед,#49B64E,lunch',
+            'Обед,#000001,lunch',
+            'Завтрак,#000002,morning',
+            'Полдник,#49B64E,snack',
+            'Ужин,#8775D2,dinner',
+        ])
+        self.assertIn(
+            '2 inserted, 2 skipped (1 duplicated in file), 0 invalid, '
+            '2 conflicting', out)
+        self.assertIn('2 records conflict', err)
+        self.assertEqual(
+            set(Tag.objects.values_list('slug', flat=True)),
+            {'breakfast', 'lunch', 'dinner'})
+
+    def test_conflicts_listed(self):
+        out, err = self.load(['Завтрак,#000002,morning'], verbosity=2)
+        self.assertIn('1 conflicting', out)
+        self.assertIn('morning: name «Завтрак» уже есть в базе', err)
+
+    def load_json(self, text):
+        with tempfile.NamedTemporaryFile(
+                'w', suffix='.json', encoding='utf-8') as file:
+            file.write(text)
+            file.flush()
+            call_command('load_tags', file.name, stdout=io.StringIO(),
+                         stderr=io.StringIO())
+
+    def test_json_commas(self):
+        lunch, dinner = self.LUNCH, self.DINNER
+        for text in (f'[,{lunch}]', f'[{lunch},,{dinner}]',
+                     f'[{lunch},]', f'[{lunch} {dinner}]', '[,]'):
+            with self.subTest(text=text):
+                for chunk_size in (1, 1024):
+                    with self.assertRaises(ValueError):
+                        list(iter_json_array(
+                            io.StringIO(text), chunk_size=chunk_size))
+                with self.assertRaises(CommandError):
+                    self.load_json(text)
+        self.assertEqual(Tag.objects.count(), 1)
+        self.assertEqual(list(iter_json_array(io.StringIO(' [ ] '))), [])
+        self.load_json(f'[\n  {lunch} ,\n  {dinner}\n]\n')
+        self.assertEqual(
+            set(Tag.objects.values_list('slug', flat=True)),
+            {'breakfast', 'lunch', 'dinner'})
@@ -0,0 +1,45 @@
+from unittest import mock
+
+from django.db import IntegrityError
+from django.test import TestCase
+
+from recipes.models import Tag
+
+
+class TagBitsTest(TestCase):
+    """Бит, занятый другим процессом между чтением и вставкой."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast')
+
+    def create(self, stale_bit, **fields):
+        assign_bits = Tag.assign_bits.__func__
+        calls = []
+
+        def stale_assign_bits(cls, tags):
+            # первый раз бит выбирается по устаревшему списку занятых
+            calls.append(tags)
+            if len(calls) == 1:
+                tags[0].bit = stale_bit
+            else:
+                assign_bits(cls, tags)
+
+        with mock.patch.object(
+                Tag, 'assign_bits', classmethod(stale_assign_bits)):
+            tag = Tag.objects.create(**fields)
+        return tag, len(calls)
+
+    def test_taken_bit_is_retried(self):
+        tag, calls = self.create(
+            self.tag.bit, name='Обед', color='#49B64E', slug='lunch')
+        self.assertEqual(calls, 2)
+        self.assertIsNotNone(tag.bit)
+        self.assertNotEqual(tag.bit, self.tag.bit)
+
+    def test_other_conflicts_are_raised(self):
+        with self.assertRaises(IntegrityError):
+            Tag.objects.create(
+                name='Завтрак', color='#49B64E', slug='lunch')
+        self.assertEqual(Tag.objects.count(), 1)
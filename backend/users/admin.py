@@ -1,27 +1,40 @@
 from django.contrib import admin
+from django.contrib.auth.models import Permission
+
+from recipes.admin import LargeTableAdmin
 
 from .models import Follow, User
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(LargeTableAdmin):
     list_display = (
         'id',
         'username',
         'email',
         'first_name',
-        'last_name')
+        'last_name',
+        'recipes_count',
+        'followers_count')
     search_fields = ('username', 'email')
-    list_filter = ('username', 'email')
+    filter_horizontal = ('groups', 'user_permissions')
     empty_value_display = '-пусто-'
 
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        # подпись права читает content_type
+        if db_field.name == 'user_permissions':
+            kwargs['queryset'] = Permission.objects.select_related(
+                'content_type')
+        return super().formfield_for_manytomany(db_field, request, **kwargs)
+
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(LargeTableAdmin):
     list_display = (
         'id',
         'follower',
         'author')
-    search_fields = ('follower', 'author')
-    list_filter = ('follower', 'author')
+    list_select_related = ('follower', 'author')
+    autocomplete_fields = ('follower', 'author')
+    search_fields = ('follower__username', 'author__username')
     empty_value_display = '-пусто-'
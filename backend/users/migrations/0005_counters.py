@@ -0,0 +1,44 @@
+# Generated by Django 3.2.18 on 2026-10-18 19:41
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_related(related, field):
+    return Coalesce(models.Subquery(
+        related.objects.filter(**{field: models.OuterRef('pk')}).order_by(
+        ).values(field).annotate(total=models.Count('pk')).values('total'),
+        output_field=models.IntegerField(),
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Follow = apps.get_model('users', 'Follow')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    User.objects.update(
+        recipes_count=count_related(Recipe, 'author'),
+        followers_count=count_related(Follow, 'author'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0016_counters'),
+        ('users', '0004_follow_unique follower_author'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='рецептов'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
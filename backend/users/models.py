@@ -1,8 +1,44 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import DatabaseError, models, router, transaction
 
 
-class User(AbstractUser):
+class CountersModelMixin:
+    """
+    Поля PROTECTED_FIELDS меняются только через UPDATE ... F() или
+    bulk_update (счётчики в recipes/counters.py, маска тэгов рецепта),
+    поэтому save() существующего объекта без update_fields не
+    перезаписывает их прочитанными раньше значениями. Если строки уже нет
+    в базе, объект вставляется заново, как в обычном save().
+    """
+    PROTECTED_FIELDS = ()
+
+    def get_saved_fields(self):
+        return [field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.PROTECTED_FIELDS]
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        if (self._state.adding or self.pk is None or force_insert
+                or update_fields is not None):
+            return super().save(force_insert, force_update, using,
+                                update_fields)
+        using = using or router.db_for_write(type(self), instance=self)
+        try:
+            return super().save(force_update=force_update, using=using,
+                                update_fields=self.get_saved_fields())
+        except DatabaseError as error:
+            # так Django сообщает, что UPDATE не нашёл строку (её удалили
+            # после чтения объекта); ошибки самой базы - подклассы
+            if force_update or type(error) is not DatabaseError:
+                raise
+        # запрос выполнился без ошибки, и транзакцию можно продолжать
+        if transaction.get_connection(using).in_atomic_block:
+            transaction.set_rollback(False, using=using)
+        return super().save(force_insert=True, using=using)
+
+
+class User(CountersModelMixin, AbstractUser):
     USER = 'user'
     ADMIN = 'admin'
     USERS_ROLES = (
@@ -29,6 +65,18 @@ class User(AbstractUser):
         default=USER,
     )
     is_admin = models.BooleanField(default=False)
+    recipes_count = models.PositiveIntegerField(
+        'рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        'подписчиков',
+        default=0,
+        editable=False,
+    )
+
+    PROTECTED_FIELDS = ('recipes_count', 'followers_count')
 
     class Meta:
         verbose_name = 'пользователь'